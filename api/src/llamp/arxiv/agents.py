@@ -2,7 +2,6 @@ import os
 import re
 
 from dotenv import load_dotenv
-from langchain import hub
 from langchain.agents import (
     AgentExecutor,
     AgentType,
@@ -42,7 +41,7 @@ from langchain.tools.render import (
 from langchain.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
 from langchain.vectorstores import Chroma
 
-REACT_MULTI_JSON_PROMPT = hub.pull("hwchase17/react-multi-input-json")
+from llamp.prompts import MAP_PROMPT, REACT_MULTI_INPUT_JSON, get_prompt
 
 load_dotenv()
 HF_API_KEY = os.getenv("HF_API_KEY", None)
@@ -64,9 +63,9 @@ class ArxivAgent:
         # self.summary_chain = load_summarize_chain(self.llm, chain_type="map_reduce", verbose=True)
 
         # NOTE: https://python.langchain.com/docs/use_cases/summarization#option-2-map-reduce
-        map_prompt = hub.pull("rlm/map-prompt")
+        map_prompt = get_prompt(MAP_PROMPT)
         map_chain = LLMChain(llm=llm, prompt=map_prompt)
-        reduce_prompt = hub.pull("rlm/map-prompt")
+        reduce_prompt = get_prompt(MAP_PROMPT)
         reduce_chain = LLMChain(llm=llm, prompt=reduce_prompt)
         combine_documents_chain = StuffDocumentsChain(
             llm_chain=reduce_chain, document_variable_name="docs", verbose=True
@@ -156,7 +155,7 @@ class ArxivAgent:
 
     @property
     def prompt(self):
-        partial_prompt = REACT_MULTI_JSON_PROMPT.partial(
+        partial_prompt = get_prompt(REACT_MULTI_INPUT_JSON).partial(
             tools=render_text_description_and_args(self.tools),
             tool_names=", ".join([t.name for t in self.tools]),
         )
@@ -6,14 +6,12 @@ import re
 from pathlib import Path
 
 import numpy as np
-import torch
 from ase import units
 from ase.build import sort
 from ase.md import MDLogger
 from ase.md.npt import NPT
 from langchain.pydantic_v1 import Field
 from langchain.tools import BaseTool
-from mace.calculators import mace_mp
 from monty.json import MontyDecoder
 from monty.tempfile import ScratchDir
 from pymatgen.io.ase import AseAtomsAdaptor
@@ -87,6 +85,9 @@ class NoseHooverMD(BaseTool):
         # run md
         # with ScratchDir("."):
 
+        # NOTE: torch and mace are only imported once a simulation is run
+        from mace.calculators import mace_mp
+
         calculator = mace_mp()
 
         atoms.calc = calculator
@@ -1,7 +1,6 @@
 import json
 import re
 
-from langchain import hub
 from langchain.agents import AgentExecutor
 from langchain.agents.format_scratchpad import format_log_to_str
 from langchain.agents.output_parsers import JSONAgentOutputParser
@@ -11,8 +10,7 @@ from langchain.tools.render import render_text_description_and_args
 
 from llamp.atomate2.schemas import MLFF
 from llamp.atomate2.tools import MLFFMD, MLFFElastic
-
-REACT_MULTI_JSON_PROMPT = hub.pull("hwchase17/react-multi-input-json")
+from llamp.prompts import REACT_MULTI_INPUT_JSON, get_prompt
 
 
 class ChainInputSchema(BaseModel):
@@ -57,7 +55,7 @@ class Atomate2Agent:
 
     @property
     def prompt(self):
-        partial_prompt = REACT_MULTI_JSON_PROMPT.partial(
+        partial_prompt = get_prompt(REACT_MULTI_INPUT_JSON).partial(
             tools=render_text_description_and_args(self.tools),
             tool_names=", ".join([t.name for t in self.tools]),
         )
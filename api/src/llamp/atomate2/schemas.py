@@ -2,15 +2,26 @@ import json
 from collections.abc import Sequence
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, Literal, Union
+from typing import Any, Literal
 
 from atomate2 import SETTINGS
 from atomate2.forcefields import MLFF
 from atomate2.forcefields.md import _valid_dynamics
-from atomate2.vasp.sets.base import VaspInputGenerator
-from langchain.pydantic_v1 import BaseModel, Field
+from langchain.pydantic_v1 import BaseModel, Field, validator
 
-from atomate2.forcefields.jobs import MACERelaxMaker
+
+# NOTE: the VASP input sets and the MACE makers are heavy to import, they are
+# only loaded once a model needs its defaults
+def _default_input_set_generator():
+    from atomate2.vasp.sets.base import VaspInputGenerator
+
+    return VaspInputGenerator()
+
+
+def _default_relax_maker(**kwargs):
+    from atomate2.forcefields.jobs import MACERelaxMaker
+
+    return MACERelaxMaker(**kwargs)
 
 
 class AtomDict(BaseModel):
@@ -109,8 +120,10 @@ class VASPInput(Atomate2Input):
         description="Path to a local file or ASE Atoms definition." + json.dumps(AtomDict.schema())
     )
     name: str = Field("base vasp job", description="The job name.")
-    input_set_generator: VaspInputGenerator = Field(
-        VaspInputGenerator(),
+    # NOTE: typed as Any so that VaspInputGenerator is only imported when used,
+    # the validator below still rejects anything else
+    input_set_generator: Any = Field(
+        default_factory=_default_input_set_generator,
         description="A generator used to make the input set."
     )
     write_input_set_kwargs: dict = Field(
@@ -141,6 +154,16 @@ class VASPInput(Atomate2Input):
                     "E.g., {'my_file:txt': 'contents of the file'}."
     )
 
+    @validator("input_set_generator")
+    def check_input_set_generator(cls, value):
+        from atomate2.vasp.sets.base import VaspInputGenerator
+
+        if not isinstance(value, VaspInputGenerator):
+            raise TypeError(
+                f"input_set_generator must be a VaspInputGenerator, got {type(value).__name__}"
+            )
+        return value
+
 class MLFFElasticInput(Atomate2Input):
     """ 
     Input model for MLFF Elastic
@@ -158,13 +181,13 @@ class MLFFElasticInput(Atomate2Input):
     sym_reduce: bool = Field(True, description="Whether to reduce the number of deformations using symmetry.")
     symprec: float = Field(SETTINGS.SYMPREC, description="Symmetry precision to use in the reduction of symmetry.")
     bulk_relax_maker: dict | None = Field(
-        default_factory=lambda: MACERelaxMaker(
+        default_factory=lambda: _default_relax_maker(
             relax_cell=True, relax_kwargs={"fmax": 0.00001}
         ),
         description="A maker to perform a tight relaxation on the bulk. Set to None to skip the bulk relaxation."
     )
     elastic_relax_maker: dict | None = Field(
-        default_factory=lambda: MACERelaxMaker(
+        default_factory=lambda: _default_relax_maker(
             relax_cell=False
         ),
         description="Maker used to generate elastic relaxations."
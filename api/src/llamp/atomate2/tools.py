@@ -3,9 +3,6 @@ from pathlib import Path
 
 from ase import Atoms
 from ase.io import read, write
-from atomate2.forcefields.md import ForceFieldMDMaker
-from atomate2.forcefields.jobs import ForceFieldRelaxMaker
-from jobflow import run_locally
 from langchain.tools import BaseTool
 from pymatgen.core import Structure
 from pymatgen.io.ase import AseAtomsAdaptor
@@ -56,6 +53,8 @@ class Atomate2Tool(BaseTool):
 
     def _submit_flow(self, flow, run_mode, project):
         if run_mode == "local":
+            from jobflow import run_locally
+
             response = run_locally(flow, create_folders=False)
             task_doc = response[next(iter(response))][1].output
 
@@ -102,6 +101,8 @@ class MLFFMD(Atomate2Tool):
 
     def _submit_flow(self, flow, run_mode, project):
         if run_mode == "local":
+            from jobflow import run_locally
+
             response = run_locally(flow, create_folders=False)
             task_doc = response[next(iter(response))][1].output
 
@@ -140,6 +141,8 @@ class MLFFMD(Atomate2Tool):
             run_mode = kwargs.pop("run_mode", "local")
             project = kwargs.pop("project", "llamp-atomate2")
 
+            from atomate2.forcefields.md import ForceFieldMDMaker
+
             flow = ForceFieldMDMaker(**kwargs).make(structure)
 
             return self._submit_flow(flow, run_mode, project)
@@ -188,6 +191,8 @@ class MLFFElastic(Atomate2Tool):
 
     def _submit_flow(self, flow, run_mode, project):
         if run_mode == "local":
+            from jobflow import run_locally
+
             response = run_locally(flow, create_folders=False)
             task_doc = list(response.values())[-1][1].output
             return {
@@ -223,6 +228,7 @@ class MLFFElastic(Atomate2Tool):
             force_field_name = kwargs.pop("force_field_name")
 
             from atomate2.forcefields.flows.elastic import ElasticMaker
+            from atomate2.forcefields.jobs import ForceFieldRelaxMaker
             kwargs["bulk_relax_maker"] = ForceFieldRelaxMaker(
                 force_field_name=force_field_name,
                 relax_cell=True, relax_kwargs={"fmax": 0.00001}
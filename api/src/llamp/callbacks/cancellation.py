@@ -0,0 +1,47 @@
+import threading
+from typing import Any
+
+from langchain_core.callbacks.base import BaseCallbackHandler
+
+from llamp.utilities import metrics
+
+
+class RunCancelled(Exception):
+    """Raised from callbacks to stop an agent run nobody is listening to."""
+
+
+class CancellationCallbackHandler(BaseCallbackHandler):
+    """Stop agent runs cooperatively once `cancel` has been called.
+
+    Expert agents run synchronously in worker threads that asyncio cannot
+    interrupt. Attached to every executor of a request, this handler raises
+    `RunCancelled` whenever a new LLM call or tool call is about to start after
+    the request was cancelled, and counts the calls it prevented.
+    """
+
+    raise_error: bool = True
+    run_inline: bool = True
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def _check(self, kind: str) -> None:
+        if self._event.is_set():
+            metrics.incr(f"cancelled_{kind}_calls")
+            raise RunCancelled(f"Request cancelled before {kind} call")
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> None:
+        self._check("llm")
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list, **kwargs: Any) -> None:
+        self._check("llm")
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        self._check("tool")
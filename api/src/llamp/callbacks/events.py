@@ -0,0 +1,67 @@
+"""Structured chat stream events.
+
+Everything published on a chat stream is a JSON envelope
+``{"event": <type>, "level": <level>, "data": <payload>}`` where ``level`` is
+0 for the top-level agent and 1 for the expert agents. The envelope is rendered
+either as a ``text/event-stream`` event or, for the legacy ``text/plain``
+stream, as the raw token text with the old ``[structures]`` / ``AGENT_FINISH``
+markers.
+"""
+
+import json
+from typing import Any
+
+TOKEN = "token"
+TOOL_START = "tool_start"
+TOOL_END = "tool_end"
+STRUCTURES = "structures"
+SIMULATION = "simulation"
+FINAL = "final"
+ERROR = "error"
+
+EVENT_TYPES = (TOKEN, TOOL_START, TOOL_END, STRUCTURES, SIMULATION, FINAL, ERROR)
+
+
+def encode(event: str, data: Any = "", level: int = 0) -> str:
+    return json.dumps({"event": event, "level": level, "data": data})
+
+
+def decode(message: str) -> dict:
+    """Decode an envelope, treating anything else as a raw top-level token."""
+    try:
+        event = json.loads(message)
+    except json.JSONDecodeError:
+        event = None
+    if isinstance(event, dict) and event.get("event") in EVENT_TYPES:
+        return event
+    return {"event": TOKEN, "level": 0, "data": message}
+
+
+def is_terminal(event: dict) -> bool:
+    """Whether the event ends the chat turn."""
+    return event["event"] in (FINAL, ERROR) and event["level"] == 0
+
+
+def to_text(event: dict) -> str | None:
+    """Render an event for the legacy text/plain stream, or None to skip it."""
+    if event["event"] == TOKEN:
+        return event["data"]
+    if event["event"] == STRUCTURES:
+        return "[structures]" + ",".join(event["data"])
+    return None
+
+
+def to_sse(event: dict, event_id: str | None = None) -> str:
+    """Render an event as a text/event-stream message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event['event']}")
+    payload = json.dumps({"level": event["level"], "data": event["data"]})
+    lines.append(f"data: {payload}")
+    return "\n".join(lines) + "\n\n"
+
+
+def heartbeat() -> str:
+    """SSE comment that keeps idle connections and proxies alive."""
+    return ": heartbeat\n\n"
@@ -0,0 +1,110 @@
+"""Resumable chat streams on Redis Streams.
+
+With ``STREAM_BACKEND=stream`` the callback handlers append every message of a
+chat to a capped Redis Stream (``<chat_id>:stream``) instead of publishing it
+on the ``<chat_id>`` pub/sub channel. Entries keep their IDs, so a client that
+subscribes late or reconnects reads from its last ID instead of losing tokens.
+
+The stream spans every turn of the chat. The ID after which the latest turn
+starts is kept under ``<chat_id>:turn``, so that a client without any entry ID
+resumes the current turn rather than replaying the first one. For the same
+reason, the agent run of a client that disconnects is left to finish instead of
+being cancelled.
+
+Configuration:
+
+- ``STREAM_BACKEND``: ``pubsub`` (default) or ``stream``
+- ``STREAM_MAXLEN``: approximate number of entries kept per chat
+- ``STREAM_TTL``: seconds a chat stream is kept after its last entry
+- ``STREAM_IDLE_TIMEOUT``: seconds a reader waits for a new entry before giving
+  up
+"""
+
+import os
+import time
+from collections.abc import AsyncIterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STREAM_BACKEND = os.getenv("STREAM_BACKEND", "pubsub")
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", 10000))
+STREAM_TTL = int(os.getenv("STREAM_TTL", 3600))
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", 300))
+STREAM_BLOCK_MS = 5000
+STREAM_READ_COUNT = 100
+
+
+def stream_key(chat_id: str) -> str:
+    return f"{chat_id}:stream"
+
+
+def turn_key(chat_id: str) -> str:
+    return f"{chat_id}:turn"
+
+
+def add_to_pipeline(pipe, chat_id: str, message: str):
+    """Queue appending `message` to the chat stream on a (sync or async) pipeline."""
+    key = stream_key(chat_id)
+    pipe.xadd(key, {"data": message}, maxlen=STREAM_MAXLEN, approximate=True)
+    pipe.expire(key, STREAM_TTL)
+    return pipe
+
+
+def send(redis_client, chat_id: str, message: str) -> None:
+    """Send `message` to a chat with a sync client on the configured backend."""
+    if STREAM_BACKEND == "stream":
+        add_to_pipeline(redis_client.pipeline(transaction=False), chat_id, message).execute()
+    else:
+        redis_client.publish(chat_id, message)
+
+
+async def last_id(async_redis_client, chat_id: str) -> str:
+    """Return the ID of the last entry of the chat stream, or ``0-0``."""
+    entries = await async_redis_client.xrevrange(stream_key(chat_id), count=1)
+    if not entries:
+        return "0-0"
+    entry_id = entries[0][0]
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+async def start_turn(async_redis_client, chat_id: str) -> str:
+    """Mark the start of a new turn of the chat and return the ID it starts after."""
+    start_id = await last_id(async_redis_client, chat_id)
+    await async_redis_client.set(turn_key(chat_id), start_id, ex=STREAM_TTL)
+    return start_id
+
+
+async def turn_start(async_redis_client, chat_id: str) -> str:
+    """Return the ID after which the latest turn of the chat starts, or ``0-0``."""
+    start_id = await async_redis_client.get(turn_key(chat_id))
+    if start_id is None:
+        return "0-0"
+    return start_id.decode() if isinstance(start_id, bytes) else start_id
+
+
+async def read(
+    async_redis_client, chat_id: str, last_id: str = "0-0"
+) -> AsyncIterator[tuple[str, str]]:
+    """Yield ``(entry_id, message)`` for the entries after `last_id`.
+
+    The reader blocks on the stream and returns once no entry arrives for
+    STREAM_IDLE_TIMEOUT seconds.
+    """
+    key = stream_key(chat_id)
+    idle_since = time.monotonic()
+    while True:
+        response = await async_redis_client.xread(
+            {key: last_id}, count=STREAM_READ_COUNT, block=STREAM_BLOCK_MS
+        )
+        if not response:
+            if time.monotonic() - idle_since > STREAM_IDLE_TIMEOUT:
+                return
+            continue
+
+        idle_since = time.monotonic()
+        for _, entries in response:
+            for entry_id, fields in entries:
+                last_id = entry_id.decode()
+                yield last_id, fields[b"data"].decode()
@@ -1,35 +1,182 @@
-import redis
+import asyncio
+import json
+from typing import Any
+from uuid import UUID
 
+from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.callbacks.base import AsyncCallbackHandler
-from langchain_core.agents import AgentFinish, AgentAction
-from typing import Any
+from langchain_core.outputs import LLMResult
+
+from llamp.callbacks import events, redis_stream
+from llamp.utilities.redis_pool import get_async_redis_client, get_redis_client
+
+TOOL_OUTPUT_PREVIEW_LENGTH = 1000
 
 
 class StreamingRedisCallbackHandler(AsyncCallbackHandler):
-    def publish(self, message: str) -> None:
-        self.redis_client.publish(self.redis_channel, message)
+    """Publish LLM tokens and agent events to a Redis channel or stream.
+
+    Messages are `llamp.callbacks.events` envelopes tagged with `level`.
+
+    Args:
+        redis_channel: channel to publish to, usually the chat_id
+        level: 0 for the top-level agent, 1 for the expert agents
+        redis_client: sync client, used when the handler is created outside of
+            an event loop
+        async_redis_client: asyncio client used to publish from the event loop
+        coalesce: buffer tokens and publish them in pipelined batches instead of
+            one round trip per token
+        flush_interval: maximum seconds a token stays buffered when coalescing
+        flush_bytes: buffered bytes that trigger a flush when coalescing
+        backend: ``pubsub`` to publish on the `redis_channel` channel or
+            ``stream`` to append to the resumable chat stream, see
+            `llamp.callbacks.redis_stream`
+    """
 
     def __init__(
-        self, redis_host="localhost", redis_port=6379, redis_channel="llm_stream", redis_password=None, level=0
+        self,
+        redis_channel="llm_stream",
+        level=0,
+        redis_client=None,
+        async_redis_client=None,
+        coalesce=False,
+        flush_interval=0.005,
+        flush_bytes=256,
+        backend=redis_stream.STREAM_BACKEND,
     ):
         self.level = level
+        self.redis_channel = redis_channel
+        # NOTE: connections are borrowed from the process-wide pool unless a
+        # client is given explicitly
+        self.redis_client = redis_client or get_redis_client()
+        self.async_redis_client = async_redis_client or get_async_redis_client()
+        self.coalesce = coalesce
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.backend = backend
+
         try:
-            if redis_password is not None:
-                self.redis_client = redis.Redis(
-                    host=redis_host, port=redis_port, db=0, password=redis_password)
-            else:
-                self.redis_client = redis.Redis(
-                    host=redis_host, port=redis_port, db=0)
-            self.redis_channel = redis_channel
-        except redis.ConnectionError:
-            print("Error: Could not establish a connection to Redis.")
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-
-    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._buffer: list[str] = []
+        self._buffer_size = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_handle = None
+        self._flush_task = None
+
+    async def _run_on_loop(self, coro):
+        """Run `coro` on the loop the handler was created on.
+
+        Expert agents run synchronously in worker threads, where langchain
+        drives async callbacks on a temporary loop. The async Redis pool belongs
+        to the server loop, so the work is handed over to it.
+        """
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, self._loop)
+        )
+
+    def _send(self, pipe, message: str):
+        if self.backend == "stream":
+            return redis_stream.add_to_pipeline(pipe, self.redis_channel, message)
+        return pipe.publish(self.redis_channel, message)
+
+    async def publish(self, message: str) -> None:
+        if self._loop is None:
+            self._send(self.redis_client.pipeline(transaction=False), message).execute()
+            return
+        await self._run_on_loop(self._publish(message))
+
+    async def flush(self) -> None:
+        """Publish the buffered tokens in one pipelined round trip."""
+        if self._loop is None:
+            return
+        await self._run_on_loop(self._flush())
+
+    async def _publish(self, message: str) -> None:
+        if not self.coalesce:
+            pipe = self.async_redis_client.pipeline(transaction=False)
+            await self._send(pipe, message).execute()
+            return
+
+        self._buffer.append(message)
+        self._buffer_size += len(message.encode())
+        if self._buffer_size >= self.flush_bytes:
+            await self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(
+                self.flush_interval, self._schedule_flush
+            )
+
+    def _schedule_flush(self) -> None:
+        self._flush_handle = None
+        self._flush_task = self._loop.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+
+        # NOTE: swap the buffer before waiting on the lock, the lock is FIFO so
+        # batches are published in the order they were taken
+        messages, self._buffer, self._buffer_size = self._buffer, [], 0
+        async with self._flush_lock:
+            pipe = self.async_redis_client.pipeline(transaction=False)
+            for message in messages:
+                self._send(pipe, message)
+            await pipe.execute()
+
+    async def publish_event(self, event: str, data: Any = "") -> None:
+        await self.publish(events.encode(event, data, level=self.level))
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
         """Run on new LLM token. Only available when streaming is enabled."""
-        self.publish(token)
+        await self.publish_event(events.TOKEN, token)
+
+    async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        """Run when LLM ends running."""
+        if self.coalesce:
+            await self.flush()
+
+    async def on_tool_start(
+        self, serialized: dict[str, Any], input_str: str, **kwargs: Any
+    ) -> None:
+        """Run when tool starts running."""
+        await self.publish_event(
+            events.TOOL_START, {"name": serialized.get("name"), "input": input_str}
+        )
+
+    async def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        """Run when tool ends running."""
+        output = str(output)
+        if output.startswith("[simulation]"):
+            await self.publish_event(
+                events.SIMULATION, json.loads(output[len("[simulation]"):])
+            )
+        await self.publish_event(
+            events.TOOL_END, output[:TOOL_OUTPUT_PREVIEW_LENGTH]
+        )
+
+    async def on_chain_error(
+        self, error: BaseException, *, parent_run_id: UUID | None = None, **kwargs: Any
+    ) -> None:
+        """Run when chain errors. Only failures of the root run are published."""
+        if parent_run_id is None:
+            await self.publish_event(events.ERROR, str(error))
+            if self.coalesce:
+                await self.flush()
 
-    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
+    async def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
         """Run on agent finish. Only available when streaming is enabled."""
-        self.publish("AGENT_FINISH")
+        # NOTE: only the top-level agent ends the stream, sub-agents finishing
+        # their own runs must not close it
+        if self.level == 0:
+            await self.publish_event(
+                events.FINAL, finish.return_values.get("output", "")
+            )
+        if self.coalesce:
+            await self.flush()
@@ -1,10 +1,10 @@
 import ast
 import json
 import re
+from functools import cached_property
 from typing import Any, Optional
 from uuid import UUID
 
-from langchain import hub
 from langchain.agents import (
     AgentExecutor,
 )
@@ -28,6 +28,7 @@ from llamp.mp.tools import (
     MaterialsMagnetism,
     MaterialsOxidation,
     MaterialsPiezoelectric,
+    MaterialsResultReader,
     MaterialsRobocrystallographer,
     MaterialsSimilarity,
     MaterialsStructureText,
@@ -37,8 +38,7 @@ from llamp.mp.tools import (
     MaterialsTasks,
     MaterialsThermo,
 )
-
-REACT_MULTI_JSON_PROMPT = hub.pull("hwchase17/react-multi-input-json")
+from llamp.prompts import REACT_MULTI_INPUT_JSON, get_prompt
 
 
 class ChainInputSchema(BaseModel):
@@ -77,15 +77,22 @@ class MPAgent:
     def description(self) -> str:
         return self.__doc__ + "Use full question as input."
 
-    @property
+    @cached_property
     def tools(self) -> list[Tool]:
         raise NotImplementedError
 
-    @property
+    @cached_property
+    def agent_tools(self) -> list[Tool]:
+        """Expert tools plus the reader of results too large for one observation."""
+        return [*self.tools, MaterialsResultReader(handle_tool_error=True)]
+
+    @cached_property
     def prompt(self):
-        partial_prompt = REACT_MULTI_JSON_PROMPT.partial(
-            tools=render_text_description_and_args(self.tools),
-            tool_names=", ".join([t.name for t in self.tools]),
+        # NOTE: tools and the rendered prompt are built once per agent and shared
+        # by all the executors created from it
+        partial_prompt = get_prompt(REACT_MULTI_INPUT_JSON).partial(
+            tools=render_text_description_and_args(self.agent_tools),
+            tool_names=", ".join([t.name for t in self.agent_tools]),
         )
         partial_prompt.messages[0].prompt.template = (
             re.sub(
@@ -116,7 +123,7 @@ class MPAgent:
     ) -> AgentExecutor:
         return AgentExecutor(
             agent=self.chain,
-            tools=self.tools,
+            tools=self.agent_tools,
             verbose=verbose,
             return_intermediate_steps=return_intermediate_steps,
             max_iterations=max_iterations,
@@ -129,25 +136,51 @@ class MPAgent:
         return_direct=False,
         agent_kwargs={},
         tool_kwargs={},
+        callbacks=None,
     ) -> Tool:
+        """Wrap the agent as a tool for a supervisor agent.
+
+        `callbacks` are attached to each run of the executor rather than to the
+        LLM, so the same agent can serve several requests with their own
+        callbacks.
+        """
+
+        def error_response(e: Exception) -> str:
+            return (
+                f"Error on {__class__}: {e}. "
+                "Please decompose the request into multiple smaller requests"
+                "or specify 'limit' in request."
+            )
+
         def run(input: str):
             try:
                 return self.as_executor(**agent_kwargs).invoke(
                     {
                         "input": input,
-                    }
+                    },
+                    config={"callbacks": callbacks},
                 )
             
             except Exception as e:
-                error_response = (
-                    f"Error on {__class__}: {e}. "
-                    "Please decompose the request into multiple smaller requests"
-                    "or specify 'limit' in request."
+                return error_response(e)
+
+        # NOTE: without a coroutine the supervisor's ainvoke runs the sync
+        # executor in a worker thread, and MPTool._arun is never reached
+        async def arun(input: str):
+            try:
+                return await self.as_executor(**agent_kwargs).ainvoke(
+                    {
+                        "input": input,
+                    },
+                    config={"callbacks": callbacks},
                 )
-            return error_response
+
+            except Exception as e:
+                return error_response(e)
 
         return StructuredTool.from_function(
             func=run,
+            coroutine=arun,
             name=self.name,
             description=self.description,
             return_direct=return_direct,
@@ -159,7 +192,7 @@ class MPAgent:
 class MPSummaryExpert(MPAgent):
     """Summary expert that has access to Materials Project summary endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsSummary(
@@ -170,7 +203,7 @@ class MPSummaryExpert(MPAgent):
 class MPStructureRetriever(MPAgent):
     """Structure expert who will retrieve structures from Materials Project."""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsStructureText(return_direct=True, 
@@ -184,10 +217,11 @@ class MPStructureVisualizer(MPAgent):
     chat_id: str = ""
 
     def __init__(self, llm, chat_id, mp_api_key=None):
-        super().__init__(llm, mp_api_key=mp_api_key)
+        # NOTE: chat_id must be set before the tools are built in super().__init__
         self.chat_id = chat_id
+        super().__init__(llm, mp_api_key=mp_api_key)
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsStructureVis(return_direct=False,
@@ -200,7 +234,7 @@ class MPStructureVisualizer(MPAgent):
 class MPThermoExpert(MPAgent):
     """Theromodynamics expert that has access to Materials Project thermo endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsThermo(return_direct=False,
@@ -211,7 +245,7 @@ class MPThermoExpert(MPAgent):
 class MPElasticityExpert(MPAgent):
     """Elasticity expert that has access to Materials Project elasticity endpoint, including bulk, shear, and young's modulus, poisson ratio, and universal anisotropy index"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsElasticity(
@@ -222,7 +256,7 @@ class MPElasticityExpert(MPAgent):
 class MPMagnetismExpert(MPAgent):
     """Magnetism expert that has access to Materials Project magnetism endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsMagnetism(
@@ -233,7 +267,7 @@ class MPMagnetismExpert(MPAgent):
 class MPDielectricExpert(MPAgent):
     """Dielectric expert that has access to Materials Project dielectric endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsDielectric(
@@ -244,7 +278,7 @@ class MPDielectricExpert(MPAgent):
 class MPPiezoelectricExpert(MPAgent):
     """Piezoelectric expert that has access to Materials Project piezoelectric endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsPiezoelectric(return_direct=False,
@@ -256,7 +290,7 @@ class MPPiezoelectricExpert(MPAgent):
 class MPElectronicExpert(MPAgent):
     """Electronic expert that has access to Materials Project electronic endpoint"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsElectronic(
@@ -312,7 +346,7 @@ class MPSynthesisExpert(MPAgent):
     endpoint, where synthesis recipes are extracted  from scientific literature through
     text mining and natural language processing approaches"""
 
-    @property
+    @cached_property
     def tools(self):
         return [
             MaterialsSynthesis(
@@ -933,3 +933,35 @@ class ElectronicSchema(BaseModel):
         default="material_id,formula_pretty,band_gap,efermi,is_gap_direct,is_metal,magnetic_ordering",
         description="Fields to project from ElectronicStructureDoc as comma separated strings. Fields include: 'task_id', 'band_gap', 'cbm', 'vbm', 'efermi', 'is_gap_direct', 'is_metal', 'magnetic_ordering', 'builder_meta', 'nsites', 'elements', 'nelements', 'composition', 'composition_reduced', 'formula_pretty', 'formula_anonymous', 'chemsys', 'volume', 'density', 'density_atomic', 'symmetry', 'property_name', 'material_id', 'deprecated', 'deprecation_reasons', 'last_updated', 'origins', 'warnings', 'bandstructure', 'dos'",
     )
+
+
+class ResultReaderSchema(BaseModel):
+    """Schema for the read_mp_result tool"""
+
+    handle: str = Field(..., description="Handle of the stored result to read")
+    offset: int = Field(0, description="Index of the first entry to return")
+    limit: int = Field(20, description="Maximum number of entries to return")
+    fields: str | None = Field(
+        None,
+        description="Comma-separated list of fields to return, nested fields as dotted names (e.g. symmetry.crystal_system)",
+    )
+    aggregate: bool = Field(
+        False,
+        description="Return count, min, max, mean and sum of the numeric `fields` over the whole result instead of entries",
+    )
+
+
+class JoinSchema(BaseModel):
+    """Schema for the join_materials_properties tool"""
+
+    material_ids: str = Field(
+        ..., description="Comma-separated list of material_ids to query on"
+    )
+    endpoints: str | None = Field(
+        None,
+        description="Comma-separated list of endpoints whose default fields to join: summary, thermo, elasticity, magnetism, dielectric, piezoelectric, electronic_structure. Defaults to summary,thermo,elasticity,magnetism if no fields are given",
+    )
+    fields: str | None = Field(
+        None,
+        description="Comma-separated list of fields as <endpoint>.<field>, e.g. thermo.energy_above_hull,elasticity.bulk_modulus,magnetism.ordering",
+    )
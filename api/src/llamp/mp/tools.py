@@ -1,23 +1,24 @@
+import asyncio
 import json
 import os
 import re
-from pathlib import Path
 
 import redis
-from ase.io import read, write
 from langchain.pydantic_v1 import Field
 from langchain.tools import BaseTool
-from pymatgen.core import Structure
 from redis.client import Redis
 
+from llamp.callbacks import events, redis_stream
 from llamp.mp.schemas import (
     BondsSchema,
     DielectricSchema,
     ElasticitySchema,
     ElectronicSchema,
+    JoinSchema,
     MagnetismSchema,
     OxidationSchema,
     PiezoSchema,
+    ResultReaderSchema,
     RobocrysSchema,
     SimilaritySchema,
     StructureSchema,
@@ -27,29 +28,92 @@ from llamp.mp.schemas import (
     ThermoSchema,
 )
 from llamp.utilities import MPAPIWrapper
+from llamp.utilities.compaction import OBSERVATION_FORMAT, compact_observation
+from llamp.utilities.redis_pool import get_redis_client
+from llamp.utilities.result_store import get_result_store
 
 
 class MPTool(BaseTool):
     name: str = None
     api_wrapper: MPAPIWrapper = Field(default_factory=MPAPIWrapper)
+    observation_format: str = OBSERVATION_FORMAT
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         mp_api_key = os.getenv("MP_API_KEY", kwargs.get('mp_api_key'))
         self.api_wrapper.set_api_key(mp_api_key)
 
-    def _run(self, **query_params):
-        _res = self.api_wrapper.run(
+    def _fetch(self, **query_params):
+        return self.api_wrapper.run(
             function_name=self.name,
             function_args=json.dumps(query_params),
             debug=self.verbose,
         )
-        # TODO: map reduce large response
-        return _res
 
-    async def _arun(self, function_name: str, function_args: str) -> str:
+    def _run(self, **query_params):
+        # NOTE: large responses are compacted before they reach the scratchpad
+        return compact_observation(
+            self._fetch(**query_params), format=self.observation_format
+        )
+
+    async def _arun(self, **query_params):
         """Use the tool asynchronously."""
-        raise NotImplementedError("async is not supported yet")
+        _res = await self.api_wrapper.arun(
+            function_name=self.name,
+            function_args=json.dumps(query_params),
+            debug=self.verbose,
+        )
+        return compact_observation(_res, format=self.observation_format)
+
+
+class MaterialsResultReader(BaseTool):
+    name: str = "read_mp_result"
+    description: str = (
+        re.sub(
+            r"\s+",
+            " ",
+            """useful when a previous observation was cut short and gave a handle to 
+        the full result. Reads more entries, selected fields or aggregates of the 
+        stored result without querying Materials Project again.""",
+        )
+        .strip()
+        .replace("\n", " ")
+    )
+    args_schema: type[ResultReaderSchema] = ResultReaderSchema
+
+    def _run(self, handle: str, offset: int = 0, limit: int = 20,
+             fields: str | None = None, aggregate: bool = False):
+        store = get_result_store()
+        fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        if aggregate:
+            _res = store.aggregate(handle, fields or [])
+        else:
+            _res = store.page(handle, offset=offset, limit=limit, fields=fields)
+        if _res is None:
+            return f"Error: result {handle} not found or expired, query again."
+        # NOTE: fields were picked explicitly, so nested values are kept as is
+        return compact_observation(_res, format="json")
+
+    async def _arun(self, **kwargs):
+        return await asyncio.to_thread(self._run, **kwargs)
+
+
+class MaterialsJoin(MPTool):
+    name: str = "join_materials_properties"
+    description: str = (
+        re.sub(
+            r"\s+",
+            " ",
+            """useful when you need to compare several kinds of properties (e.g. 
+        stability, bulk modulus and magnetic ordering) of materials with known 
+        material_ids. Queries the summary, thermo, elasticity, magnetism, dielectric, 
+        piezoelectric and electronic structure endpoints at once and returns one 
+        row per material.""",
+        )
+        .strip()
+        .replace("\n", " ")
+    )
+    args_schema: type[JoinSchema] = JoinSchema
 
 
 class MaterialsSummary(MPTool):
@@ -95,20 +159,18 @@ class MaterialsStructureVis(MPTool):
     args_schema: type[StructureSchema] = StructureSchema(
         return_mode="text"
     )
+    # NOTE: structures are kept whole, a table would summarize their sites
+    observation_format: str = "json"
     chat_id: str = ""
     redis_client: Redis = None
 
     def __init__(self, *args, chat_id, **kwargs):
         super().__init__(*args, **kwargs)
         self.chat_id = chat_id
-        REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-        REDIS_PORT = os.getenv("REDIS_PORT", 6379)
-        REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
-        self.redis_client = redis.Redis(
-            host=REDIS_HOST, port=REDIS_PORT, db=0, password=REDIS_PASSWORD)
+        self.redis_client = get_redis_client()
 
     def _run(self, **query_params):
-        _response = super()._run(**query_params)
+        _response = self._fetch(**query_params)
 
         for entry in _response:
             material_id = entry["material_id"]
@@ -123,10 +185,16 @@ class MaterialsStructureVis(MPTool):
         if self.chat_id != "":
             try:
                 if self.redis_client.ping():
-                    self.redis_client.publish(
-                        self.chat_id, output)
-                    self.redis_client.publish(
-                        self.chat_id, "AGENT_FINISH")
+                    redis_stream.send(
+                        self.redis_client,
+                        self.chat_id,
+                        events.encode(
+                            events.STRUCTURES,
+                            [entry["material_id"] for entry in _response],
+                        ),
+                    )
+                    redis_stream.send(
+                        self.redis_client, self.chat_id, events.encode(events.FINAL))
                     return output
                 else:
                     print("Failed to establish Redis connection.")
@@ -135,6 +203,10 @@ class MaterialsStructureVis(MPTool):
 
         return output
 
+    async def _arun(self, **query_params):
+        # NOTE: publishing the structures uses the sync Redis client
+        return await asyncio.to_thread(self._run, **query_params)
+
 
 class MaterialsStructureText(MPTool):
     name: str = "search_materials_structure__get"
@@ -155,6 +227,7 @@ class MaterialsStructureText(MPTool):
     args_schema: type[StructureSchema] = StructureSchema(
         return_mode="file"
     )
+    observation_format: str = "json"
 
 
 class MaterialsElasticity(MPTool):
@@ -172,6 +245,8 @@ class MaterialsElasticity(MPTool):
         .replace("\n", " ")
     )
     args_schema: type[ElasticitySchema] = ElasticitySchema
+    # NOTE: elastic and compliance tensors would be summarized in a table
+    observation_format: str = "json"
 
 
 class MaterialsSynthesis(MPTool):
@@ -187,16 +262,8 @@ class MaterialsSynthesis(MPTool):
         .replace("\n", " ")
     )
     args_schema: type[SynthesisSchema] = SynthesisSchema
-
-    def _run(self, **query_params):
-        _res = self.api_wrapper.run(
-            function_name=self.name,
-            function_args=json.dumps(query_params),
-            debug=self.verbose,
-        )
-        # TODO: map reduce large response
-
-        return _res
+    # NOTE: recipes are deeply nested, flattening them into a table loses most
+    observation_format: str = "json"
 
 
 class MaterialsThermo(MPTool):
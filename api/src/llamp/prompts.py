@@ -0,0 +1,96 @@
+"""Prompts vendored from LangChain Hub.
+
+Agents used to `hub.pull` their prompts at import time, which needs network
+access and several round trips per worker. The prompts are now bundled here and
+built lazily, once per process. Every `get_prompt` call returns a copy, so
+callers are free to modify it.
+
+Set ``LLAMP_PROMPT_REFRESH=1`` to pull the latest versions from the hub instead.
+"""
+
+import copy
+import os
+from functools import cache
+
+from langchain_core.prompts import ChatPromptTemplate
+
+REACT_MULTI_INPUT_JSON = "hwchase17/react-multi-input-json"
+MAP_PROMPT = "rlm/map-prompt"
+
+_REACT_MULTI_INPUT_JSON_SYSTEM = """Respond to the human as helpfully and accurately as possible. You have access to the following tools:
+
+{tools}
+
+Use a json blob to specify a tool by providing an action key (tool name) and an action_input key (tool input).
+
+Valid "action" values: "Final Answer" or {tool_names}
+
+Provide only ONE action per $JSON_BLOB, as shown:
+
+```
+{{
+  "action": $TOOL_NAME,
+  "action_input": $INPUT
+}}
+```
+
+Follow this format:
+
+Question: input question to answer
+Thought: consider previous and subsequent steps
+Action:
+```
+$JSON_BLOB
+```
+Observation: action result
+... (repeat Thought/Action/Observation N times)
+Thought: I know what to respond
+Action:
+```
+{{
+  "action": "Final Answer",
+  "action_input": "Final response to human"
+}}
+
+Begin! Reminder to ALWAYS respond with a valid json blob of a single action. Use tools if necessary. Respond directly if appropriate. Format is Action:```$JSON_BLOB```then Observation"""
+
+_REACT_MULTI_INPUT_JSON_HUMAN = """{input}
+
+{agent_scratchpad}
+
+(reminder to respond in a JSON blob no matter what)"""
+
+_MAP_PROMPT_HUMAN = """The following is a set of documents:
+{docs}
+Based on this list of docs, please identify the main themes
+Helpful Answer:"""
+
+_BUNDLED = {
+    REACT_MULTI_INPUT_JSON: lambda: ChatPromptTemplate.from_messages(
+        [
+            ("system", _REACT_MULTI_INPUT_JSON_SYSTEM),
+            ("human", _REACT_MULTI_INPUT_JSON_HUMAN),
+        ]
+    ),
+    MAP_PROMPT: lambda: ChatPromptTemplate.from_messages(
+        [("human", _MAP_PROMPT_HUMAN)]
+    ),
+}
+
+
+def _refresh_enabled() -> bool:
+    return os.getenv("LLAMP_PROMPT_REFRESH", "false").lower() in ("1", "true", "yes")
+
+
+@cache
+def _load_prompt(name: str):
+    if _refresh_enabled():
+        from langchain import hub
+
+        return hub.pull(name)
+    return _BUNDLED[name]()
+
+
+def get_prompt(name: str):
+    """Return a copy of the prompt `name`, loading it on first use."""
+    return copy.deepcopy(_load_prompt(name))
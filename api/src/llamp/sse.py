@@ -1,51 +1,62 @@
 import asyncio
 import json
+import logging
 import os
+import re
 import uuid
+from functools import cache
 
-import openai
-import redis
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from langchain.agents import AgentType, initialize_agent, load_tools
-from langchain.callbacks.base import BaseCallbackManager
-from langchain.memory import ConversationBufferMemory, RedisChatMessageHistory
-from langchain.tools import ArxivQueryRun, WikipediaQueryRun
-from langchain.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
-from langchain_experimental.tools import PythonREPLTool
-from langchain_openai import ChatOpenAI
-from mp_api.client import MPRester
 from pydantic import BaseModel
-from redis.client import PubSub
+from redis.asyncio.client import PubSub
 
+from llamp.callbacks import events, redis_stream
+from llamp.callbacks.cancellation import CancellationCallbackHandler
+from llamp.callbacks.redis_stream import STREAM_BACKEND
 from llamp.callbacks.streaming_redis_handler import StreamingRedisCallbackHandler
-from llamp.mp.agents import (
-    MPDielectricExpert,
-    MPElasticityExpert,
-    MPElectronicExpert,
-    MPMagnetismExpert,
-    MPPiezoelectricExpert,
-    MPStructureRetriever,
-    MPStructureVisualizer,
-    MPSummaryExpert,
-    MPSynthesisExpert,
-    MPThermoExpert,
+from llamp.utilities import metrics
+from llamp.utilities.cache import TTLCache, hash_key
+from llamp.utilities.redis_pool import (
+    REDIS_POOL_TIMEOUT,
+    get_async_redis_client,
+    get_redis_client,
+    redis_url,
 )
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENAI_GPT_MODEL = "gpt-4-1106-preview"  # TODO: allow user to choose LLMs
 # TODO: allow user to choose both top-level and bottom-level agent LLMs
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = os.getenv("REDIS_PORT", 6379)
-REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+# NOTE: keep proxies (e.g. nginx) from buffering or caching the event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+# NOTE: publish tokens in pipelined batches instead of one round trip per token
+STREAM_COALESCE_TOKENS = os.getenv("STREAM_COALESCE_TOKENS", "false").lower() in (
+    "1", "true", "yes")
+
+# NOTE: the agent stack (langchain agents, mp_api, pymatgen, ...) is imported on
+# first use rather than at module load, so that workers boot fast and requests
+# that never reach the agents (health checks, stream replays) do not pay for it
+
 
+@cache
+def search_tools():
+    from langchain.tools import ArxivQueryRun, WikipediaQueryRun
+    from langchain.utilities import ArxivAPIWrapper, WikipediaAPIWrapper
 
-wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-arxiv = ArxivQueryRun(api_wrapper=ArxivAPIWrapper())
+    wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+    arxiv = ArxivQueryRun(api_wrapper=ArxivAPIWrapper())
+    return [arxiv, wikipedia]
 
 
 app = FastAPI()
@@ -74,23 +85,65 @@ async def health():
     return {"status": "ok"}
 
 
-redis_client = None
-if REDIS_PASSWORD is None:
-    redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
-else:
-    redis_client = redis.Redis(
-        host=REDIS_HOST, port=REDIS_PORT, db=0, password=REDIS_PASSWORD)
+@app.get("/api/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+
+# NOTE: both clients share the process-wide pools with the callback handlers and
+# tools. The async client is used to subscribe to the token streams so that
+# waiting for the next token suspends the request instead of polling
+redis_client = get_redis_client()
+async_redis_client = get_async_redis_client()
 
 
 async def listen_to_pubsub(pubsub: PubSub):
-    while True:
-        message = pubsub.get_message()
-        if message and message["type"] == "message":
-            yield message["data"].decode()
-        await asyncio.sleep(0.01)  # Prevents busy-waiting
+    # NOTE: pub/sub messages carry no IDs, number them within the turn instead
+    message_id = 0
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                message_id += 1
+                yield str(message_id), message["data"].decode()
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def subscribe_to_chat(chat_id: str, start_id: str | None = None):
+    """Start listening to the messages of a chat turn on the configured backend.
+
+    Returns an async iterator of ``(message_id, message)``. The subscription is
+    made before returning, so the agent run can be started right after without
+    losing its first messages. With the stream backend, entries are read after
+    `start_id`, by default the last entry of the stream.
+    """
+    if STREAM_BACKEND == "stream":
+        if start_id is None:
+            start_id = await redis_stream.last_id(async_redis_client, chat_id)
+        return redis_stream.read(async_redis_client, chat_id, start_id)
+
+    pubsub = async_redis_client.pubsub()
+    await pubsub.subscribe(chat_id)
+    # NOTE: SUBSCRIBE only sends the command, wait for its confirmation so that
+    # nothing published from here on is missed
+    await pubsub.get_message(timeout=REDIS_POOL_TIMEOUT)
+    return listen_to_pubsub(pubsub)
+
+
+# NOTE: validated keys are remembered by their hash for API_KEY_CACHE_TTL seconds
+# and rejected keys for API_KEY_NEGATIVE_CACHE_TTL seconds. Transient failures
+# (rate limits, network errors) are not cached.
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", 600))
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", 60))
+api_key_cache = TTLCache(
+    maxsize=int(os.getenv("API_KEY_CACHE_SIZE", 1024)), ttl=API_KEY_CACHE_TTL
+)
 
 
 def validate_openai_api_key(api_key: str):
+    import openai
+
     try:
         client = openai.OpenAI(api_key=api_key)
         client.models.list()
@@ -99,102 +152,201 @@ def validate_openai_api_key(api_key: str):
     except openai.RateLimitError:
         return False, "OpenAI API Rate Limit Exceeded"
     except Exception as e:
-        print(e)
+        logger.warning(f"Could not validate the OpenAI API key: {e}")
         return False, "Unknown error"
     else:
         return True, None
 
 
+# NOTE: MPRestError only carries the status code in its message
+MP_AUTH_ERROR = re.compile(r"status code (401|403)\b")
+
+
 def validate_mp_api_key(api_key: str):
+    from mp_api.client import MPRester
+
     try:
         with MPRester(api_key) as mpr:
             mpr.get_material_id_references("mp-568")
-    except Exception as e:
-        print(e)
+    except ValueError:
+        # NOTE: MPRester rejects keys of the wrong length before any request
         return False, "Invalid MP API Key"
+    except Exception as e:
+        if MP_AUTH_ERROR.search(str(e)):
+            return False, "Invalid MP API Key"
+        logger.warning(f"Could not validate the MP API key: {e}")
+        return False, "MP API Unavailable"
     else:
         return True, None
 
 
-async def agent_stream(
-    input_data: str, chat_id: str, user_openai_api_key: str, user_mp_api_key: str, user_openai_org: str
+async def cached_validate(validator, api_key: str, rejected: str):
+    """Run `validator` off the event loop, caching its verdict per key.
+
+    Args:
+        validator: one of the `validate_*_api_key` functions
+        api_key: API key to validate
+        rejected: error message of a definitive rejection, which is cached for
+            API_KEY_NEGATIVE_CACHE_TTL seconds
+    """
+    key = (validator.__name__, hash_key(api_key))
+    result = api_key_cache.get(key)
+    if result is not None:
+        return result
+
+    result = await asyncio.to_thread(validator, api_key)
+    valid, error = result
+    if valid:
+        api_key_cache.set(key, result)
+    elif error == rejected:
+        api_key_cache.set(key, result, ttl=API_KEY_NEGATIVE_CACHE_TTL)
+    return result
+
+
+AGENT_GRAPH_CACHE_SIZE = int(os.getenv("AGENT_GRAPH_CACHE_SIZE", 64))
+AGENT_GRAPH_CACHE_TTL = float(os.getenv("AGENT_GRAPH_CACHE_TTL", 3600))
+agent_graph_cache = TTLCache(
+    maxsize=AGENT_GRAPH_CACHE_SIZE, ttl=AGENT_GRAPH_CACHE_TTL)
+
+# NOTE: experts that do not depend on per-request state and can be shared
+# across requests made with the same keys
+SHARED_EXPERTS = [
+    "MPThermoExpert",
+    "MPElasticityExpert",
+    "MPDielectricExpert",
+    "MPMagnetismExpert",
+    "MPElectronicExpert",
+    "MPPiezoelectricExpert",
+    "MPSummaryExpert",
+    "MPSynthesisExpert",
+    "MPStructureRetriever",
+]
+
+
+class AgentGraph:
+    """LLMs and MP experts shared by all the requests made with the same
+    OpenAI key, MP key and model.
+
+    Per-request state (chat_id, callbacks and memory) is injected by `tools` and
+    at invoke time, so the graph itself holds no request state.
+    """
+
+    def __init__(self, openai_api_key, mp_api_key, openai_org=None, model=OPENAI_GPT_MODEL):
+        from langchain_openai import ChatOpenAI
+
+        from llamp.mp import agents as mp_agents
+        from llamp.mp.tools import MaterialsJoin, MaterialsResultReader
+
+        self.mp_api_key = mp_api_key
+        self.mp_llm = ChatOpenAI(
+            temperature=0,
+            model=model,
+            openai_api_key=openai_api_key,
+            organization=openai_org,
+            max_retries=5,
+            streaming=True,
+        )
+        self.llm = ChatOpenAI(
+            temperature=0,
+            model=model,
+            organization=openai_org,
+            openai_api_key=openai_api_key,
+            streaming=True,
+        )
+        self.experts = [
+            getattr(mp_agents, expert)(llm=self.mp_llm, mp_api_key=mp_api_key)
+            for expert in SHARED_EXPERTS
+        ]
+        # NOTE: multi-property comparisons by material_ids are answered in one
+        # call instead of a round of experts
+        self.mp_tools = [
+            MaterialsJoin(handle_tool_error=True, mp_api_key=mp_api_key),
+            MaterialsResultReader(handle_tool_error=True),
+        ]
+
+    def tools(self, chat_id, callbacks):
+        from llamp.mp.agents import MPStructureVisualizer
+
+        tools = [
+            expert.as_tool(
+                agent_kwargs=dict(return_intermediate_steps=False),
+                callbacks=callbacks,
+            )
+            for expert in self.experts
+        ]
+        # NOTE: the visualizer publishes structures to the chat channel, so it is
+        # built per request
+        tools.append(
+            MPStructureVisualizer(
+                llm=self.mp_llm, chat_id=chat_id, mp_api_key=self.mp_api_key
+            ).as_tool(
+                agent_kwargs=dict(return_intermediate_steps=True),
+                callbacks=callbacks,
+            )
+        )
+        return tools + self.mp_tools + search_tools()
+
+
+async def get_agent_graph(openai_api_key, mp_api_key, openai_org=None, model=OPENAI_GPT_MODEL):
+    key = hash_key(openai_api_key, mp_api_key, openai_org, model)
+    graph = agent_graph_cache.get(key)
+    if graph is None:
+        graph = await asyncio.to_thread(
+            AgentGraph, openai_api_key, mp_api_key, openai_org, model)
+        agent_graph_cache.set(key, graph)
+    return graph
+
+
+# NOTE: agent runs of disconnected clients on the stream backend, referenced
+# until they finish so that they are not garbage collected
+detached_runs: set[asyncio.Task] = set()
+
+
+async def agent_events(
+    input_data: str,
+    chat_id: str,
+    user_openai_api_key: str,
+    user_mp_api_key: str,
+    user_openai_org: str,
+    start_id: str | None = None,
 ):
+    from langchain.agents import AgentType, initialize_agent
+    from langchain.memory import ConversationBufferMemory, RedisChatMessageHistory
+
     top_level_cb = StreamingRedisCallbackHandler(
-        redis_host=REDIS_HOST, redis_port=REDIS_PORT, redis_channel=chat_id, redis_password=REDIS_PASSWORD
+        redis_channel=chat_id,
+        redis_client=redis_client,
+        async_redis_client=async_redis_client,
+        coalesce=STREAM_COALESCE_TOKENS,
+        backend=STREAM_BACKEND,
     )
     bottom_level_cb = StreamingRedisCallbackHandler(
-        redis_host=REDIS_HOST, redis_port=REDIS_PORT, redis_channel=chat_id, redis_password=REDIS_PASSWORD, level=1,
+        redis_channel=chat_id,
+        redis_client=redis_client,
+        async_redis_client=async_redis_client,
+        coalesce=STREAM_COALESCE_TOKENS,
+        level=1,
+        backend=STREAM_BACKEND,
     )
 
-    mp_llm = ChatOpenAI(
-        temperature=0,
-        model=OPENAI_GPT_MODEL,
-        openai_api_key=user_openai_api_key,
-        organization=user_openai_org,
-        max_retries=5,
-        streaming=True,
-        callbacks=[bottom_level_cb],
-    )
-
-    tools = load_tools(["llm-math"], llm=mp_llm)
-    tools += [PythonREPLTool()]
-    tools = [
-        MPThermoExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPElasticityExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPDielectricExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPMagnetismExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPElectronicExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPPiezoelectricExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPSummaryExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPSynthesisExpert(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        MPStructureVisualizer(llm=mp_llm, chat_id=chat_id, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=True)
-        ),
-        MPStructureRetriever(llm=mp_llm, mp_api_key=user_mp_api_key).as_tool(
-            agent_kwargs=dict(return_intermediate_steps=False)
-        ),
-        arxiv,
-        wikipedia,
-    ]
+    graph = await get_agent_graph(
+        user_openai_api_key, user_mp_api_key, user_openai_org)
+    # NOTE: stops the top-level and expert executors once the client is gone
+    cancellation_cb = CancellationCallbackHandler()
+    tools = graph.tools(chat_id, callbacks=[bottom_level_cb, cancellation_cb])
     chat_id = chat_id.strip()
-    REDIS_URL = ""
-    if REDIS_PASSWORD is not None:
-        REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0"
-    else:
-        REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+    chat_history = RedisChatMessageHistory(
+        url=redis_url(),
+        session_id=chat_id,
+    )
+    # NOTE: swap in the pooled client so chat history does not open its own
+    chat_history.redis_client = redis_client
     conversation_redis_memory = ConversationBufferMemory(
         memory_key=chat_id,
-        chat_memory=RedisChatMessageHistory(
-            url=REDIS_URL,
-            session_id=chat_id,
-        ),
+        chat_memory=chat_history,
         return_messages=True
     )
 
-    llm = ChatOpenAI(
-        temperature=0,
-        model=OPENAI_GPT_MODEL,
-        organization=user_openai_org,
-        openai_api_key=user_openai_api_key,
-        streaming=True,
-        callbacks=[top_level_cb],
-    )
     PREFIX = """
     You are a data-aware agent that can consult materials-related
     data through Materials Project (MP) database, arXiv, Wikipedia, and a python 
@@ -218,32 +370,59 @@ async def agent_stream(
     agent_executor = initialize_agent(
         agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
         tools=tools,
-        llm=llm,
+        llm=graph.llm,
         verbose=True,
         max_iterations=5,
         handle_parsing_errors=True,
-        callback_manager=BaseCallbackManager(
-            handlers=[top_level_cb]),
         memory=conversation_redis_memory,
         agent_kwargs={
             'prefix': PREFIX,
             'suffix': SUFFIX,
         },
     )
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(chat_id)
+    messages = await subscribe_to_chat(chat_id, start_id)
 
     ainvoke_task = asyncio.create_task(
-        agent_executor.ainvoke({"input": input_data}))
+        agent_executor.ainvoke(
+            {"input": input_data},
+            config={"callbacks": [top_level_cb, cancellation_cb]}))
 
-    async for message in listen_to_pubsub(pubsub):
-        if message == "AGENT_FINISH":
+    finished = False
+    try:
+        async for message_id, message in messages:
+            event = events.decode(message)
+            yield message_id, event
+            if events.is_terminal(event):
+                finished = True
+                break
+    finally:
+        # NOTE: reached on a terminal event but also when the client disconnects,
+        # in which case the stream is cancelled or closed mid-turn
+        if ainvoke_task.done():
+            pass
+        elif not finished and STREAM_BACKEND == "stream":
+            # NOTE: the rest of the turn is kept in the stream, let the run
+            # finish so that the client can resume it
+            logger.info(f"Chat {chat_id} client disconnected, agent run left to finish")
+            detached_runs.add(ainvoke_task)
+            ainvoke_task.add_done_callback(detached_runs.discard)
+        else:
+            if not finished:
+                logger.info(f"Chat {chat_id} client disconnected, cancelling agent run")
+                metrics.incr("cancelled_runs")
+            cancellation_cb.cancel()
             ainvoke_task.cancel()
-            break
-        yield message.encode("utf-8")
+        await messages.aclose()
 
     # Ensure ainvoke_task is also completed before exiting
-    await ainvoke_task
+    await asyncio.gather(ainvoke_task, return_exceptions=True)
+
+
+async def count_request_metrics(chat_id, stream_generator):
+    with metrics.request_scope() as counts:
+        async for data in stream_generator:
+            yield data
+    logger.debug(f"Chat {chat_id} request metrics: {dict(counts)}")
 
 
 async def prepend_chat_id_to_stream(chat_id, stream_generator):
@@ -252,28 +431,167 @@ async def prepend_chat_id_to_stream(chat_id, stream_generator):
         yield data
 
 
-@app.post("/api/chat")
-async def chat(query: Query):
+async def text_stream(event_stream):
+    """Render chat events as the legacy text/plain stream."""
+    async for _, event in event_stream:
+        text = events.to_text(event)
+        if text is not None:
+            yield text.encode("utf-8")
+
+
+async def with_heartbeats(event_stream, interval: float):
+    """Yield ``None`` whenever `event_stream` is idle for `interval` seconds."""
+    iterator = event_stream.__aiter__()
+    next_item = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_item}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            next_item = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        next_item.cancel()
+
+
+async def sse_stream(event_stream):
+    """Render chat events as text/event-stream with periodic heartbeats."""
+    async for item in with_heartbeats(event_stream, SSE_HEARTBEAT_INTERVAL):
+        if item is None:
+            yield events.heartbeat().encode()
+            continue
+        message_id, event = item
+        yield events.to_sse(event, message_id).encode("utf-8")
+
+
+async def stored_events(chat_id: str, last_id: str):
+    """Replay the chat stream after `last_id` until the turn ends."""
+    async for message_id, message in redis_stream.read(
+            async_redis_client, chat_id, last_id):
+        event = events.decode(message)
+        yield message_id, event
+        if events.is_terminal(event):
+            break
+
+
+async def prepare_chat(query: Query) -> str:
+    """Validate the keys of a chat query and return its chat_id."""
     chat_id = query.chat_id
     if query.chat_id is None or query.chat_id == "":
-        while redis_client.exists(chat_id := str(uuid.uuid4())):
+        while await async_redis_client.exists(chat_id := str(uuid.uuid4())):
             pass
 
-    valid, error = validate_openai_api_key(query.OpenAiAPIKey)
-    if not valid:
-        raise HTTPException(status_code=400, detail=error)
+    validations = await asyncio.gather(
+        cached_validate(
+            validate_openai_api_key, query.OpenAiAPIKey, "Invalid OpenAI API Key"
+        ),
+        cached_validate(validate_mp_api_key, query.mpAPIKey, "Invalid MP API Key"),
+    )
+    for valid, error in validations:
+        if not valid:
+            raise HTTPException(status_code=400, detail=error)
+    return chat_id
+
+
+async def start_turn(chat_id: str) -> tuple[str | None, dict[str, str]]:
+    """Mark the start of a chat turn and return its start ID and headers.
 
-    valid, error = validate_mp_api_key(query.mpAPIKey)
-    if not valid:
-        raise HTTPException(status_code=400, detail=error)
+    With the stream backend, the ID after which the turn starts is returned in
+    the ``X-Stream-Start`` header, so that a client that disconnects before
+    receiving any entry can resume the turn from it.
+    """
+    headers = {"X-Chat-Id": chat_id}
+    if STREAM_BACKEND != "stream":
+        return None, headers
+    start_id = await redis_stream.start_turn(async_redis_client, chat_id)
+    return start_id, {**headers, "X-Stream-Start": start_id}
+
+
+@app.post("/api/chat")
+async def chat(query: Query):
+    """Stream the answer to `query` as text/plain, after a ``[chat_id]`` line.
+
+    The text carries no entry IDs: with the stream backend, a client that loses
+    the stream replays the whole turn with /api/chat/{chat_id}/stream from the
+    ``X-Stream-Start`` header.
+    """
+    chat_id = await prepare_chat(query)
+    start_id, headers = await start_turn(chat_id)
 
     return StreamingResponse(
-        prepend_chat_id_to_stream(chat_id, agent_stream(
-            query.text, chat_id, query.OpenAiAPIKey, query.mpAPIKey, query.OpenAiOrg)),
+        count_request_metrics(chat_id, prepend_chat_id_to_stream(chat_id, text_stream(
+            agent_events(query.text, chat_id, query.OpenAiAPIKey, query.mpAPIKey,
+                         query.OpenAiOrg, start_id=start_id)))),
         media_type="text/plain",
+        headers=headers,
     )
 
 
+@app.post("/api/chat/sse")
+async def chat_sse(query: Query):
+    """Same as /api/chat as a text/event-stream of typed events.
+
+    The chat_id is returned in the ``X-Chat-Id`` header and, with the stream
+    backend, the ID the turn starts after in the ``X-Stream-Start`` header.
+    """
+    chat_id = await prepare_chat(query)
+    start_id, headers = await start_turn(chat_id)
+
+    return StreamingResponse(
+        count_request_metrics(chat_id, sse_stream(
+            agent_events(query.text, chat_id, query.OpenAiAPIKey, query.mpAPIKey,
+                         query.OpenAiOrg, start_id=start_id))),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, **headers},
+    )
+
+
+async def resume_from(chat_id: str, last_id: str | None) -> str:
+    """Return the ID to resume a chat stream after, the start of its latest turn
+    if the client received no entry."""
+    if STREAM_BACKEND != "stream":
+        raise HTTPException(status_code=404, detail="Resumable streams are disabled")
+    # NOTE: a turn that has started may have no entry yet
+    if not await async_redis_client.exists(
+            redis_stream.stream_key(chat_id), redis_stream.turn_key(chat_id)):
+        raise HTTPException(status_code=404, detail="Chat stream not found")
+    return last_id or await redis_stream.turn_start(async_redis_client, chat_id)
+
+
+@app.get("/api/chat/{chat_id}/sse")
+async def resume_chat_sse(chat_id: str, last_event_id: str | None = Header(None)):
+    """Resume a text/event-stream after the ``Last-Event-ID`` it received."""
+    last_id = await resume_from(chat_id, last_event_id)
+
+    return StreamingResponse(
+        sse_stream(stored_events(chat_id, last_id)),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Chat-Id": chat_id},
+    )
+
+
+@app.get("/api/chat/{chat_id}/stream")
+async def resume_chat(chat_id: str, last_id: str | None = None):
+    """Replay a chat stream after `last_id` without starting a new agent run.
+
+    Entries are streamed as JSON lines ``{"id": ..., "data": ...}`` until the
+    agent finishes, so a reconnecting client can resume from the last ID it
+    received. Without `last_id`, the latest turn is replayed from its start.
+    """
+    last_id = await resume_from(chat_id, last_id)
+
+    async def entries():
+        async for entry_id, event in stored_events(chat_id, last_id):
+            yield (json.dumps({"id": entry_id, "data": event}) + "\n").encode()
+
+    return StreamingResponse(entries(), media_type="application/x-ndjson")
+
+
 @app.get("/api/structures/{material_id}")
 async def get_structure(material_id: str):
     material = redis_client.get(material_id)
@@ -0,0 +1,98 @@
+"""Fan-out of queries over long lists of material IDs.
+
+A query on hundreds of `material_ids` sent as one request can exceed URL
+limits or time out. The IDs are split into evenly sized batches of at most
+``MP_IDS_BATCH_SIZE`` IDs that run concurrently, on a bounded thread pool or
+as bounded coroutines, and their results are concatenated in the original
+order. Every batch is timed and logged.
+
+Configuration:
+
+- ``MP_IDS_BATCH_SIZE``: maximum IDs per request
+- ``MP_IDS_MAX_WORKERS``: maximum batches in flight
+"""
+
+import asyncio
+import contextvars
+import logging
+import math
+import os
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MP_IDS_BATCH_SIZE = int(os.getenv("MP_IDS_BATCH_SIZE", 100))
+MP_IDS_MAX_WORKERS = int(os.getenv("MP_IDS_MAX_WORKERS", 8))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MP_IDS_MAX_WORKERS, thread_name_prefix="mp-ids"
+        )
+    return _executor
+
+
+def split_ids(ids: list[str], max_size: int = MP_IDS_BATCH_SIZE) -> list[list[str]]:
+    """Split `ids` into the fewest batches of at most `max_size`, evenly sized."""
+    if not ids:
+        return []
+    size = math.ceil(len(ids) / math.ceil(len(ids) / max_size))
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def _record(label: str, index: int, total: int, batch: list, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    metrics.incr("mp_id_batches")
+    metrics.incr("mp_id_batch_ms", int(elapsed * 1000))
+    logger.info(f"{label} batch {index + 1}/{total}: {len(batch)} ids in {elapsed:.2f}s")
+
+
+def fan_out(fn: Callable[[list[str]], Any], batches: list[list[str]], label: str = "mp") -> list:
+    """Return ``[fn(batch) for batch in batches]``, computed concurrently."""
+
+    def timed(index: int, batch: list[str]):
+        start = time.perf_counter()
+        try:
+            return fn(batch)
+        finally:
+            _record(label, index, len(batches), batch, start)
+
+    # NOTE: each batch runs in a copy of the caller's context, like
+    # asyncio.to_thread, so that its metrics count towards the caller's request
+    futures = [
+        _get_executor().submit(contextvars.copy_context().run, timed, index, batch)
+        for index, batch in enumerate(batches)
+    ]
+    return [future.result() for future in futures]
+
+
+async def afan_out(
+    fn: Callable[[list[str]], Awaitable[Any]], batches: list[list[str]], label: str = "mp"
+) -> list:
+    """Async `fan_out`, with at most MP_IDS_MAX_WORKERS batches awaited at once."""
+    semaphore = asyncio.Semaphore(MP_IDS_MAX_WORKERS)
+
+    async def timed(index: int, batch: list[str]):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                return await fn(batch)
+            finally:
+                _record(label, index, len(batches), batch, start)
+
+    return await asyncio.gather(
+        *(timed(index, batch) for index, batch in enumerate(batches))
+    )
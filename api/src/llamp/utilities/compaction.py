@@ -0,0 +1,211 @@
+"""Token-budgeted compaction of MP tool observations.
+
+Raw MP responses go straight into the scratchpad of the expert agents and are
+sent again with every later ReAct step. Observations are rendered as a compact
+table in CSV or markdown, or, in json, only once they exceed
+``OBSERVATION_TOKEN_BUDGET`` tokens:
+
+- one header of (flattened) column names instead of keys repeated per row
+- floats rounded to ``OBSERVATION_PRECISION`` significant digits
+- small nested objects (``symmetry``, ...) flattened into dotted columns,
+  large ones (``structure``, ...) and long arrays (tensors, sites, ...)
+  summarized by their size and range
+- rows beyond the budget dropped, with a count of what was left out
+
+Whenever rows are dropped or values summarized, the full response is kept in
+the result store under a handle, so that the agent can read the rest with the
+``read_mp_result`` tool.
+
+Configuration:
+
+- ``OBSERVATION_FORMAT``: table format of observations, csv (default),
+  markdown or json
+- ``OBSERVATION_TOKEN_BUDGET``: maximum tokens of an observation
+- ``OBSERVATION_PRECISION``: significant digits of floats
+"""
+
+import csv
+import io
+import json
+import logging
+import math
+import os
+from functools import cache
+from typing import Any
+
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+from llamp.utilities.result_store import get_result_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OBSERVATION_TOKEN_BUDGET = int(os.getenv("OBSERVATION_TOKEN_BUDGET", 2000))
+OBSERVATION_PRECISION = int(os.getenv("OBSERVATION_PRECISION", 4))
+OBSERVATION_FORMAT = os.getenv("OBSERVATION_FORMAT", "csv")
+MAX_ARRAY_ITEMS = 9
+
+
+@cache
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # NOTE: the encoding is downloaded on first use, offline it may be missing
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens of `text`, estimated as 4 characters per token without tiktoken."""
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _round(value: float, precision: int = OBSERVATION_PRECISION) -> float:
+    if value == 0 or not math.isfinite(value):
+        return value
+    return round(value, precision - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def _numbers(value: Any) -> list[float] | None:
+    """Flatten a (nested) list of numbers, or None if it holds anything else."""
+    numbers = []
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, (int, float)) and not isinstance(item, bool):
+            numbers.append(item)
+        else:
+            return None
+    return numbers
+
+
+def compact_value(value: Any) -> Any:
+    """Round floats and summarize long arrays and deeply nested objects."""
+    if isinstance(value, float):
+        return _round(value)
+    if isinstance(value, list):
+        numbers = _numbers(value)
+        if numbers is not None and len(numbers) > MAX_ARRAY_ITEMS:
+            return f"<{len(numbers)} values in [{_round(min(numbers))}, {_round(max(numbers))}]>"
+        if numbers is None and len(value) > MAX_ARRAY_ITEMS:
+            return f"<list of {len(value)}>"
+        return [compact_value(v) for v in value]
+    if isinstance(value, dict):
+        return f"<object with {len(value)} keys>"
+    return value
+
+
+def _flatten(doc: dict) -> tuple[dict, bool]:
+    """Flatten one level of nested objects into dotted keys.
+
+    Returns the flat document and whether any value had to be summarized.
+    """
+    flat, lossy = {}, False
+    for key, value in doc.items():
+        if isinstance(value, dict) and len(value) <= MAX_ARRAY_ITEMS:
+            items = ((f"{key}.{subkey}", subvalue) for subkey, subvalue in value.items())
+        else:
+            items = [(key, value)]
+        for name, item in items:
+            flat[name] = compact_value(item)
+            lossy |= isinstance(item, (list, dict)) and isinstance(flat[name], str)
+    return flat, lossy
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _render_csv(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow([_cell(v) for v in values])
+    return buffer.getvalue()
+
+
+def _render_markdown(values: list) -> str:
+    return "| " + " | ".join(_cell(v).replace("|", "\\|") for v in values) + " |"
+
+
+def _render_json(values: list) -> str:
+    return json.dumps(values, default=str)
+
+
+RENDERERS = {
+    "json": (_render_json, "as [columns] then one row per line"),
+    "csv": (_render_csv, "as CSV"),
+    "markdown": (_render_markdown, "as a markdown table"),
+}
+
+
+def compact_table(docs: list[dict], budget: int, format: str = "json") -> str:
+    """Render `docs` as a header-plus-rows table of at most about `budget` tokens.
+
+    If rows are dropped or nested values summarized, the full documents are
+    put in the result store and the table refers to them by handle.
+    """
+    try:
+        render, description = RENDERERS[format]
+    except KeyError:
+        raise ValueError(f"Unknown observation format `{format}`")
+
+    flattened = [_flatten(doc) for doc in docs]
+    rows = [row for row, _ in flattened]
+    lossy = any(lossy for _, lossy in flattened)
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+
+    lines = [render(columns)]
+    if format == "markdown":
+        lines.append("|" + "---|" * len(columns))
+    used = sum(count_tokens(line) for line in lines)
+    for count, row in enumerate(rows):
+        line = render([row.get(column) for column in columns])
+        used += count_tokens(line)
+        if used > budget and count > 0:
+            lines.append(f"... {len(rows) - count} more rows not shown")
+            lossy = True
+            break
+        lines.append(line)
+
+    header = f"{len(docs)} results {description}"
+    if lossy:
+        handle = get_result_store().put(docs)
+        header += f", read the rest with read_mp_result and handle {handle}"
+    return header + "\n" + "\n".join(lines)
+
+
+def compact_observation(
+    response: Any, budget: int = OBSERVATION_TOKEN_BUDGET, format: str = OBSERVATION_FORMAT
+) -> Any:
+    """Return `response` as a table in `format`, cut down to `budget` tokens.
+
+    Lists of documents are always rendered as a table in csv and markdown; in
+    json, responses within the budget are returned unchanged.
+    """
+    if not response or not isinstance(response, list) or not all(
+        isinstance(doc, dict) for doc in response
+    ):
+        return response
+    tokens = count_tokens(json.dumps(response, default=str))
+    if format == "json" and tokens <= budget:
+        return response
+
+    compacted = compact_table(response, budget, format=format)
+    metrics.incr("observations_compacted")
+    metrics.incr("observation_tokens_saved", max(tokens - count_tokens(compacted), 0))
+    return compacted
@@ -0,0 +1,100 @@
+"""Bitmask index of the element sets of materials.
+
+Every material's element set is encoded as a 128-bit mask split into two
+``uint64`` arrays, bit ``Z - 1`` standing for the element of atomic number
+``Z``. The ``elements``, ``exclude_elements`` and ``chemsys`` filters then become
+bitwise operations over the whole index:
+
+- contains all of: ``mask & query == query``
+- contains none of: ``mask & query == 0``
+- exactly this chemical system: ``mask == query``
+- wildcard chemical system (``Fe-*-O``): contains the known elements and has
+  as many elements as the system
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+
+SYMBOLS = """
+H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn
+Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce
+Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn
+Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm Md No Lr Rf Db Sg Bh Hs Mt Ds Rg Cn Nh Fl
+Mc Lv Ts Og
+""".split()
+
+BITS = {symbol: z for z, symbol in enumerate(SYMBOLS)}
+
+
+def encode(elements: Iterable[str]) -> tuple[int, int]:
+    """Return the (low, high) 64-bit halves of the mask of `elements`."""
+    lo = hi = 0
+    for element in elements:
+        try:
+            bit = BITS[element.strip()]
+        except KeyError:
+            raise ValueError(f"Unknown element `{element}`")
+        if bit < 64:
+            lo |= 1 << bit
+        else:
+            hi |= 1 << (bit - 64)
+    return lo, hi
+
+
+class ElementSetIndex:
+    """Element-set masks of a list of materials.
+
+    Args:
+        lo: bits of the elements Z = 1-64
+        hi: bits of the elements Z = 65-118
+        counts: number of elements of every material
+    """
+
+    def __init__(self, lo: np.ndarray, hi: np.ndarray, counts: np.ndarray):
+        self.lo = lo
+        self.hi = hi
+        self.counts = counts
+
+    @classmethod
+    def from_element_sets(cls, element_sets: Iterable[Iterable[str]]) -> "ElementSetIndex":
+        masks = [encode(elements) for elements in element_sets]
+        lo = np.fromiter((m[0] for m in masks), dtype=np.uint64, count=len(masks))
+        hi = np.fromiter((m[1] for m in masks), dtype=np.uint64, count=len(masks))
+        return cls(lo, hi, _popcount(lo) + _popcount(hi))
+
+    @classmethod
+    def from_chemsys(cls, chemsys: Iterable[str]) -> "ElementSetIndex":
+        return cls.from_element_sets(s.split("-") if s else [] for s in chemsys)
+
+    def __len__(self) -> int:
+        return len(self.lo)
+
+    def contains_all(self, elements: Iterable[str]) -> np.ndarray:
+        lo, hi = (np.uint64(m) for m in encode(elements))
+        return ((self.lo & lo) == lo) & ((self.hi & hi) == hi)
+
+    def contains_none(self, elements: Iterable[str]) -> np.ndarray:
+        lo, hi = (np.uint64(m) for m in encode(elements))
+        return ((self.lo & lo) == 0) & ((self.hi & hi) == 0)
+
+    def chemsys(self, chemsys: str) -> np.ndarray:
+        """Materials of the chemical system `chemsys`, ``*`` matching any element."""
+        elements = [e for e in chemsys.split("-") if e != "*"]
+        if len(elements) == chemsys.count("-") + 1:
+            lo, hi = (np.uint64(m) for m in encode(elements))
+            return (self.lo == lo) & (self.hi == hi)
+        return self.contains_all(elements) & (self.counts == chemsys.count("-") + 1)
+
+    def any_chemsys(self, systems: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        for chemsys in systems:
+            mask |= self.chemsys(chemsys)
+        return mask
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks).astype(np.uint8)
+    # NOTE: numpy < 2, count the bits byte by byte
+    return np.unpackbits(masks.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1).astype(np.uint8)
@@ -0,0 +1,210 @@
+"""Index from reduced formula and chemical system to material_ids.
+
+The dielectric, piezoelectric, magnetism and elasticity endpoints cannot be
+filtered by formula, so the wrapper first resolves the formula to material_ids
+with a summary query and only then sends the real one: two serial round trips
+for every formula-based request. The index answers the first hop locally:
+
+- from the summary mirror when ``LLAMP_MP_MIRROR`` is set, memory-mapped and
+  shared by the workers through the page cache
+- otherwise from a Redis hash shared by all the workers, refreshed in bulk
+  with ``python -m llamp.utilities.formula_index``
+
+Formulas that cannot be resolved locally (wildcards, anonymous formulas, no
+index built, or any of them missing from the index) return None and are
+resolved with the API as before.
+
+Configuration:
+
+- ``FORMULA_INDEX_REDIS``: read the Redis hash when there is no mirror
+- ``FORMULA_INDEX_KEY``: name of the Redis hash
+"""
+
+import logging
+import os
+from collections import defaultdict
+from collections.abc import Iterable
+
+import numpy as np
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+from llamp.utilities.mirror import get_mirror
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FORMULA_INDEX_REDIS = os.getenv("FORMULA_INDEX_REDIS", "false").lower() in ("1", "true", "yes")
+FORMULA_INDEX_KEY = os.getenv("FORMULA_INDEX_KEY", "mp:formula_index")
+
+INDEX_FIELDS = ["material_id", "formula_pretty", "chemsys"]
+
+
+def reduced_formula(formula: str) -> str | None:
+    """Return the reduced formula as written by MP (``formula_pretty``), or None
+    if `formula` is not a plain chemical formula."""
+    from pymatgen.core import Composition
+
+    if "*" in formula:
+        return None
+    try:
+        return Composition(formula.strip()).reduced_formula
+    except Exception:
+        return None
+
+
+def build_entries(docs: Iterable[dict]) -> dict[str, str]:
+    """Return the hash entries ``formula:<formula>`` and ``chemsys:<chemsys>``
+    to comma-separated material_ids of the summary `docs`."""
+    entries = defaultdict(list)
+    for doc in docs:
+        if doc.get("deprecated"):
+            continue
+        if doc.get("formula_pretty"):
+            entries[f"formula:{doc['formula_pretty']}"].append(doc["material_id"])
+        if doc.get("chemsys"):
+            entries[f"chemsys:{doc['chemsys']}"].append(doc["material_id"])
+    return {key: ",".join(material_ids) for key, material_ids in entries.items()}
+
+
+def refresh(redis_client, docs: Iterable[dict], key: str = FORMULA_INDEX_KEY) -> int:
+    """Rebuild the Redis hash from the summary `docs` and return its size.
+
+    The new hash is written under a temporary key and renamed, so readers never
+    see a partial index.
+    """
+    entries = build_entries(docs)
+    staging = f"{key}:staging"
+    redis_client.delete(staging)
+    items = list(entries.items())
+    for start in range(0, len(items), 10000):
+        redis_client.hset(staging, mapping=dict(items[start:start + 10000]))
+    if items:
+        redis_client.rename(staging, key)
+    return len(items)
+
+
+class FormulaIndex:
+    """Resolver of formulas and chemical systems to material_ids.
+
+    Args:
+        use_redis: read the Redis hash when there is no mirror
+        key: name of the Redis hash
+    """
+
+    def __init__(self, use_redis: bool = FORMULA_INDEX_REDIS, key: str = FORMULA_INDEX_KEY):
+        self.key = key
+        self._redis = None
+        if use_redis:
+            from llamp.utilities.redis_pool import get_redis_client
+
+            self._redis = get_redis_client()
+
+    def _from_mirror(self, name: str, values: list[str]) -> list[dict] | None:
+        mirror = get_mirror()
+        if mirror is None:
+            return None
+        table = mirror.table
+        if name == "formula":
+            mask = table.equals_mask("formula_pretty", values)
+        elif mirror.elements is not None:
+            mask = mirror.elements.any_chemsys(values)
+        else:
+            return None
+        if "deprecated" in table.columns:
+            mask &= ~np.asarray(table.columns["deprecated"], dtype=bool)
+        column = "formula_pretty" if name == "formula" else "chemsys"
+        docs = table.filter(mask).to_docs(["material_id", column])
+        # NOTE: a value without materials may be newer than the index, the
+        # API has the last word
+        if set(values) - {doc[column] for doc in docs}:
+            return None
+        return docs
+
+    def _from_redis(self, name: str, values: list[str]) -> list[dict] | None:
+        if self._redis is None:
+            return None
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            exists, entries = pipe.exists(self.key).hmget(
+                self.key, [f"{name}:{value}" for value in values]
+            ).execute()
+        except Exception as e:
+            logger.warning(f"Formula index Redis hash unavailable: {e}")
+            return None
+        if not exists or None in entries:
+            return None
+        return [
+            {"material_id": material_id}
+            for entry in entries
+            for material_id in (entry.decode() if isinstance(entry, bytes) else entry).split(",")
+        ]
+
+    def material_ids(self, formula: str | list[str] | None = None, chemsys: str | list[str] | None = None) -> list[str] | None:
+        """Return the material_ids matching any of `formula` or any of `chemsys`,
+        or None if they cannot be resolved locally."""
+        if (formula is None) == (chemsys is None):
+            raise ValueError("Exactly one of `formula` and `chemsys` must be given")
+        # NOTE: without any index, skip parsing the formulas and go to the API
+        if self._redis is None and get_mirror() is None:
+            metrics.incr("formula_index_misses")
+            return None
+        name, values = ("formula", formula) if formula is not None else ("chemsys", chemsys)
+        if isinstance(values, str):
+            values = values.split(",")
+
+        if name == "formula":
+            values = [reduced_formula(value) for value in values]
+        else:
+            values = [
+                "-".join(sorted(e.strip() for e in value.split("-")))
+                if "*" not in value else None
+                for value in values
+            ]
+        if not values or None in values:
+            metrics.incr("formula_index_misses")
+            return None
+
+        docs = self._from_mirror(name, values)
+        if docs is None:
+            docs = self._from_redis(name, values)
+        if docs is None:
+            metrics.incr("formula_index_misses")
+            return None
+        metrics.incr("formula_index_hits")
+        return list(dict.fromkeys(doc["material_id"] for doc in docs))
+
+
+_index: FormulaIndex | None = None
+
+
+def get_formula_index() -> FormulaIndex:
+    """Return the process-wide formula index."""
+    global _index
+    if _index is None:
+        _index = FormulaIndex()
+    return _index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from llamp.utilities.mirror import Mirror
+    from llamp.utilities.redis_pool import get_redis_client
+
+    parser = argparse.ArgumentParser(description="Rebuild the formula index Redis hash.")
+    parser.add_argument("--mirror", help="mirror directory to build the index from")
+    parser.add_argument("--api-key", default=os.getenv("MP_API_KEY"))
+    args = parser.parse_args()
+
+    if args.mirror:
+        docs = Mirror(args.mirror).table.to_docs(INDEX_FIELDS + ["deprecated"])
+    else:
+        from llamp.utilities.mp import get_mprester
+
+        docs = get_mprester(args.api_key).materials.summary._search(
+            num_chunks=None, chunk_size=1000, all_fields=False,
+            fields=INDEX_FIELDS, deprecated=False,
+        )
+    print(f"{refresh(get_redis_client(), docs)} entries written to {FORMULA_INDEX_KEY}")
@@ -0,0 +1,43 @@
+"""Process-wide counters for instrumenting the API server.
+
+Counters are kept for the whole process and, when a request scope is active,
+for the current request as well, so that per-request costs (e.g. Redis
+connections or MPRester sessions opened) can be reported next to the totals.
+"""
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_totals: Counter = Counter()
+_lock = threading.Lock()
+_request_counts: ContextVar[Counter | None] = ContextVar(
+    "llamp_request_counts", default=None
+)
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Increment counter `name` for the process and the active request."""
+    with _lock:
+        _totals[name] += value
+        counts = _request_counts.get()
+        if counts is not None:
+            counts[name] += value
+
+
+def snapshot() -> dict[str, int]:
+    """Return a copy of the process-wide counters."""
+    with _lock:
+        return dict(_totals)
+
+
+@contextmanager
+def request_scope():
+    """Collect the counters incremented within the block into a new Counter."""
+    counts = Counter()
+    token = _request_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _request_counts.reset(token)
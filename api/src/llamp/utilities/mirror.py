@@ -0,0 +1,306 @@
+"""Local mirror of the MP summary collection.
+
+Most summary queries are range, equality and element filters over a handful of
+scalar fields. The mirror snapshots those fields into a directory of ``.npy``
+columns that every worker memory-maps, so the pages are shared through the OS
+page cache, and answers such queries locally with vectorized predicates over a
+`DocTable`. Queries using a filter, field or sort that is not mirrored return
+None and go to the API as before.
+
+Layout of a mirror directory:
+
+- ``manifest.json``: number of rows, database version and mirrored columns
+- ``<column>.npy``: one array per column, strings as fixed-width unicode
+- ``<column>.nulls.npy``: mask of the missing values, for columns that have any
+- ``elements.{lo,hi,counts}.npy``: element-set bitmasks of the materials, see
+  `llamp.utilities.element_index`
+
+Build a mirror from a JSON fixture (a list of summary documents) or from the
+API with::
+
+    python -m llamp.utilities.mirror <directory> --fixture summary.json
+    python -m llamp.utilities.mirror <directory> --api-key <MP_API_KEY>
+
+and point ``LLAMP_MP_MIRROR`` at the directory to enable it.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+from llamp.utilities.element_index import ElementSetIndex
+from llamp.utilities.table import DocTable, column_from_values
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLAMP_MP_MIRROR = os.getenv("LLAMP_MP_MIRROR")
+
+# NOTE: summary fields returned as-is
+OUTPUT_FIELDS = [
+    "material_id",
+    "formula_pretty",
+    "chemsys",
+    "nsites",
+    "nelements",
+    "volume",
+    "density",
+    "density_atomic",
+    "uncorrected_energy_per_atom",
+    "energy_per_atom",
+    "formation_energy_per_atom",
+    "energy_above_hull",
+    "equilibrium_reaction_energy_per_atom",
+    "band_gap",
+    "efermi",
+    "total_magnetization",
+    "num_magnetic_sites",
+    "num_unique_magnetic_sites",
+    "universal_anisotropy",
+    "homogeneous_poisson",
+    "is_stable",
+    "theoretical",
+    "is_gap_direct",
+    "is_metal",
+    "deprecated",
+]
+
+# NOTE: nested values flattened under the name of their query parameter, they
+# can be filtered on but are not returned
+FILTER_FIELDS = {
+    "k_voigt": ("bulk_modulus", "voigt"),
+    "k_reuss": ("bulk_modulus", "reuss"),
+    "k_vrh": ("bulk_modulus", "vrh"),
+    "g_voigt": ("shear_modulus", "voigt"),
+    "g_reuss": ("shear_modulus", "reuss"),
+    "g_vrh": ("shear_modulus", "vrh"),
+    "spacegroup_number": ("symmetry", "number"),
+}
+
+SNAPSHOT_FIELDS = OUTPUT_FIELDS + sorted({path[0] for path in FILTER_FIELDS.values()})
+
+# NOTE: query parameters handled outside of the column filters
+PAGING_PARAMS = {"fields", "_limit", "_sort_fields"}
+
+
+def _value(doc: dict, path: tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def _storable(column: np.ndarray, nulls: np.ndarray | None) -> np.ndarray | None:
+    """Convert an object column to a memory-mappable dtype, or None if it cannot be."""
+    if column.dtype != object:
+        return column
+    present = column if nulls is None else column[~nulls]
+    if all(isinstance(v, bool) for v in present):
+        return np.array([bool(v) for v in column], dtype=bool)
+    if all(isinstance(v, str) for v in present):
+        return np.array(["" if v is None else v for v in column], dtype=str)
+    return None
+
+
+def build_mirror(docs: list[dict], directory: str | Path, database_version: str | None = None) -> Path:
+    """Write the mirrored columns of the summary `docs` to `directory`."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    paths = {field: (field,) for field in OUTPUT_FIELDS}
+    paths.update(FILTER_FIELDS)
+
+    columns = []
+    for name, path in paths.items():
+        column, nulls = column_from_values([_value(doc, path) for doc in docs])
+        column = _storable(column, nulls)
+        if column is None:
+            logger.warning(f"Column `{name}` cannot be mirrored, skipped")
+            continue
+        np.save(directory / f"{name}.npy", column)
+        if nulls is not None:
+            np.save(directory / f"{name}.nulls.npy", nulls)
+        columns.append(name)
+
+    if "chemsys" in columns:
+        index = ElementSetIndex.from_chemsys(doc.get("chemsys") or "" for doc in docs)
+        np.save(directory / "elements.lo.npy", index.lo)
+        np.save(directory / "elements.hi.npy", index.hi)
+        np.save(directory / "elements.counts.npy", index.counts)
+
+    with open(directory / "manifest.json", "w") as f:
+        json.dump(
+            {"length": len(docs), "database_version": database_version, "columns": columns}, f
+        )
+    return directory
+
+
+def load_fixture(fixture: str | Path, directory: str | Path) -> Path:
+    """Build a mirror from a JSON file of summary documents."""
+    with open(fixture) as f:
+        docs = json.load(f)
+    if isinstance(docs, dict):
+        docs = docs.get("data", [])
+    return build_mirror(docs, directory)
+
+
+def snapshot(mpr, directory: str | Path) -> Path:
+    """Build a mirror from the summary collection of the MP API."""
+    docs = mpr.materials.summary._search(
+        num_chunks=None, chunk_size=1000, all_fields=False, fields=SNAPSHOT_FIELDS
+    )
+    return build_mirror(docs, directory, database_version=mpr.get_database_version())
+
+
+class Mirror:
+    """Memory-mapped summary mirror answering queries locally."""
+
+    def __init__(self, directory: str | Path):
+        directory = Path(directory)
+        with open(directory / "manifest.json") as f:
+            self.manifest = json.load(f)
+
+        columns, nulls = {}, {}
+        for name in self.manifest["columns"]:
+            columns[name] = np.load(directory / f"{name}.npy", mmap_mode="r")
+            if (directory / f"{name}.nulls.npy").exists():
+                nulls[name] = np.load(directory / f"{name}.nulls.npy", mmap_mode="r")
+        self.table = DocTable(columns, nulls)
+        self.table._length = self.manifest["length"]
+        self.output_fields = set(OUTPUT_FIELDS) & set(columns)
+
+        self.elements = None
+        if (directory / "elements.lo.npy").exists():
+            self.elements = ElementSetIndex(
+                *(
+                    np.load(directory / f"elements.{name}.npy", mmap_mode="r")
+                    for name in ("lo", "hi", "counts")
+                )
+            )
+        elif "chemsys" in columns:
+            self.elements = ElementSetIndex.from_chemsys(columns["chemsys"].tolist())
+
+    @property
+    def database_version(self) -> str | None:
+        return self.manifest.get("database_version")
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _param_mask(self, name: str, value: Any) -> np.ndarray | None:
+        """Mask of the rows matching one query parameter, or None if unsupported."""
+        table = self.table
+        columns = table.columns
+
+        # NOTE: equals_mask matches nothing on a missing column, the API must answer
+        if name == "material_ids":
+            if "material_id" not in columns:
+                return None
+            return table.equals_mask("material_id", _split(value))
+        if name in ("elements", "exclude_elements", "chemsys"):
+            if self.elements is None:
+                return None
+            if name == "elements":
+                return self.elements.contains_all(_split(value))
+            if name == "exclude_elements":
+                return self.elements.contains_none(_split(value))
+            return self.elements.any_chemsys(_split(value))
+        if name == "spacegroup_number":
+            if name not in columns:
+                return None
+            return table.equals_mask(name, [int(v) for v in _split(value)])
+
+        for suffix in ("_min", "_max", "_not_eq", "_eq_any", "_neq_any", ""):
+            field = name[: len(name) - len(suffix)] if suffix else name
+            if name.endswith(suffix) and field in columns:
+                break
+        else:
+            return None
+
+        if suffix == "_min":
+            return table.range_mask(field, min=value)
+        if suffix == "_max":
+            return table.range_mask(field, max=value)
+        if suffix == "_not_eq":
+            return ~table.equals_mask(field, value) & ~table.null_mask(field)
+        if suffix == "_eq_any":
+            return table.equals_mask(field, [float(v) for v in _split(value)])
+        if suffix == "_neq_any":
+            values = [float(v) for v in _split(value)]
+            return ~table.equals_mask(field, values) & ~table.null_mask(field)
+        return table.equals_mask(field, value)
+
+    def search(self, query_params: dict, default_sort_fields: str = "material_id") -> list[dict] | None:
+        """Answer a processed summary query, or return None if it needs the API."""
+        fields = query_params.get("fields") or []
+        sort_fields = (query_params.get("_sort_fields") or default_sort_fields).split(",")
+        if not fields or not set(fields) <= self.output_fields:
+            return None
+        if not {f.lstrip("-") for f in sort_fields} <= self.output_fields:
+            return None
+
+        mask = np.ones(len(self), dtype=bool)
+        params = {k: v for k, v in query_params.items() if k not in PAGING_PARAMS}
+        # NOTE: as on the API, deprecated materials are excluded by default
+        if "deprecated" in self.table.columns:
+            params.setdefault("deprecated", False)
+        for name, value in params.items():
+            if value is None:
+                continue
+            param_mask = self._param_mask(name, value)
+            if param_mask is None:
+                metrics.incr("mp_mirror_fallbacks")
+                return None
+            mask &= param_mask
+
+        metrics.incr("mp_mirror_hits")
+        limit = query_params.get("_limit", 10)
+        return self.table.filter(mask).top_k(sort_fields, limit).to_docs(fields)
+
+
+def _split(value: Any) -> list:
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+_mirror: Mirror | None = None
+
+
+def get_mirror() -> Mirror | None:
+    """Return the mirror configured by ``LLAMP_MP_MIRROR``, if any."""
+    global _mirror
+    if _mirror is None and LLAMP_MP_MIRROR:
+        try:
+            _mirror = Mirror(LLAMP_MP_MIRROR)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not open the MP mirror at {LLAMP_MP_MIRROR}: {e}")
+            return None
+    return _mirror
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a local mirror of the MP summary collection.")
+    parser.add_argument("directory")
+    parser.add_argument("--fixture", help="JSON file of summary documents")
+    parser.add_argument("--api-key", default=os.getenv("MP_API_KEY"))
+    args = parser.parse_args()
+
+    if args.fixture:
+        load_fixture(args.fixture, args.directory)
+    else:
+        from llamp.utilities.mp import get_mprester
+
+        snapshot(get_mprester(args.api_key), args.directory)
@@ -1,24 +1,199 @@
+import asyncio
+import copy
 import json
 import logging
-import os.path as osp
 import re
+from functools import cache, lru_cache
 from pathlib import Path
-from typing import Any
-
-import mp_api
-import mp_api.client
-import requests
-from ase.io import read, write
-from langchain.agents.agent_toolkits.openapi.spec import reduce_openapi_spec
-from langchain.tools.json.tool import JsonSpec
-from langchain.utils import get_from_dict_or_env
+from typing import TYPE_CHECKING, Any
+
 from pydantic import BaseModel, Field, model_validator
-from pymatgen.core import Structure
+
+from llamp.utilities import metrics, mp_async
+from llamp.utilities.batching import MP_IDS_BATCH_SIZE, afan_out, fan_out, split_ids
+from llamp.utilities.formula_index import get_formula_index
+from llamp.utilities.mirror import get_mirror
+from llamp.utilities.mp_cache import canonical_params, get_response_cache
+from llamp.utilities.singleflight import SingleFlight
+from llamp.utilities.topk import TopK, top_k
+
+if TYPE_CHECKING:
+    import mp_api.client
+    from langchain.tools.json.tool import JsonSpec
 
 logger = logging.getLogger(__name__)
 
 
 DEFAULT_LIMIT = 10
+# NOTE: documents per request when paging through endpoints that cannot sort
+# server-side
+PAGE_SIZE = 1000
+MPRESTER_CACHE_SIZE = 256
+
+# NOTE: concurrent identical queries from different users or sub-agents share
+# one upstream request
+mp_flights = SingleFlight("mp_singleflight")
+
+
+# NOTE: method handling each MP function, resolved on the wrapper instance at
+# dispatch. None marks functions that are not supported yet
+MATERIAL_ROUTES = {
+    # "search_materials_core_formula_autocomplete__get": "search_materials_core",
+    # "search_materials_core__get": "search_materials_core",
+    "search_materials_absorption__get": None,
+    "search_materials_bonds__get": "search_materials_bonds",
+    "search_materials_chemenv__get": "search_materials_chemenv",
+    "search_materials_tasks_trajectory__get": None,
+    "search_materials_tasks__get": "search_materials_tasks",
+    "get_by_key_materials_thermo_phase_diagram__phase_diagram_id___get": None,
+    "search_materials_thermo__get": "search_materials_thermo",
+    "search_materials_dielectric__get": "search_materials_dielectric",
+    "search_materials_piezoelectric__get": "search_materials_piezoelectric",
+    "search_materials_magnetism__get": "search_materials_magnetism",
+    "get_by_key_materials_phonon__material_id___get": None,
+    "search_materials_eos__get": "search_materials_eos",
+    "get_by_key_materials_eos__task_id___get": None,
+    "get_by_key_materials_similarity__material_id___get": "fetch_materials_similarity",
+    "search_materials_xas__get": None,
+    "search_materials_grain_boundary__get": None,
+    "get_by_key_materials_fermi__task_id___get": None,
+    "get_by_key_materials_elasticity__task_id___get": None,
+    "search_materials_elasticity__get": "search_materials_elasticity",
+    "search_materials_substrates__get": None,
+    "search_materials_surface_properties__get": None,
+    "search_materials_robocrys_text_search__get": None,
+    "search_materials_robocrys__get": "search_materials_robocrys",
+    "search_materials_synthesis__get": "search_materials_synthesis",
+    "search_materials_oxidation_states__get": "search_materials_oxidation_states",
+    "search_materials_alloys__get": None,
+    # "search_materials_provenance__get": "search_materials_provenance",
+    "search_materials_charge_density__get": None,
+    "get_by_key_materials_charge_density__fs_id___get": None,
+    "search_materials_summary_stats__get": None,
+    "search_materials_summary__get": "search_materials_summary",
+    "search_materials_structure__get": "search_materials_structure",
+    "search_materials_electronic_structure_bandstructure__get": None,
+    "search_materials_electronic_structure_dos__get": None,
+    "search_materials_electronic_structure__get": "search_materials_electronic_structure",
+    "search_materials_electronic_structure_bandstructure_object__get": None,
+    "search_materials_electronic_structure_dos_object__get": None,
+    "join_materials_properties": "join_materials",
+}
+
+# NOTE: functions with a native async implementation, the others run `run` in a
+# worker thread
+ASYNC_MATERIAL_ROUTES = {
+    "search_materials_bonds__get": "asearch_materials_bonds",
+    "search_materials_chemenv__get": "asearch_materials_chemenv",
+    "search_materials_eos__get": "asearch_materials_eos",
+    "search_materials_tasks__get": "asearch_materials_tasks",
+    "search_materials_oxidation_states__get": "asearch_materials_oxidation_states",
+    "search_materials_summary__get": "asearch_materials_summary",
+    "search_materials_thermo__get": "asearch_materials_thermo",
+    "search_materials_electronic_structure__get": "asearch_materials_electronic_structure",
+    "join_materials_properties": "ajoin_materials",
+}
+
+# NOTE: endpoints that can be joined on material_id, with their default fields
+JOIN_ENDPOINTS = {
+    "summary": (
+        "materials/summary/",
+        ["formula_pretty", "energy_above_hull", "is_stable", "band_gap", "density"],
+    ),
+    "thermo": (
+        "materials/thermo/",
+        ["formation_energy_per_atom", "energy_above_hull", "is_stable"],
+    ),
+    "elasticity": (
+        "materials/elasticity/",
+        ["bulk_modulus", "shear_modulus", "young_modulus", "homogeneous_poisson", "universal_anisotropy"],
+    ),
+    "magnetism": (
+        "materials/magnetism/",
+        ["ordering", "is_magnetic", "total_magnetization", "num_magnetic_sites"],
+    ),
+    "dielectric": ("materials/dielectric/", ["e_total", "e_ionic", "e_electronic", "n"]),
+    "piezoelectric": ("materials/piezoelectric/", ["e_ij_max"]),
+    "electronic_structure": (
+        "materials/electronic_structure/",
+        ["band_gap", "is_gap_direct", "is_metal", "efermi"],
+    ),
+}
+DEFAULT_JOIN_ENDPOINTS = ["summary", "thermo", "elasticity", "magnetism"]
+
+# NOTE: the OpenAPI spec and the function table are parsed once per process and
+# shared by every wrapper
+DATA_DIR = Path(__file__).parent.parent.resolve() / "mp"
+EXCLUDED_FUNCTIONS = {
+    "search_materials_core__get",
+    "search_materials_core_formula_autocomplete__get",
+    "search_materials_provenance__get",
+}
+
+
+@cache
+def load_raw_spec(spec_path: str) -> dict:
+    if Path(spec_path).exists():
+        with open(spec_path) as f:
+            raw_spec = json.load(f)
+    else:
+        import requests
+
+        raw_spec = requests.get(
+            "https://api.materialsproject.org/openapi.json"
+        ).json()
+
+    # raw_spec["servers"] = ["https://api.materialsproject.org"]
+    raw_spec["servers"] = raw_spec.get(
+        "servers", [{"url": "https://api.materialsproject.org"}]
+    )
+    return raw_spec
+
+
+@cache
+def load_reduced_spec(spec_path: str):
+    from langchain.agents.agent_toolkits.openapi.spec import reduce_openapi_spec
+
+    return reduce_openapi_spec(copy.deepcopy(load_raw_spec(spec_path)))
+
+
+@cache
+def load_json_spec(spec_path: str) -> "JsonSpec":
+    from langchain.tools.json.tool import JsonSpec
+
+    return JsonSpec.from_file(Path(spec_path))
+
+
+@cache
+def load_material_functions() -> tuple[dict, ...]:
+    with open(DATA_DIR / "material_functions.json") as f:
+        functions = json.load(f)
+    return tuple(f for f in functions if f["name"] not in EXCLUDED_FUNCTIONS)
+
+
+
+@lru_cache(maxsize=MPRESTER_CACHE_SIZE)
+def get_mprester(api_key: str) -> "mp_api.client.MPRester":
+    """Return the MPRester session shared by all the wrappers using `api_key`."""
+    # NOTE: mp_api is imported on first use to keep it out of worker start-up
+    import mp_api.client
+
+    metrics.incr("mprester_sessions_opened")
+    mpr = mp_api.client.MPRester(
+        api_key=api_key,
+        monty_decode=False,
+        use_document_model=False,
+        headers={"X-API-KEY": api_key, "accept": "application/json"},
+    )
+    # NOTE: the materials sub-resters are loaded lazily by a __getattr__ that
+    # MPRester sets on the MaterialsRester class, so they would be built with
+    # the session and settings of the last MPRester created anywhere (e.g. by a
+    # key validation); load them all while that is still this one
+    for cls in mpr._all_resters:
+        suffix = cls.suffix.split("/")
+        if suffix[0] == "materials" and suffix[1:] not in ([], ["core"]):
+            getattr(mpr.materials, "_".join(suffix[1:]))
+    return mpr
 
 
 class MPAPIWrapper(BaseModel):
@@ -31,17 +206,11 @@ class MPAPIWrapper(BaseModel):
     mp_api_key: str = Field("", alias="mpApiKey")
 
     max_tokens: int | None = 4096
-    spec_path: Path | str = Path(
-        __file__).parent.resolve() / "mp_openapi_selected.json"
+    spec_path: Path | str = DATA_DIR / "mp_openapi_selected.json"
 
     def set_api_key(self, api_key: str):
         self.mp_api_key = api_key
-        self.mpr = mp_api.client.MPRester(
-            api_key=api_key,
-            monty_decode=False,
-            use_document_model=False,
-            headers={"X-API-KEY": api_key, "accept": "application/json"},
-        )
+        self.mpr = get_mprester(api_key)
 
     @model_validator(mode="after")
     def validate_environment(cls, values: dict) -> dict:
@@ -57,6 +226,44 @@ class MPAPIWrapper(BaseModel):
             )
         return values
 
+    def _unsupported_response(self, function_name: str) -> str:
+        print(f"Function {function_name} is not supported yet.")
+        return (
+            re.sub(
+                r"\s+",
+                " ",
+                f"""
+            I want to call {function_name} but it is not supported yet. 
+            Please rephrase or confine your request.
+            """,
+            )
+            .strip()
+            .replace("\n", " ")
+        )
+
+    def _error_response(self, function_name: str, e: Exception) -> str:
+        return (
+            f"Error on {function_name}: {e}. "
+            "Please revise arguments "
+            "or try smaller request by specifying 'limit' in request."
+        )
+
+    def _cached_response(self, function_name: str, query_params: dict) -> tuple[str | None, Any]:
+        """Return the cache key of the call, if cacheable, and the cached response."""
+        cache = get_response_cache()
+        if not cache.enabled or cache.ttl_for(function_name) <= 0:
+            return None, None
+        version = cache.database_version(self.mpr)
+        if version is None:
+            return None, None
+        cache_key = cache.key(version, function_name, query_params)
+        return cache_key, cache.get(cache_key)
+
+    def _cache_response(self, function_name: str, cache_key: str | None, function_response: Any):
+        if cache_key is not None:
+            cache = get_response_cache()
+            cache.set(cache_key, function_response, ttl=cache.ttl_for(function_name))
+
     def run(self, function_name: str, function_args: str, debug: bool = False) -> str:
         """
         Performs an mp-api call and returns the result.
@@ -69,134 +276,107 @@ class MPAPIWrapper(BaseModel):
             function response in text format
         """
 
-        function_to_call = self.material_routes.get(function_name, None)
+        function_to_call = self._route(function_name)
         if function_to_call is None:
-            print(f"Function {function_name} is not supported yet.")
-            return (
-                re.sub(
-                    r"\s+",
-                    " ",
-                    f"""
-                I want to call {function_name} but it is not supported yet. 
-                Please rephrase or confine your request.
-                """,
-                )
-                .strip()
-                .replace("\n", " ")
-            )
+            return self._unsupported_response(function_name)
 
         try:
             if debug:
                 print(function_args)
-            function_response = function_to_call(
-                query_params=json.loads(function_args))
+            query_params = json.loads(function_args)
+
+            cache_key, cached = self._cached_response(function_name, query_params)
+            if cached is not None:
+                return cached
+
+            function_response = mp_flights.do(
+                f"{function_name}:{canonical_params(query_params)}",
+                lambda: function_to_call(query_params=query_params),
+            )
         except Exception as e:
-            error_response = (
-                f"Error on {function_name}: {e}. "
-                "Please revise arguments "
-                "or try smaller request by specifying 'limit' in request."
+            return self._error_response(function_name, e)
+
+        if debug:
+            print("MP API response:", json.dumps(function_response))
+
+        self._cache_response(function_name, cache_key, function_response)
+        return function_response
+
+    async def arun(self, function_name: str, function_args: str, debug: bool = False) -> str:
+        """
+        Performs an mp-api call on the shared async HTTP client and returns the
+        result. Functions without a native async implementation fall back to
+        `run` in a worker thread.
+
+        Args:
+            function_name: a function name to call
+            function_args: arguments for the function
+            debug: whether to print debug information
+        Returns:
+            function response in text format
+        """
+
+        function_to_call = self._route(function_name, ASYNC_MATERIAL_ROUTES)
+        if function_to_call is None:
+            return await asyncio.to_thread(self.run, function_name, function_args, debug)
+
+        try:
+            if debug:
+                print(function_args)
+            query_params = json.loads(function_args)
+
+            # NOTE: the cache may need a blocking round trip (database version,
+            # Redis tier), keep it off the event loop
+            cache_key, cached = await asyncio.to_thread(
+                self._cached_response, function_name, query_params
             )
-            return error_response
+            if cached is not None:
+                return cached
+
+            function_response = await mp_flights.ado(
+                f"{function_name}:{canonical_params(query_params)}",
+                lambda: function_to_call(query_params=query_params),
+            )
+        except Exception as e:
+            return self._error_response(function_name, e)
 
         if debug:
             print("MP API response:", json.dumps(function_response))
 
+        await asyncio.to_thread(
+            self._cache_response, function_name, cache_key, function_response
+        )
         return function_response
 
     @property
     def material_routes(self):
         return {
-            # "search_materials_core_formula_autocomplete__get": self.search_materials_core,
-            # "search_materials_core__get": self.search_materials_core,
-            "search_materials_absorption__get": None,
-            "search_materials_bonds__get": self.search_materials_bonds,
-            "search_materials_chemenv__get": self.search_materials_chemenv,
-            "search_materials_tasks_trajectory__get": None,
-            "search_materials_tasks__get": self.search_materials_tasks,
-            "get_by_key_materials_thermo_phase_diagram__phase_diagram_id___get": None,
-            "search_materials_thermo__get": self.search_materials_thermo,
-            "search_materials_dielectric__get": self.search_materials_dielectric,
-            "search_materials_piezoelectric__get": self.search_materials_piezoelectric,
-            "search_materials_magnetism__get": self.search_materials_magnetism,
-            "get_by_key_materials_phonon__material_id___get": None,
-            "search_materials_eos__get": self.search_materials_eos,
-            "get_by_key_materials_eos__task_id___get": None,
-            "get_by_key_materials_similarity__material_id___get": self.fetch_materials_similarity,
-            "search_materials_xas__get": None,
-            "search_materials_grain_boundary__get": None,
-            "get_by_key_materials_fermi__task_id___get": None,
-            "get_by_key_materials_elasticity__task_id___get": None,
-            "search_materials_elasticity__get": self.search_materials_elasticity,
-            "search_materials_substrates__get": None,
-            "search_materials_surface_properties__get": None,
-            "search_materials_robocrys_text_search__get": None,
-            "search_materials_robocrys__get": self.search_materials_robocrys,
-            "search_materials_synthesis__get": self.search_materials_synthesis,
-            "search_materials_oxidation_states__get": self.search_materials_oxidation_states,
-            "search_materials_alloys__get": None,
-            # "search_materials_provenance__get": self.search_materials_provenance,
-            "search_materials_charge_density__get": None,
-            "get_by_key_materials_charge_density__fs_id___get": None,
-            "search_materials_summary_stats__get": None,
-            "search_materials_summary__get": self.search_materials_summary,
-            "search_materials_structure__get": self.search_materials_structure,
-            "search_materials_electronic_structure_bandstructure__get": None,
-            "search_materials_electronic_structure_dos__get": None,
-            "search_materials_electronic_structure__get": self.search_materials_electronic_structure,
-            "search_materials_electronic_structure_bandstructure_object__get": None,
-            "search_materials_electronic_structure_dos_object__get": None,
+            function_name: getattr(self, method) if method else None
+            for function_name, method in MATERIAL_ROUTES.items()
         }
 
+    def _route(self, function_name: str, routes: dict = MATERIAL_ROUTES):
+        method = routes.get(function_name)
+        return getattr(self, method) if method else None
+
     @property
     def spec(self):
         return self.json_spec
 
     @property
     def reduced_spec(self):
-        if self.spec_path.exists():
-            with open(self.spec_path) as f:
-                import json
-
-                raw_spec = json.load(f)
-        else:
-            raw_spec = requests.get(
-                "https://api.materialsproject.org/openapi.json"
-            ).json()
-
-        # raw_spec["servers"] = ["https://api.materialsproject.org"]
-        raw_spec["servers"] = raw_spec.get(
-            "servers", [{"url": "https://api.materialsproject.org"}]
-        )
-
-        return reduce_openapi_spec(raw_spec)
+        return load_reduced_spec(str(self.spec_path))
 
     @property
-    def json_spec(self) -> JsonSpec:
-        return JsonSpec.from_file(self.spec_path)
+    def json_spec(self) -> "JsonSpec":
+        return load_json_spec(str(self.spec_path))
 
     @property
     def material_functions(self):
-        with open(
-            osp.join(Path(__file__).parent.resolve(),
-                     "material_functions.json")
-        ) as f:
-            # NOTE: Using all functions available on MP consumes too many tokens.
-            # Here we only use a subset of functions.
-            # functions = self.functions
-            functions = json.load(f)
-            idx = list(map(lambda x: x["name"], functions)).index(
-                "search_materials_core__get"
-            )
-            functions.pop(idx)
-            idx = list(map(lambda x: x["name"], functions)).index(
-                "search_materials_core_formula_autocomplete__get"
-            )
-            functions.pop(idx)
-            idx = list(map(lambda x: x["name"], functions)).index(
-                "search_materials_provenance__get"
-            )
-            functions.pop(idx)
-            return functions
+        # NOTE: Using all functions available on MP consumes too many tokens.
+        # Here we only use a subset of functions.
+        # functions = self.functions
+        return list(load_material_functions())
 
     def _process_query_params(self, query_params: dict):
         fields = query_params.pop("fields", None)
@@ -219,6 +399,122 @@ class MPAPIWrapper(BaseModel):
             )
         return query_params
 
+    def _query_page(self, rester, query_params: dict, limit: int, **criteria):
+        """Return up to `limit` matching documents in a single request.
+
+        `rester._search` splits the longest comma-separated parameter (e.g.
+        ``formula`` or ``_sort_fields``) into parallel requests that each get a
+        share of the limit, and concatenates their results, which breaks both
+        sorting and paging.
+        """
+        query_params = {**query_params, **criteria, "_limit": limit}
+        fields = query_params.pop("fields", None)
+        return rester._query_resource(
+            query_params, fields=fields, num_chunks=1, chunk_size=limit
+        )["data"]
+
+    def _iter_pages(self, rester, query_params: dict):
+        """Yield the matching documents page by page."""
+        skip = 0
+        while True:
+            docs = self._query_page(rester, query_params, PAGE_SIZE, _skip=skip)
+            yield docs
+            if len(docs) < PAGE_SIZE:
+                return
+            skip += PAGE_SIZE
+
+    def _search_all(self, rester, query_params: dict) -> list[dict]:
+        """Return all the matching documents, in the order the server sends them.
+
+        Unlike `rester._search`, the `material_ids` of a batch are sent in a
+        single request, rather than split again into requests whose results
+        come back in any order.
+        """
+        return [doc for page in self._iter_pages(rester, query_params) for doc in page]
+
+    def _search_sorted(self, rester, query_params: dict, default_sort_fields: str, server_sort: bool = True):
+        """Return the first `_limit` documents sorted on `_sort_fields`.
+
+        Endpoints that support it sort and limit server-side, so only `_limit`
+        documents are downloaded. Otherwise the pages are streamed into a
+        bounded top-k selection.
+        """
+        limit = query_params.pop("_limit", DEFAULT_LIMIT)
+        sort_fields = query_params.pop("_sort_fields", None) or default_sort_fields
+
+        def search(query_params: dict):
+            if server_sort:
+                return self._query_page(rester, query_params, limit, _sort_fields=sort_fields)
+            best = TopK(sort_fields.split(","), limit)
+            for page in self._iter_pages(rester, query_params):
+                best.push(page)
+            return best.result()
+
+        docs = self._search_ids(search, query_params)
+        if self._split_material_ids(query_params) is not None:
+            # NOTE: top-k of the batches of material_ids, which are each sorted
+            # but concatenated, even when they add up to no more than the limit
+            docs = top_k(docs, sort_fields.split(","), limit)
+        return docs
+
+    def _split_material_ids(self, query_params: dict) -> list[list[str]] | None:
+        material_ids = query_params.get("material_ids")
+        if isinstance(material_ids, str):
+            material_ids = [i.strip() for i in material_ids.split(",") if i.strip()]
+        if not material_ids or len(material_ids) <= MP_IDS_BATCH_SIZE:
+            return None
+        return split_ids(list(material_ids))
+
+    def _batch_params(self, query_params: dict, batch: list[str]) -> dict:
+        if isinstance(query_params["material_ids"], str):
+            return {**query_params, "material_ids": ",".join(batch)}
+        return {**query_params, "material_ids": batch}
+
+    def _search_ids(self, search, query_params: dict) -> list:
+        """Return `search(query_params)`, fanned out over batches of `material_ids`."""
+        batches = self._split_material_ids(query_params)
+        if batches is None:
+            return search(query_params)
+        results = fan_out(
+            lambda batch: search(self._batch_params(query_params, batch)), batches
+        )
+        return [doc for docs in results for doc in docs]
+
+    async def _asearch_ids(self, search, query_params: dict) -> list:
+        """Async `_search_ids`."""
+        batches = self._split_material_ids(query_params)
+        if batches is None:
+            return await search(query_params)
+        results = await afan_out(
+            lambda batch: search(self._batch_params(query_params, batch)), batches
+        )
+        return [doc for docs in results for doc in docs]
+
+    async def _asearch(self, suburl: str, query_params: dict):
+        return await mp_async.search(self.mp_api_key, suburl, query_params)
+
+    async def _asearch_sorted(
+        self, suburl: str, query_params: dict, default_sort_fields: str, server_sort: bool = True
+    ):
+        """Async `_search_sorted` on the endpoint at `suburl`."""
+        limit = query_params.pop("_limit", DEFAULT_LIMIT)
+        sort_fields = query_params.pop("_sort_fields", None) or default_sort_fields
+
+        async def search(query_params: dict):
+            if server_sort:
+                return await self._asearch(
+                    suburl, {**query_params, "_limit": limit, "_sort_fields": sort_fields}
+                )
+            best = TopK(sort_fields.split(","), limit)
+            async for page in mp_async.iter_pages(self.mp_api_key, suburl, query_params, PAGE_SIZE):
+                best.push(page)
+            return best.result()
+
+        docs = await self._asearch_ids(search, query_params)
+        if self._split_material_ids(query_params) is not None:
+            docs = top_k(docs, sort_fields.split(","), limit)
+        return docs
+
     def search_materials_core(self, query_params: dict):
         query_params = self._process_query_params(query_params)
         return self.mpr.materials._search(
@@ -249,7 +545,7 @@ class MPAPIWrapper(BaseModel):
             num_chunks=None, chunk_size=1000, all_fields=False, **query_params
         )
 
-    def search_materials_summary(self, query_params: dict):
+    def _summary_params(self, query_params: dict):
         query_params = self._process_query_params(query_params)
 
         assert "fields" in query_params, "`fields` must be specified in the query"
@@ -261,30 +557,24 @@ class MPAPIWrapper(BaseModel):
         if "formula_pretty" not in query_params.get("fields", []):
             query_params["fields"] = query_params.get(
                 "fields", []) + ["formula_pretty"]
-            
-        sort_fields = query_params.get("_sort_fields", "material_id")
-        sort_fields = sort_fields.split(",")
+        return query_params
 
-        docs = self.mpr.materials.summary._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
-        )
-        for sort_field in sort_fields:
-            if sort_field[0] == '-':
-                sort_field = sort_field[1:]
-                docs = sorted(
-                    docs, key=lambda x: x[sort_field], reverse=True
-                )
-            else:
-                docs = sorted(
-                    docs, key=lambda x: x[sort_field], reverse=False
-                )
-        return docs[:query_params.get("_limit", DEFAULT_LIMIT)]
-            
-        # limit = query_params.get("_limit", DEFAULT_LIMIT)
+    def _mirror_search(self, query_params: dict, default_sort_fields: str):
+        mirror = get_mirror()
+        if mirror is None:
+            return None
+        return mirror.search(query_params, default_sort_fields=default_sort_fields)
 
-        # return self.mpr.materials.summary._search(
-        #     num_chunks=None, chunk_size=1000, all_fields=False, **query_params
-        # )[:limit]
+    def search_materials_summary(self, query_params: dict):
+        query_params = self._summary_params(query_params)
+
+        docs = self._mirror_search(query_params, default_sort_fields="material_id")
+        if docs is not None:
+            return docs
+
+        return self._search_sorted(
+            self.mpr.materials.summary, query_params, default_sort_fields="material_id"
+        )
 
     def search_materials_structure(self, query_params: dict):
         # NOTE: this is a convenient function to retrieve pymatgen structure
@@ -326,6 +616,8 @@ class MPAPIWrapper(BaseModel):
         if return_mode == "text":
             return docs
         elif return_mode == "file":
+            from pymatgen.core import Structure
+
             paths = []
             for doc in docs:
                 structure = Structure.from_dict(doc["structure"])
@@ -399,12 +691,15 @@ class MPAPIWrapper(BaseModel):
 
         return response[:5]
 
-    def search_materials_oxidation_states(self, query_params: dict):
+    def _oxidation_states_params(self, query_params: dict):
         query_params = self._process_query_params(query_params)
         # FIXME
         if "possible_species" not in query_params["fields"]:
             query_params["fields"].append("possible_species")
+        return query_params
 
+    def search_materials_oxidation_states(self, query_params: dict):
+        query_params = self._oxidation_states_params(query_params)
         return self.mpr.materials.oxidation_states._search(
             num_chunks=None, chunk_size=1000, all_fields=False, **query_params
         )
@@ -421,7 +716,7 @@ class MPAPIWrapper(BaseModel):
             num_chunks=None, chunk_size=1000, all_fields=False, **query_params
         )
 
-    def search_materials_thermo(self, query_params):
+    def _thermo_params(self, query_params: dict):
         query_params = self._process_query_params(query_params)
         # FIXME: _limit is not a valid query parameter for thermo search
         # query_params["_limit"] = query_params.pop("limit", None)
@@ -435,25 +730,24 @@ class MPAPIWrapper(BaseModel):
         if "energy_above_hull" not in query_params.get("fields", []):
             query_params["fields"] = query_params.get(
                 "fields", []) + ["energy_above_hull"]
+        return query_params
 
-        sort_fields = query_params.get("_sort_fields", "energy_above_hull")
-        sort_fields = sort_fields.split(",")
-        
-        thermo_docs =  self.mpr.materials.thermo._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+    def search_materials_thermo(self, query_params):
+        query_params = self._thermo_params(query_params)
+        return self._search_sorted(
+            self.mpr.materials.thermo, query_params, default_sort_fields="energy_above_hull"
         )
 
-        for sort_field in sort_fields:
-            if sort_field[0] == '-':
-                sort_field = sort_field[1:]
-                thermo_docs = sorted(
-                    thermo_docs, key=lambda x: x[sort_field], reverse=True
-                )
-            else:
-                thermo_docs = sorted(
-                    thermo_docs, key=lambda x: x[sort_field], reverse=False
-                )
-        return thermo_docs[:query_params.get("_limit", DEFAULT_LIMIT)]
+    def _formula_material_ids(self, formula: str) -> list[str]:
+        """Resolve `formula` to material_ids, from the local index if possible."""
+        formulas = [f.strip() for f in formula.split(",") if f.strip()]
+        material_ids = get_formula_index().material_ids(formula=formulas)
+        if material_ids is None:
+            material_docs = self.mpr.materials.summary.search(
+                formula=formulas, fields=["material_id"]
+            )
+            material_ids = [doc["material_id"] for doc in material_docs]
+        return material_ids
 
     def search_materials_dielectric(self, query_params):
         query_params = self._process_query_params(query_params)
@@ -472,57 +766,59 @@ class MPAPIWrapper(BaseModel):
                 "fields", []) + ["formula_pretty"]
 
         if "formula" in query_params:
-            material_docs = self.mpr.materials.summary.search(
-                formula=query_params.pop("formula").split(","), fields=["material_id"]
+            material_ids = self._formula_material_ids(query_params.pop("formula"))
+            if not material_ids:
+                return []
+
+            return self._search_ids(
+                lambda p: self._search_all(
+                    self.mpr.materials.dielectric,
+                    {"material_ids": ",".join(p["material_ids"]), "fields": query_params["fields"]},
+                ),
+                {"material_ids": material_ids},
             )
 
-            material_ids = [doc["material_id"] for doc in material_docs]
-
-            # query_params["material_ids"] = ",".join(material_ids)
-
-            return self.mpr.materials.dielectric.search(
-                material_ids=material_ids,
-                fields=query_params.get(
-                    "fields", "material_id,formula_pretty,total,n,symmetry"
-                ).split(","),
-            )
-
-        return self.mpr.materials.dielectric._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+        return self._search_ids(
+            lambda p: self._search_all(self.mpr.materials.dielectric, p),
+            query_params,
         )
 
     def search_materials_piezoelectric(self, query_params):
         query_params = self._process_query_params(query_params)
 
         if "formula" in query_params:
-            material_docs = self.mpr.materials.summary.search(
-                formula=query_params.pop("formula").split(","), fields=["material_id"]
-            )
-
-            material_ids = [doc["material_id"] for doc in material_docs]
+            material_ids = self._formula_material_ids(query_params.pop("formula"))
+            if not material_ids:
+                return []
 
-            return self.mpr.materials.piezoelectric.search(
-                material_ids=material_ids,
-                fields=query_params.get(
-                    "fields",
-                    "material_id,formula_pretty,total,ionic,electronic,e_ij_max,max_direction,strain_for_max",
-                ).split(","),
+            fields = query_params.get(
+                "fields",
+                "material_id,formula_pretty,total,ionic,electronic,e_ij_max,max_direction,strain_for_max",
+            )
+            if isinstance(fields, str):
+                fields = fields.split(",")
+
+            return self._search_ids(
+                lambda p: self._search_all(
+                    self.mpr.materials.piezoelectric,
+                    {"material_ids": ",".join(p["material_ids"]), "fields": fields},
+                ),
+                {"material_ids": material_ids},
             )
 
-        return self.mpr.materials.piezoelectric._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+        return self._search_ids(
+            lambda p: self._search_all(self.mpr.materials.piezoelectric, p),
+            query_params,
         )
 
     def search_materials_magnetism(self, query_params):
         query_params = self._process_query_params(query_params)
         if "formula" in query_params:
-            material_docs = self.mpr.materials.summary.search(
-                formula=query_params.pop("formula").split(","), fields=["material_id"]
-            )
-
-            material_ids = [doc["material_id"] for doc in material_docs]
-
-            query_params["material_ids"] = material_ids
+            material_ids = self._formula_material_ids(query_params.pop("formula"))
+            if not material_ids:
+                return []
+            # NOTE: a list would be sent as repeated material_ids parameters
+            query_params["material_ids"] = ",".join(material_ids)
 
         query_params["fields"] = query_params.get("fields", []) + [
             "material_id",
@@ -539,8 +835,9 @@ class MPAPIWrapper(BaseModel):
             "total_magnetization_normalized_formula_units",
         ]
 
-        return self.mpr.magnetism._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+        return self._search_ids(
+            lambda p: self._search_all(self.mpr.magnetism, p),
+            query_params,
         )
 
     def search_materials_elasticity(self, query_params):
@@ -559,12 +856,11 @@ class MPAPIWrapper(BaseModel):
         ]
 
         if "formula" in query_params:
-            material_docs = self.mpr.materials.summary.search(
-                formula=query_params.pop("formula"), fields=["material_id"]
-            )
-
-            matereial_ids = [doc["material_id"] for doc in material_docs]
-            query_params["material_ids"] = ",".join(matereial_ids)
+            material_ids = self._formula_material_ids(query_params.pop("formula"))
+            # NOTE: an empty material_ids would not filter at all
+            if not material_ids:
+                return []
+            query_params["material_ids"] = ",".join(material_ids)
 
         # # BUG: mp-api does not support get elastic properties by material_ids
         # if "material_ids" in query_params:
@@ -583,11 +879,12 @@ class MPAPIWrapper(BaseModel):
 
         #     return elastic_docs[:query_params.get("_limit", 10)]
 
-        return self.mpr.materials.elasticity._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+        return self._search_ids(
+            lambda p: self._search_all(self.mpr.materials.elasticity, p),
+            query_params,
         )
 
-    def search_materials_electronic_structure(self, query_params):
+    def _electronic_structure_params(self, query_params: dict):
         query_params = self._process_query_params(query_params)
 
         if "material_id" not in query_params.get("fields", []):
@@ -601,28 +898,137 @@ class MPAPIWrapper(BaseModel):
         if "band_gap" not in query_params.get("fields", []):
             query_params["fields"] = query_params.get(
                 "fields", []) + ["band_gap"]
-            
-        sort_fields = query_params.get("_sort_fields", "material_id,band_gap")
-        sort_fields = sort_fields.split(",")
+        return query_params
+
+    def search_materials_electronic_structure(self, query_params):
+        query_params = self._electronic_structure_params(query_params)
 
         # BUG: this endpoint does not support sorting yet
-        query_params.pop("_sort_fields", None)
+        return self._search_sorted(
+            self.mpr.materials.electronic_structure,
+            query_params,
+            default_sort_fields="band_gap,material_id",
+            server_sort=False,
+        )
 
-        docs = self.mpr.materials.electronic_structure._search(
-            num_chunks=None, chunk_size=1000, all_fields=False, **query_params
+    async def asearch_materials_bonds(self, query_params: dict):
+        query_params = self._process_query_params(query_params)
+        return await self._asearch("materials/bonds/", query_params)
+
+    async def asearch_materials_chemenv(self, query_params: dict):
+        query_params = self._process_query_params(query_params)
+        return await self._asearch("materials/chemenv/", query_params)
+
+    async def asearch_materials_eos(self, query_params: dict):
+        query_params = self._process_query_params(query_params)
+        return await self._asearch("materials/eos/", query_params)
+
+    async def asearch_materials_tasks(self, query_params: dict):
+        query_params = self._process_query_params(query_params)
+        return await self._asearch("materials/tasks/", query_params)
+
+    async def asearch_materials_oxidation_states(self, query_params: dict):
+        query_params = self._oxidation_states_params(query_params)
+        return await self._asearch("materials/oxidation_states/", query_params)
+
+    async def asearch_materials_summary(self, query_params: dict):
+        query_params = self._summary_params(query_params)
+
+        docs = self._mirror_search(query_params, default_sort_fields="material_id")
+        if docs is not None:
+            return docs
+
+        return await self._asearch_sorted(
+            "materials/summary/", query_params, default_sort_fields="material_id"
         )
-            
-        for sort_field in sort_fields:
-            if sort_field[0] == '-':
-                sort_field = sort_field[1:]
-                docs = sorted(
-                    docs, key=lambda x: x[sort_field], reverse=True
+
+    async def asearch_materials_thermo(self, query_params: dict):
+        query_params = self._thermo_params(query_params)
+        return await self._asearch_sorted(
+            "materials/thermo/", query_params, default_sort_fields="energy_above_hull"
+        )
+
+    async def asearch_materials_electronic_structure(self, query_params: dict):
+        query_params = self._electronic_structure_params(query_params)
+        return await self._asearch_sorted(
+            "materials/electronic_structure/",
+            query_params,
+            default_sort_fields="band_gap,material_id",
+            server_sort=False,
+        )
+
+    def _join_fields(self, query_params: dict) -> dict[str, list[str]]:
+        """Return the fields to fetch from every endpoint of the join."""
+        requested = {}
+        for field in (query_params.get("fields") or "").split(","):
+            if not field.strip():
+                continue
+            endpoint, _, name = field.strip().partition(".")
+            if endpoint not in JOIN_ENDPOINTS or not name:
+                raise ValueError(
+                    f"Invalid field `{field}`, expected <endpoint>.<field> with endpoint "
+                    f"one of {', '.join(JOIN_ENDPOINTS)}"
                 )
-            else:
-                docs = sorted(
-                    docs, key=lambda x: x[sort_field], reverse=False
+            requested.setdefault(endpoint, []).append(name)
+
+        endpoints = [e.strip() for e in (query_params.get("endpoints") or "").split(",") if e.strip()]
+        if not endpoints and not requested:
+            endpoints = DEFAULT_JOIN_ENDPOINTS
+        for endpoint in endpoints:
+            if endpoint not in JOIN_ENDPOINTS:
+                raise ValueError(
+                    f"Unknown endpoint `{endpoint}`, expected one of {', '.join(JOIN_ENDPOINTS)}"
                 )
-        return docs[:query_params.get("_limit", DEFAULT_LIMIT)]
+            requested.setdefault(endpoint, list(JOIN_ENDPOINTS[endpoint][1]))
+        return requested
+
+    async def ajoin_materials(self, query_params: dict):
+        """Fetch the requested fields of `material_ids` from several endpoints
+        concurrently and merge them into one row per material, with columns
+        named ``<endpoint>.<field>``.
+        """
+        material_ids = list(dict.fromkeys(
+            i.strip() for i in query_params["material_ids"].split(",") if i.strip()
+        ))
+        requested = self._join_fields(query_params)
+
+        async def fetch(endpoint: str, fields: list[str]):
+            params = {"material_ids": material_ids, "fields": ["material_id", *fields]}
+            if endpoint == "thermo":
+                # NOTE: one thermo document per material and functional mix
+                params["thermo_types"] = "GGA_GGA+U_R2SCAN"
+            # NOTE: every batch of material_ids is limited to its own size
+            return await self._asearch_ids(
+                lambda p: self._asearch(
+                    JOIN_ENDPOINTS[endpoint][0], {**p, "_limit": len(p["material_ids"])}
+                ),
+                params,
+            )
+
+        results = await asyncio.gather(
+            *(fetch(endpoint, fields) for endpoint, fields in requested.items())
+        )
+
+        rows = {material_id: {"material_id": material_id} for material_id in material_ids}
+        for (endpoint, fields), docs in zip(requested.items(), results):
+            for doc in docs:
+                row = rows.get(doc.get("material_id"))
+                if row is None:
+                    continue
+                for field in fields:
+                    row[f"{endpoint}.{field}"] = doc.get(field)
+        return list(rows.values())
+
+    def join_materials(self, query_params: dict):
+        """Sync `ajoin_materials`, on an event loop of its own."""
+
+        async def join():
+            try:
+                return await self.ajoin_materials(query_params)
+            finally:
+                await mp_async.aclose()
+
+        return asyncio.run(join())
 
     @property
     def endpoints(self):
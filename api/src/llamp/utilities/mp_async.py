@@ -0,0 +1,102 @@
+"""Asynchronous client for the MP API.
+
+`MPRester` is synchronous, so every MP call made from the event loop used to
+block a worker thread for the whole request. The async code path of
+`MPAPIWrapper` sends its requests on a shared ``httpx.AsyncClient`` instead,
+one per event loop, with keep-alive connections and a bounded pool.
+
+Configuration:
+
+- ``MP_API_ENDPOINT``: base URL of the MP API
+- ``MP_ASYNC_MAX_CONNECTIONS``: maximum open connections per event loop
+- ``MP_ASYNC_MAX_KEEPALIVE``: idle connections kept alive per event loop
+- ``MP_ASYNC_TIMEOUT``: request timeout in seconds
+"""
+
+import asyncio
+import os
+import weakref
+from collections.abc import AsyncIterator
+
+import httpx
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+
+load_dotenv()
+
+MP_API_ENDPOINT = os.getenv("MP_API_ENDPOINT", "https://api.materialsproject.org/")
+MP_ASYNC_MAX_CONNECTIONS = int(os.getenv("MP_ASYNC_MAX_CONNECTIONS", 100))
+MP_ASYNC_MAX_KEEPALIVE = int(os.getenv("MP_ASYNC_MAX_KEEPALIVE", 20))
+MP_ASYNC_TIMEOUT = float(os.getenv("MP_ASYNC_TIMEOUT", 60))
+
+# NOTE: httpx clients are bound to the loop they are first used on
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the client shared by the coroutines of the running loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            base_url=MP_API_ENDPOINT,
+            limits=httpx.Limits(
+                max_connections=MP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=MP_ASYNC_MAX_KEEPALIVE,
+            ),
+            timeout=MP_ASYNC_TIMEOUT,
+            headers={"accept": "application/json"},
+        )
+        metrics.incr("mp_async_clients_opened")
+    return client
+
+
+async def aclose() -> None:
+    """Close the client of the running loop, e.g. on server shutdown."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def encode_params(query_params: dict) -> dict[str, str]:
+    """Encode processed query params the way `MPRester` sends them."""
+    params = {}
+    for name, value in query_params.items():
+        if value is None:
+            continue
+        if name == "fields":
+            name = "_fields"
+        if isinstance(value, (list, tuple, set)):
+            value = ",".join(str(v) for v in value)
+        elif isinstance(value, bool):
+            value = str(value).lower()
+        params[name] = str(value)
+    return params
+
+
+async def search(api_key: str, suburl: str, query_params: dict) -> list[dict]:
+    """Return the documents of one request to the `suburl` endpoint."""
+    response = await get_async_client().get(
+        suburl, params=encode_params(query_params), headers={"X-API-KEY": api_key}
+    )
+    metrics.incr("mp_async_requests")
+    response.raise_for_status()
+    return response.json().get("data", [])
+
+
+async def iter_pages(
+    api_key: str, suburl: str, query_params: dict, page_size: int
+) -> AsyncIterator[list[dict]]:
+    """Yield the documents matching `query_params` page by page."""
+    skip = 0
+    while True:
+        docs = await search(
+            api_key, suburl, {**query_params, "_limit": page_size, "_skip": skip}
+        )
+        yield docs
+        if len(docs) < page_size:
+            return
+        skip += page_size
@@ -0,0 +1,183 @@
+"""Response cache for Materials Project API calls.
+
+Expert agents issue the same queries over and over, within a conversation and
+across users (e.g. ``search_materials_summary__get`` for a given formula). The
+responses of `MPAPIWrapper.run` are cached under the function name and the
+canonicalized query parameters, in two tiers:
+
+- an in-process LRU with per-entry time-to-live
+- an optional Redis tier shared by all the workers
+
+Keys include the MP database version, so a new database release invalidates
+every entry at once. Only successful responses are cached.
+
+Configuration:
+
+- ``MP_CACHE_SIZE``: entries kept in the in-process tier, 0 disables the cache
+- ``MP_CACHE_TTL``: default time-to-live in seconds
+- ``MP_CACHE_REDIS``: also cache responses in Redis
+- ``MP_DB_VERSION_TTL``: seconds the MP database version is trusted before it
+  is fetched again
+"""
+
+import copy
+import json
+import logging
+import os
+from typing import Any
+
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+from llamp.utilities.cache import TTLCache, hash_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MP_CACHE_SIZE = int(os.getenv("MP_CACHE_SIZE", 1024))
+MP_CACHE_TTL = float(os.getenv("MP_CACHE_TTL", 3600))
+MP_CACHE_REDIS = os.getenv("MP_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+MP_DB_VERSION_TTL = float(os.getenv("MP_DB_VERSION_TTL", 3600))
+
+# NOTE: time-to-live per function, 0 disables caching. Structure retrieval
+# writes files as a side effect, so it always goes to the API
+ENDPOINT_TTLS = {
+    "search_materials_structure__get": 0,
+    "search_materials_tasks__get": 600,
+    "search_materials_synthesis__get": 24 * 3600,
+    "search_materials_robocrys__get": 24 * 3600,
+}
+
+# NOTE: comma-separated parameters whose order does not change the response
+UNORDERED_PARAMS = {
+    "fields",
+    "_fields",
+    "material_ids",
+    "elements",
+    "exclude_elements",
+    "formula",
+    "chemsys",
+    "thermo_types",
+}
+
+_MISSING = object()
+
+
+def _normalize(name: str, value: Any) -> Any:
+    if isinstance(value, str) and "," in value:
+        value = [part.strip() for part in value.split(",") if part.strip()]
+        if name in UNORDERED_PARAMS:
+            value = sorted(set(value))
+        return ",".join(value)
+    if isinstance(value, list) and name in UNORDERED_PARAMS:
+        return sorted({str(v) for v in value})
+    return value
+
+
+def canonical_params(query_params: dict) -> str:
+    """Serialize `query_params` so that equivalent queries compare equal."""
+    normalized = {
+        name: _normalize(name, value)
+        for name, value in query_params.items()
+        if value is not None
+    }
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class MPResponseCache:
+    """Two-tier cache of MP API responses.
+
+    Args:
+        maxsize: entries kept in the in-process tier
+        ttl: default time-to-live in seconds
+        use_redis: also read and write the shared Redis tier
+    """
+
+    def __init__(
+        self, maxsize: int = MP_CACHE_SIZE, ttl: float = MP_CACHE_TTL, use_redis: bool = MP_CACHE_REDIS
+    ):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = TTLCache(maxsize=1, ttl=MP_DB_VERSION_TTL)
+        self._redis = None
+        if use_redis:
+            from llamp.utilities.redis_pool import get_redis_client
+
+            self._redis = get_redis_client()
+
+    @property
+    def enabled(self) -> bool:
+        return self.local.maxsize > 0
+
+    def ttl_for(self, function_name: str) -> float:
+        return ENDPOINT_TTLS.get(function_name, self.ttl)
+
+    def database_version(self, mpr) -> str | None:
+        """Return the MP database version, or None if it cannot be fetched."""
+        version = self._versions.get("version")
+        if version is None:
+            try:
+                version = mpr.get_database_version()
+            except Exception as e:
+                logger.warning(f"Could not fetch the MP database version: {e}")
+                return None
+            self._versions.set("version", version)
+        return version
+
+    def key(self, version: str, function_name: str, query_params: dict) -> str:
+        return f"mp:{version}:{function_name}:{hash_key(canonical_params(query_params))}"
+
+    def get(self, key: str, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.incr("mp_cache_hits")
+            return copy.deepcopy(value)
+
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                cached, ttl = pipe.get(key).ttl(key).execute()
+            except Exception as e:
+                logger.warning(f"MP cache Redis tier unavailable: {e}")
+                cached = None
+            if cached is not None:
+                metrics.incr("mp_cache_redis_hits")
+                value = json.loads(cached)
+                self.local.set(key, value, ttl=ttl if ttl > 0 else None)
+                return copy.deepcopy(value)
+
+        metrics.incr("mp_cache_misses")
+        return default
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        evictions = self.local.evictions
+        self.local.set(key, copy.deepcopy(value), ttl=ttl)
+        if self.local.evictions > evictions:
+            metrics.incr("mp_cache_evictions", self.local.evictions - evictions)
+
+        if self._redis is not None:
+            try:
+                self._redis.set(key, json.dumps(value, default=str), ex=int(ttl))
+            except Exception as e:
+                logger.warning(f"MP cache Redis tier unavailable: {e}")
+
+    def clear(self) -> None:
+        self.local.clear()
+        self._versions.clear()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return self.local.stats
+
+
+_cache: MPResponseCache | None = None
+
+
+def get_response_cache() -> MPResponseCache:
+    """Return the process-wide MP response cache."""
+    global _cache
+    if _cache is None:
+        _cache = MPResponseCache()
+    return _cache
@@ -0,0 +1,99 @@
+"""Process-wide Redis connection pools.
+
+The API server, the streaming callback handlers and the MP tools all talk to
+the same Redis instance. Instead of every component opening its own client,
+they borrow connections from one synchronous pool (used from worker threads
+and sync callbacks) and one asyncio pool (used from the event loop).
+
+Pools are sized through environment variables:
+
+- ``REDIS_MAX_CONNECTIONS``: size of the synchronous pool
+- ``REDIS_ASYNC_MAX_CONNECTIONS``: size of the asyncio pool. Every open chat
+  stream holds one connection for its subscription, so this bounds the number
+  of concurrent streams per worker.
+- ``REDIS_POOL_TIMEOUT``: seconds to wait for a free connection
+"""
+
+import os
+
+import redis
+import redis.asyncio
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+
+load_dotenv()
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 64))
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.getenv("REDIS_ASYNC_MAX_CONNECTIONS", 1024))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 20))
+
+
+def redis_url() -> str:
+    if REDIS_PASSWORD is not None:
+        return f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0"
+    return f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+
+
+class CountingConnection(redis.Connection):
+    """Connection that records every socket it opens."""
+
+    def _connect(self):
+        sock = super()._connect()
+        metrics.incr("redis_connections_opened")
+        return sock
+
+
+class AsyncCountingConnection(redis.asyncio.Connection):
+    """Asyncio connection that records every socket it opens."""
+
+    async def _connect(self):
+        await super()._connect()
+        metrics.incr("redis_connections_opened")
+
+
+_pool: redis.BlockingConnectionPool | None = None
+_async_pool: redis.asyncio.BlockingConnectionPool | None = None
+
+
+def get_pool() -> redis.BlockingConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = redis.BlockingConnectionPool(
+            connection_class=CountingConnection,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=0,
+            password=REDIS_PASSWORD,
+        )
+    return _pool
+
+
+def get_async_pool() -> redis.asyncio.BlockingConnectionPool:
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = redis.asyncio.BlockingConnectionPool(
+            connection_class=AsyncCountingConnection,
+            max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT,
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=0,
+            password=REDIS_PASSWORD,
+        )
+    return _async_pool
+
+
+def get_redis_client() -> redis.Redis:
+    """Return a synchronous client backed by the shared pool."""
+    return redis.Redis(connection_pool=get_pool())
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Return an asyncio client backed by the shared pool."""
+    return redis.asyncio.Redis(connection_pool=get_async_pool())
@@ -0,0 +1,205 @@
+"""Server-side store of MP query results, addressed by short handles.
+
+When an observation is cut down to fit the token budget, the full result is
+stored here under a handle, and the agent reads further pages, columns or
+aggregates of it with the ``read_mp_result`` tool instead of re-issuing the
+query with a larger limit. Results are kept:
+
+- in memory, or in Redis when enabled so that every worker can read them
+- in a local spill directory when their JSON exceeds
+  ``RESULT_STORE_MEMORY_LIMIT`` bytes
+
+Configuration:
+
+- ``RESULT_STORE_TTL``: seconds a result stays readable
+- ``RESULT_STORE_REDIS``: keep results in Redis instead of in memory
+- ``RESULT_STORE_MEMORY_LIMIT``: size in bytes above which results are spilled
+  to disk
+- ``RESULT_STORE_DIR``: spill directory
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from llamp.utilities import metrics
+from llamp.utilities.cache import TTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_TTL = float(os.getenv("RESULT_STORE_TTL", 3600))
+RESULT_STORE_REDIS = os.getenv("RESULT_STORE_REDIS", "false").lower() in ("1", "true", "yes")
+RESULT_STORE_MEMORY_LIMIT = int(os.getenv("RESULT_STORE_MEMORY_LIMIT", 1 << 20))
+RESULT_STORE_DIR = os.getenv(
+    "RESULT_STORE_DIR", os.path.join(tempfile.gettempdir(), "llamp-results")
+)
+HANDLE_LENGTH = 12
+# NOTE: handles come back from the LLM, anything but what `put` makes is refused
+HANDLE_PATTERN = re.compile(rf"[0-9a-f]{{{HANDLE_LENGTH}}}")
+
+
+def get_field(doc: dict, field: str) -> Any:
+    """Return `field` of `doc`, dotted names reaching into nested objects."""
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class ResultStore:
+    """Store of results that expire after a time-to-live.
+
+    Args:
+        ttl: seconds a result stays readable
+        memory_limit: size in bytes of the JSON of a result above which it is
+            written to `spill_dir`
+        spill_dir: directory of the spilled results
+        use_redis: keep the results that are not spilled in Redis
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULT_STORE_TTL,
+        memory_limit: int = RESULT_STORE_MEMORY_LIMIT,
+        spill_dir: str | Path = RESULT_STORE_DIR,
+        use_redis: bool = RESULT_STORE_REDIS,
+    ):
+        self.ttl = ttl
+        self.memory_limit = memory_limit
+        self.spill_dir = Path(spill_dir)
+        self.local = TTLCache(maxsize=256, ttl=ttl)
+        self._redis = None
+        if use_redis:
+            from llamp.utilities.redis_pool import get_redis_client
+
+            self._redis = get_redis_client()
+
+    def _spill_path(self, handle: str) -> Path:
+        return self.spill_dir / f"{handle}.json"
+
+    def put(self, result: Any) -> str:
+        """Store `result` and return its handle."""
+        handle = uuid.uuid4().hex[:HANDLE_LENGTH]
+        payload = json.dumps(result, default=str)
+
+        if len(payload) > self.memory_limit:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self.purge()
+            self._spill_path(handle).write_text(payload)
+            metrics.incr("results_spilled")
+            return handle
+
+        if self._redis is not None:
+            try:
+                self._redis.set(f"result:{handle}", payload, ex=int(self.ttl))
+                return handle
+            except Exception as e:
+                logger.warning(f"Result store Redis tier unavailable: {e}")
+        # NOTE: stored as decoded JSON so that readers get the same types back
+        self.local.set(handle, json.loads(payload))
+        return handle
+
+    def get(self, handle: str, default=None) -> Any:
+        """Return the result stored under `handle`, or `default` if it expired.
+
+        Handles not in the format of `put` are never looked up.
+        """
+        if not isinstance(handle, str) or not HANDLE_PATTERN.fullmatch(handle):
+            return default
+        result = self.local.get(handle)
+        if result is not None:
+            return result
+
+        if self._redis is not None:
+            try:
+                payload = self._redis.get(f"result:{handle}")
+            except Exception as e:
+                logger.warning(f"Result store Redis tier unavailable: {e}")
+                payload = None
+            if payload is not None:
+                return json.loads(payload)
+
+        path = self._spill_path(handle)
+        try:
+            if path.stat().st_mtime + self.ttl > time.time():
+                return json.loads(path.read_text())
+        except FileNotFoundError:
+            pass
+        return default
+
+    def purge(self) -> int:
+        """Delete the expired spill files and return how many were removed."""
+        removed = 0
+        for path in self.spill_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime + self.ttl <= time.time():
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def page(
+        self, handle: str, offset: int = 0, limit: int = 20, fields: list[str] | None = None
+    ) -> list | None:
+        """Return `limit` documents from `offset`, with only `fields` if given."""
+        result = self.get(handle)
+        if not isinstance(result, list):
+            return result
+        docs = result[offset:offset + limit]
+        if fields:
+            docs = [
+                {field: get_field(doc, field) for field in fields}
+                if isinstance(doc, dict) else doc
+                for doc in docs
+            ]
+        return docs
+
+    def aggregate(self, handle: str, fields: list[str]) -> dict[str, dict] | None:
+        """Return the count, min, max, mean and sum of numeric `fields`."""
+        result = self.get(handle)
+        if not isinstance(result, list):
+            return None
+        aggregates = {}
+        for field in fields:
+            values = [
+                value for doc in result if isinstance(doc, dict)
+                for value in [get_field(doc, field)]
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+                and math.isfinite(value)
+            ]
+            if not values:
+                aggregates[field] = {"count": 0}
+                continue
+            aggregates[field] = {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / len(values),
+                "sum": sum(values),
+            }
+        return aggregates
+
+
+_store: ResultStore | None = None
+
+
+def get_result_store() -> ResultStore:
+    """Return the process-wide result store."""
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
@@ -0,0 +1,110 @@
+"""Coalescing of concurrent identical calls.
+
+When several callers ask for the same key at the same time, only the first one
+(the leader) runs the call; the others wait for it and receive its result or
+exception. Waiting works from worker threads (blocking) and from the event loop
+(awaiting), and both can share the same flight.
+
+Cancelling a caller never cancels the others. A leader that is cancelled (or
+interrupted by any other `BaseException` that is not an `Exception`) hands the
+call over: the waiting followers join again and one of them runs it.
+"""
+
+import asyncio
+import copy
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from typing import Any
+
+from llamp.utilities import metrics
+
+# NOTE: result of a flight whose leader was cancelled, its followers join again
+_RETRY = object()
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers of the same key.
+
+    Args:
+        name: prefix of the counters recorded in `llamp.utilities.metrics`
+        copy_results: give every follower a deep copy of the result, so that
+            callers are free to modify it
+    """
+
+    def __init__(self, name: str = "singleflight", copy_results: bool = True):
+        self.name = name
+        self.copy_results = copy_results
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.incr(f"{self.name}_shared")
+                return future, False
+            future = self._calls[key] = Future()
+            metrics.incr(f"{self.name}_calls")
+            return future, True
+
+    def _done(self, key: str, future: Future, result: Any = None, error: BaseException | None = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _abandon(self, key: str, future: Future):
+        metrics.incr(f"{self.name}_handoffs")
+        self._done(key, future, result=_RETRY)
+
+    def _follow(self, result: Any) -> Any:
+        return copy.deepcopy(result) if self.copy_results else result
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return `fn()`, or the result of the identical call already running."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            result = future.result()
+            if result is not _RETRY:
+                return self._follow(result)
+
+        try:
+            result = fn()
+        except Exception as e:
+            self._done(key, future, error=e)
+            raise
+        except BaseException:
+            self._abandon(key, future)
+            raise
+        self._done(key, future, result=result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, or the result of the identical call already running."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            # NOTE: shielded, cancelling the wrapper would cancel the shared future
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _RETRY:
+                return self._follow(result)
+
+        try:
+            result = await fn()
+        except Exception as e:
+            self._done(key, future, error=e)
+            raise
+        except BaseException:
+            self._abandon(key, future)
+            raise
+        self._done(key, future, result=result)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,209 @@
+"""Column-oriented container for MP documents.
+
+MP endpoints return lists of dicts. `DocTable` stores them as one NumPy array
+per field instead: numbers and booleans in typed arrays, strings and nested
+fields (``symmetry``, ``structure``, ...) in object arrays (or fixed-width
+string arrays, e.g. when memory-mapped), with a null mask per field for missing
+values. Sorting, filtering, top-k and projection then run as
+vectorized array operations, and documents are only rebuilt at the edge with
+`to_docs`.
+
+`DocTable` is the storage of the summary mirror (`llamp.utilities.mirror`),
+whose columns are already arrays. Results of the API itself stay lists of
+dicts: building a table from every page costs more than the vectorized sort
+saves, so they are streamed through `llamp.utilities.topk` instead.
+"""
+
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+
+
+def _is_numeric(column: np.ndarray) -> bool:
+    return column.dtype.kind in "biuf"
+
+
+def column_from_values(values: list) -> tuple[np.ndarray, np.ndarray | None]:
+    """Return the array holding `values` and its null mask, if any is missing."""
+    nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    present = [v for v in values if v is not None]
+    has_nulls = bool(nulls.any())
+
+    if present and all(isinstance(v, bool) for v in present) and not has_nulls:
+        return np.array(values, dtype=bool), None
+    if present and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in present
+    ):
+        if all(isinstance(v, int) for v in present):
+            # NOTE: missing values are stored as 0 under the null mask, so that
+            # ints do not turn into floats
+            column = np.array([0 if v is None else v for v in values], dtype=np.int64)
+        else:
+            column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return column, nulls if has_nulls else None
+
+    # NOTE: filled one by one, numpy would otherwise broadcast nested lists
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column, nulls if has_nulls else None
+
+
+class DocTable:
+    """Columnar set of documents.
+
+    Args:
+        columns: one array per field, all of the same length
+        nulls: boolean masks of the missing values of the fields that have any
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray], nulls: dict[str, np.ndarray] | None = None):
+        self.columns = columns
+        self.nulls = nulls or {}
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[dict]) -> "DocTable":
+        docs = list(docs)
+        fields = list(dict.fromkeys(field for doc in docs for field in doc))
+        columns, nulls = {}, {}
+        for field in fields:
+            columns[field], mask = column_from_values([doc.get(field) for doc in docs])
+            if mask is not None:
+                nulls[field] = mask
+        table = cls(columns, nulls)
+        table._length = len(docs)
+        return table
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def fields(self) -> list[str]:
+        return list(self.columns)
+
+    def null_mask(self, field: str) -> np.ndarray:
+        mask = self.nulls.get(field)
+        if mask is None:
+            return np.zeros(len(self), dtype=bool)
+        return mask
+
+    def take(self, indices: np.ndarray) -> "DocTable":
+        """Return the rows at `indices`, in that order."""
+        table = DocTable(
+            {field: column[indices] for field, column in self.columns.items()},
+            {field: mask[indices] for field, mask in self.nulls.items()},
+        )
+        table._length = len(indices)
+        return table
+
+    def filter(self, mask: np.ndarray) -> "DocTable":
+        """Return the rows where `mask` is true."""
+        return self.take(np.flatnonzero(mask))
+
+    def project(self, fields: Iterable[str]) -> "DocTable":
+        """Return the table restricted to `fields`, ignoring unknown ones."""
+        fields = [f for f in fields if f in self.columns]
+        table = DocTable(
+            {f: self.columns[f] for f in fields},
+            {f: self.nulls[f] for f in fields if f in self.nulls},
+        )
+        table._length = len(self)
+        return table
+
+    def range_mask(self, field: str, min: Any = None, max: Any = None) -> np.ndarray:
+        """Rows whose `field` lies within [`min`, `max`]; missing values never match."""
+        if field not in self.columns:
+            return np.zeros(len(self), dtype=bool)
+        column = self.columns[field]
+        mask = ~self.null_mask(field)
+        if not _is_numeric(column):
+            raise TypeError(f"Range filters need a numeric field, got `{field}`")
+        if min is not None:
+            mask &= column >= min
+        if max is not None:
+            mask &= column <= max
+        return mask
+
+    def equals_mask(self, field: str, value: Any) -> np.ndarray:
+        """Rows whose `field` equals `value`, or any of `value` if it is a list."""
+        if field not in self.columns:
+            return np.zeros(len(self), dtype=bool)
+        column = self.columns[field]
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if column.dtype == object:
+            values = set(values)
+            mask = np.fromiter((v in values for v in column), dtype=bool, count=len(self))
+        else:
+            mask = np.isin(column, list(values))
+        return mask & ~self.null_mask(field)
+
+    def _sort_keys(self, sort_field: str) -> tuple[np.ndarray, np.ndarray]:
+        descending = sort_field.startswith("-")
+        field = sort_field.lstrip("-")
+        if field not in self.columns:
+            raise KeyError(field)
+
+        column = self.columns[field]
+        nulls = self.null_mask(field)
+        if not _is_numeric(column):
+            key = np.zeros(len(self), dtype=np.int64)
+            if (~nulls).any():
+                _, key[~nulls] = np.unique(column[~nulls], return_inverse=True)
+        else:
+            key = np.where(nulls, 0, column).astype(np.float64)
+        return nulls, -key if descending else key
+
+    def argsort(self, sort_fields: list[str]) -> np.ndarray:
+        """Stable order of the rows sorted on `sort_fields`.
+
+        As on the MP API, the first field is the primary one and fields
+        prefixed with ``-`` are sorted in descending order. Missing values sort
+        last.
+        """
+        keys = []
+        for sort_field in sort_fields:
+            if sort_field.strip("-"):
+                keys.extend(self._sort_keys(sort_field))
+        if not keys:
+            return np.arange(len(self))
+        # NOTE: lexsort sorts on the last key first
+        return np.lexsort(keys[::-1])
+
+    def sort(self, sort_fields: list[str]) -> "DocTable":
+        return self.take(self.argsort(sort_fields))
+
+    def top_k(self, sort_fields: list[str], k: int) -> "DocTable":
+        """Return the first `k` rows sorted on `sort_fields`."""
+        if k >= len(self):
+            return self.sort(sort_fields)
+        if k <= 0:
+            return self.take(np.arange(0))
+
+        sort_fields = [f for f in sort_fields if f.strip("-")]
+        if len(sort_fields) == 1:
+            field = sort_fields[0].lstrip("-")
+            if field not in self.nulls and _is_numeric(self.columns[field]):
+                # NOTE: partial selection of the k-th smallest key, only the
+                # rows up to it are sorted. All the rows tied with it are kept
+                # in their order, so that the result is the one of a stable sort
+                _, key = self._sort_keys(sort_fields[0])
+                kth = np.partition(key, k - 1)[k - 1]
+                candidates = np.flatnonzero(key <= kth)
+                return self.take(candidates[np.argsort(key[candidates], kind="stable")[:k]])
+        return self.take(self.argsort(sort_fields)[:k])
+
+    def to_docs(self, fields: Iterable[str] | None = None) -> list[dict]:
+        """Rebuild the documents, with plain Python values."""
+        fields = self.fields if fields is None else [f for f in fields if f in self.columns]
+        columns = {}
+        for field in fields:
+            values = self.columns[field].tolist()
+            mask = self.nulls.get(field)
+            if mask is not None:
+                values = [None if null else v for v, null in zip(values, mask.tolist())]
+            columns[field] = values
+        return [
+            {field: columns[field][i] for field in fields} for i in range(len(self))
+        ]
@@ -0,0 +1,86 @@
+"""Bounded top-k selection over streamed documents.
+
+Endpoints that cannot sort server-side are paged through and reduced to the
+`k` best documents on the fly, so memory stays O(k) regardless of how many
+documents match the query.
+"""
+
+import heapq
+from collections.abc import Callable, Iterable
+from functools import cmp_to_key
+from typing import Any
+
+
+def _compare(a: Any, b: Any) -> int:
+    return (a > b) - (a < b)
+
+
+def sort_key(sort_fields: list[str]) -> Callable[[dict], Any]:
+    """Return a key sorting documents on `sort_fields`.
+
+    As on the MP API, the first field is the primary one and fields prefixed
+    with ``-`` are sorted in descending order. Missing values sort last.
+    """
+    fields = [(f.lstrip("-"), f.startswith("-")) for f in sort_fields if f.strip("-")]
+
+    def compare(x: dict, y: dict) -> int:
+        for field, descending in fields:
+            a, b = x.get(field), y.get(field)
+            if a is None or b is None:
+                order = (a is None) - (b is None)
+            else:
+                order = -_compare(a, b) if descending else _compare(a, b)
+            if order:
+                return order
+        return 0
+
+    return cmp_to_key(compare)
+
+
+class _Kept:
+    """Heap entry ordered from the worst document kept to the best one."""
+
+    __slots__ = ("key", "seq", "doc")
+
+    def __init__(self, key: Any, seq: int, doc: dict):
+        self.key = key
+        self.seq = seq
+        self.doc = doc
+
+    def __lt__(self, other: "_Kept") -> bool:
+        return (other.key, other.seq) < (self.key, self.seq)
+
+
+class TopK:
+    """First `k` documents sorted on `sort_fields` among all the ones pushed.
+
+    The documents kept are held in a heap of at most `k` entries rooted at the
+    worst of them, so pages can be pushed as they arrive, from sync or async
+    code. Ties keep the document pushed first, as a stable sort would.
+    """
+
+    def __init__(self, sort_fields: list[str], k: int):
+        self.k = k
+        self._key = sort_key(sort_fields)
+        self._heap: list[_Kept] = []
+        self._pushed = 0
+
+    def push(self, docs: Iterable[dict]) -> None:
+        for doc in docs:
+            kept = _Kept(self._key(doc), self._pushed, doc)
+            self._pushed += 1
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, kept)
+            elif self._heap and self._heap[0] < kept:
+                heapq.heapreplace(self._heap, kept)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def result(self) -> list[dict]:
+        return [kept.doc for kept in sorted(self._heap, reverse=True)]
+
+
+def top_k(docs: Iterable[dict], sort_fields: list[str], k: int) -> list[dict]:
+    """Return the first `k` documents of `docs` sorted on `sort_fields`."""
+    return heapq.nsmallest(k, docs, key=sort_key(sort_fields))
@@ -0,0 +1,265 @@
+"""Shared fixtures.
+
+Redis is served in-process by fakeredis over TCP, so the real connection pools,
+pub/sub and stream code paths run against it without a Redis server. The
+Materials Project API is replaced by `StubMP`, a local HTTP server that both
+`MPRester` and the async client talk to. Both servers are started before any
+`llamp` or `mp_api` module is imported, since their clients read
+``REDIS_HOST``, ``REDIS_PORT`` and ``MP_API_ENDPOINT`` when they are first
+created.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+try:
+    from fakeredis import TcpFakeServer
+except ImportError:
+    TcpFakeServer = None
+
+_server = None
+if TcpFakeServer is not None:
+
+    class Server(TcpFakeServer):
+        # NOTE: the default listen backlog of 5 resets connections when many
+        # streams subscribe at once
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # NOTE: replies are written one by one, with Nagle's algorithm every
+            # pipeline waits for a delayed ACK
+            self.RequestHandlerClass = type(
+                "RequestHandler", (self.RequestHandlerClass,), {"disable_nagle_algorithm": True}
+            )
+
+    _server = Server(("127.0.0.1", 0), server_type="redis")
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    os.environ["REDIS_HOST"], port = _server.server_address
+    os.environ["REDIS_PORT"] = str(port)
+    os.environ.pop("REDIS_PASSWORD", None)
+
+
+# NOTE: MPRester rejects keys that are not 32 characters long
+API_KEY = "0123456789abcdef0123456789abcdef"
+
+
+class StubMP:
+    """State of the stub MP API, reset by the `mp_server` fixture.
+
+    Attributes:
+        docs: documents served by every endpoint, e.g. ``docs["materials/summary"]``
+        requests: ``(endpoint, params, api_key)`` of every request received
+        delay: seconds every request takes
+        max_in_flight: most requests handled at the same time since the reset
+        max_ids: maximum `material_ids` per request, larger requests are
+            rejected with a 400 like the real API does
+        status: status code every request fails with, if set
+        valid_keys: API keys accepted, any key if None
+        db_version: database version returned by the heartbeat
+    """
+
+    api_key = API_KEY
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.docs: dict[str, list[dict]] = {}
+        self.requests: list[tuple[str, dict, str]] = []
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_ids: int | None = None
+        self.status: int | None = None
+        self.valid_keys: set[str] | None = None
+        self.db_version = "2024.01.01"
+
+    def calls(self, endpoint: str) -> list[dict]:
+        """Params of the requests received by `endpoint`."""
+        with self.lock:
+            return [params for name, params, _ in self.requests if name == endpoint]
+
+    def respond(self, endpoint: str, params: dict[str, str], api_key: str) -> tuple[int, dict]:
+        if endpoint == "heartbeat":
+            return 200, {"db_version": self.db_version, "version": "0.78.0"}
+        with self.lock:
+            self.requests.append((endpoint, params, api_key))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        if self.status is not None:
+            return self.status, {"detail": "Stub MP API failure"}
+        if self.valid_keys is not None and api_key not in self.valid_keys:
+            return 401, {"detail": "Invalid API key"}
+
+        docs = self.docs.get(endpoint, [])
+        if "material_ids" in params:
+            material_ids = params["material_ids"].split(",")
+            if self.max_ids is not None and len(material_ids) > self.max_ids:
+                return 400, {"detail": f"At most {self.max_ids} material_ids per request"}
+            material_ids = set(material_ids)
+            docs = [doc for doc in docs if doc.get("material_id") in material_ids]
+        if "formula" in params:
+            formulas = set(params["formula"].split(","))
+            docs = [doc for doc in docs if doc.get("formula_pretty") in formulas]
+        for sort_field in reversed(params.get("_sort_fields", "").split(",")):
+            if sort_field:
+                name = sort_field.lstrip("-")
+                docs = sorted(docs, key=lambda doc: doc.get(name), reverse=sort_field.startswith("-"))
+        skip = int(params.get("_skip", 0))
+        limit = int(params.get("_limit", 1000))
+        page = docs[skip:skip + limit]
+        if "_fields" in params and params.get("_all_fields") != "true":
+            fields = params["_fields"].split(",")
+            page = [{f: doc[f] for f in fields if f in doc} for doc in page]
+        return 200, {"data": page, "meta": {"total_doc": len(docs), "time_stamp": "2024-01-01T00:00:00"}}
+
+
+stub_mp = StubMP()
+
+
+class StubMPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, body = stub_mp.respond(
+            url.path.strip("/"), params, self.headers.get("X-API-KEY", "")
+        )
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_mp_server = ThreadingHTTPServer(("127.0.0.1", 0), StubMPHandler)
+_mp_server.daemon_threads = True
+_mp_server.request_queue_size = 1024
+threading.Thread(target=_mp_server.serve_forever, daemon=True).start()
+os.environ["MP_API_ENDPOINT"] = "http://{}:{}/".format(*_mp_server.server_address)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    _mp_server.shutdown()
+    _mp_server.server_close()
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+
+
+@pytest.fixture
+def mp_server():
+    """The stub MP API, with empty endpoints and a cleared response cache."""
+    pytest.importorskip("mp_api")
+    from llamp.utilities.mp_cache import get_response_cache
+
+    stub_mp.reset()
+    get_response_cache().clear()
+    yield stub_mp
+    stub_mp.reset()
+    get_response_cache().clear()
+
+
+@pytest.fixture
+def redis_client():
+    """Sync client on the shared pool, emptied after the test."""
+    if _server is None:
+        pytest.skip("fakeredis is not installed")
+    from llamp.utilities.redis_pool import get_async_pool, get_redis_client
+
+    client = get_redis_client()
+    yield client
+    client.flushall()
+    # NOTE: every test runs its own event loop, asyncio connections cannot be
+    # carried over to the next one
+    get_async_pool().reset()
+
+
+@pytest.fixture
+def arun(redis_client):
+    """Run a coroutine in a new event loop, closing its Redis connections after."""
+    from llamp.utilities.redis_pool import get_async_pool
+
+    async def main(coro):
+        from llamp.utilities import mp_async
+
+        try:
+            return await coro
+        finally:
+            await mp_async.aclose()
+            await get_async_pool().disconnect()
+
+    return lambda coro: asyncio.run(main(coro))
+
+
+@pytest.fixture
+def fake_chat(redis_client, monkeypatch):
+    """Replace the agent run of the chat endpoints by one that streams the words
+    of the query, without keys validation.
+
+    Returns the settings of the fake run: `first_delay` seconds before the
+    first token, then `delay` seconds between tokens.
+    """
+    pytest.importorskip("fastapi")
+    from llamp import sse
+    from llamp.callbacks import events, redis_stream
+    from llamp.callbacks.streaming_redis_handler import StreamingRedisCallbackHandler
+
+    class FakeChat:
+        first_delay = 0.0
+        delay = 0.005
+
+    fake = FakeChat()
+
+    async def prepare_chat(query):
+        return query.chat_id
+
+    async def agent_events(input_data, chat_id, *keys, start_id=None):
+        handler = StreamingRedisCallbackHandler(
+            redis_channel=chat_id, backend=redis_stream.STREAM_BACKEND
+        )
+
+        async def publish():
+            await asyncio.sleep(fake.first_delay)
+            for token in input_data.split():
+                await handler.on_llm_new_token(token)
+                await asyncio.sleep(fake.delay)
+            await handler.publish_event(events.FINAL, "")
+
+        messages = await sse.subscribe_to_chat(chat_id, start_id)
+        run = asyncio.create_task(publish())
+        try:
+            async for message_id, message in messages:
+                event = events.decode(message)
+                yield message_id, event
+                if events.is_terminal(event):
+                    break
+        finally:
+            await messages.aclose()
+            # NOTE: the run outlives the client, as with the stream backend
+            await run
+
+    monkeypatch.setattr(sse, "prepare_chat", prepare_chat)
+    monkeypatch.setattr(sse, "agent_events", agent_events)
+    return fake
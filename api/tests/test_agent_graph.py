@@ -0,0 +1,71 @@
+"""Reuse of the agent graph across the requests made with the same keys."""
+
+import asyncio
+import statistics
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+OPENAI_API_KEY = "sk-test"
+N_REQUESTS = 10
+
+
+@pytest.fixture
+def sse(mp_server, monkeypatch):
+    from llamp import sse
+    from llamp.utilities.cache import TTLCache
+
+    monkeypatch.setattr(sse, "agent_graph_cache", TTLCache(maxsize=2, ttl=3600))
+    return sse
+
+
+def test_graph_is_shared_per_keys_and_evicted(sse, mp_server):
+    async def run():
+        first = await sse.get_agent_graph(OPENAI_API_KEY, mp_server.api_key)
+        again = await sse.get_agent_graph(OPENAI_API_KEY, mp_server.api_key)
+        await sse.get_agent_graph("sk-other", mp_server.api_key)
+        await sse.get_agent_graph("sk-third", mp_server.api_key)
+        evicted = await sse.get_agent_graph(OPENAI_API_KEY, mp_server.api_key)
+        return first, again, evicted
+
+    first, again, evicted = asyncio.run(run())
+    assert again is first
+    assert evicted is not first
+
+
+def test_per_request_tools_do_not_leak_between_chats(sse, mp_server):
+    graph = asyncio.run(sse.get_agent_graph(OPENAI_API_KEY, mp_server.api_key))
+    first = graph.tools("chat-1", callbacks=[])
+    second = graph.tools("chat-2", callbacks=[])
+    assert [tool.name for tool in first] == [tool.name for tool in second]
+    # NOTE: the visualizer is the only expert bound to the chat
+    visualizer = next(tool for tool in first if "Visualizer" in tool.name)
+    assert visualizer not in second
+
+
+def test_setup_time_benchmark(sse, mp_server):
+    from llamp.utilities.mp import get_mprester
+
+    def uncached(chat_id):
+        # NOTE: what every message paid before, down to a new MPRester per tool
+        get_mprester.cache_clear()
+        return sse.AgentGraph(OPENAI_API_KEY, mp_server.api_key).tools(chat_id, callbacks=[])
+
+    async def cached(chat_id):
+        graph = await sse.get_agent_graph(OPENAI_API_KEY, mp_server.api_key)
+        return graph.tools(chat_id, callbacks=[])
+
+    def timed(setup):
+        times = []
+        for i in range(N_REQUESTS):
+            start = time.perf_counter()
+            setup(f"chat-{i}")
+            times.append(time.perf_counter() - start)
+        return statistics.median(times) * 1000
+
+    before = timed(uncached)
+    after = timed(lambda chat_id: asyncio.run(cached(chat_id)))
+    print(f"\nagent setup per request: {before:.1f} ms rebuilt, {after:.1f} ms cached")
+    assert after < before
@@ -0,0 +1,76 @@
+"""Caching of MP API key validations against the stub MP API."""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+INVALID_KEY = "f" * 32
+
+
+@pytest.fixture
+def sse(mp_server, monkeypatch):
+    from llamp import sse
+
+    sse.api_key_cache.clear()
+    yield sse
+    sse.api_key_cache.clear()
+
+
+def validate(sse, api_key, times=1):
+    async def run():
+        return [
+            await sse.cached_validate(sse.validate_mp_api_key, api_key, "Invalid MP API Key")
+            for _ in range(times)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_valid_key_is_validated_once(sse, mp_server):
+    mp_server.valid_keys = {mp_server.api_key}
+
+    assert validate(sse, mp_server.api_key, times=5) == [(True, None)] * 5
+    assert len(mp_server.calls("materials/provenance")) == 1
+
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_rejected_key_is_cached(sse, mp_server, status):
+    mp_server.status = status
+
+    assert validate(sse, INVALID_KEY, times=3) == [(False, "Invalid MP API Key")] * 3
+    assert len(mp_server.calls("materials/provenance")) == 1
+
+
+def test_rejected_key_is_validated_again_after_ttl(sse, mp_server, monkeypatch):
+    monkeypatch.setattr(sse, "API_KEY_NEGATIVE_CACHE_TTL", 0.2)
+    mp_server.valid_keys = {mp_server.api_key}
+
+    validate(sse, INVALID_KEY, times=3)
+    assert len(mp_server.calls("materials/provenance")) == 1
+    time.sleep(0.3)
+    validate(sse, INVALID_KEY, times=3)
+    assert len(mp_server.calls("materials/provenance")) == 2
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transient_failures_are_not_cached(sse, mp_server, status):
+    mp_server.status = status
+
+    # NOTE: MPRester retries some statuses itself, every validation must still
+    # reach the API
+    assert validate(sse, mp_server.api_key) == [(False, "MP API Unavailable")]
+    per_validation = len(mp_server.calls("materials/provenance"))
+    assert validate(sse, mp_server.api_key) == [(False, "MP API Unavailable")]
+    assert len(mp_server.calls("materials/provenance")) == 2 * per_validation
+
+    # NOTE: the key is accepted as soon as the API is back
+    mp_server.status = None
+    assert validate(sse, mp_server.api_key) == [(True, None)]
+
+
+def test_wrong_length_key_is_rejected_without_request(sse, mp_server):
+    assert validate(sse, "legacy-key", times=2) == [(False, "Invalid MP API Key")] * 2
+    assert mp_server.calls("materials/provenance") == []
@@ -0,0 +1,21 @@
+"""Atomate2 tool inputs: the lazily imported VASP input set is still validated."""
+
+import pytest
+
+pytest.importorskip("atomate2")
+
+from langchain.pydantic_v1 import ValidationError  # noqa: E402
+
+ATOMS = {"positions": [[0.0, 0.0, 0.0]], "numbers": [26], "cell": [[2.8, 0, 0], [0, 2.8, 0], [0, 0, 2.8]]}
+
+
+def test_input_set_generator_is_a_vasp_input_generator():
+    from atomate2.vasp.sets.core import StaticSetGenerator
+
+    from llamp.atomate2.schemas import VASPInput
+
+    assert VASPInput(atom_path_or_dict=ATOMS).input_set_generator is not None
+    generator = StaticSetGenerator()
+    assert VASPInput(atom_path_or_dict=ATOMS, input_set_generator=generator).input_set_generator is generator
+    with pytest.raises(ValidationError, match="VaspInputGenerator"):
+        VASPInput(atom_path_or_dict=ATOMS, input_set_generator={"incar": {}})
@@ -0,0 +1,87 @@
+"""Long material_ids lists, fanned out in batches under the stub's per-request cap."""
+
+import asyncio
+import json
+import math
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+N_IDS = 350
+DELAY = 0.1
+
+
+@pytest.fixture
+def wrapper(mp_server):
+    from llamp.utilities.batching import MP_IDS_BATCH_SIZE
+    from llamp.utilities.mp import MPAPIWrapper
+
+    docs = [
+        {"material_id": f"mp-{i}", "formula_pretty": f"Fe{i}O", "energy_above_hull": (i * 11 % N_IDS) / 1000}
+        for i in range(N_IDS)
+    ]
+    for endpoint in ("materials/thermo", "materials/magnetism"):
+        mp_server.docs[endpoint] = docs
+    mp_server.max_ids = MP_IDS_BATCH_SIZE
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def query(**params):
+    return {"material_ids": ",".join(f"mp-{i}" for i in range(N_IDS)), **params}
+
+
+def assert_batched(mp_server, endpoint):
+    from llamp.utilities.batching import MP_IDS_BATCH_SIZE
+
+    sizes = [len(params["material_ids"].split(",")) for params in mp_server.calls(endpoint)]
+    assert sum(sizes) == N_IDS
+    # NOTE: the fewest batches, evenly sized rather than 100, 100, 100 and 50
+    assert len(sizes) == math.ceil(N_IDS / MP_IDS_BATCH_SIZE)
+    assert max(sizes) <= MP_IDS_BATCH_SIZE
+    assert min(sizes) > MP_IDS_BATCH_SIZE / 2
+
+
+def test_stub_rejects_long_lists(wrapper, mp_server):
+    status, body = mp_server.respond("materials/thermo", query(), mp_server.api_key)
+    assert status == 400
+
+
+def test_sorted_search_is_batched(wrapper, mp_server):
+    result = wrapper.search_materials_thermo(query(limit=N_IDS, fields="material_id,energy_above_hull"))
+
+    assert [doc["energy_above_hull"] for doc in result] == sorted(i / 1000 for i in range(N_IDS))
+    assert_batched(mp_server, "materials/thermo")
+
+
+def test_batches_are_merged_in_order(wrapper, mp_server):
+    result = wrapper.search_materials_magnetism(query(fields="material_id"))
+
+    assert [doc["material_id"] for doc in result] == [f"mp-{i}" for i in range(N_IDS)]
+    assert_batched(mp_server, "materials/magnetism")
+
+
+def test_async_search_is_batched(wrapper, mp_server):
+    result = asyncio.run(wrapper.arun(
+        "search_materials_thermo__get", json.dumps(query(limit=N_IDS, fields="material_id"))
+    ))
+
+    assert len(result) == N_IDS
+    assert_batched(mp_server, "materials/thermo")
+
+
+def test_batches_run_concurrently_and_are_timed(wrapper, mp_server):
+    from llamp.utilities import metrics
+
+    # NOTE: long enough for the batches to overlap in the stub if they run concurrently
+    mp_server.delay = DELAY
+    with metrics.request_scope() as counts:
+        result = wrapper.search_materials_magnetism(query(fields="material_id"))
+
+    batches = len(mp_server.calls("materials/magnetism"))
+    assert len(result) == N_IDS
+    assert counts["mp_id_batches"] == batches > 1
+    assert counts["mp_id_batch_ms"] >= batches * DELAY * 1000
+    assert mp_server.max_in_flight > 1
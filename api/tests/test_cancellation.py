@@ -0,0 +1,126 @@
+"""Agent runs of disconnected clients: cancelled, or left to finish for a resume."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("fastapi")
+
+DELAY = 0.05
+N_TOOL_CALLS = 4
+ACTION = 'Action:\n```\n{"action": "slow_lookup", "action_input": "Fe2O3"}\n```'
+FINAL = 'Action:\n```\n{"action": "Final Answer", "action_input": "done"}\n```'
+
+
+@pytest.fixture
+def sse_backend(monkeypatch, request):
+    from llamp import sse
+    from llamp.callbacks import redis_stream
+
+    backend = getattr(request, "param", "pubsub")
+    monkeypatch.setattr(sse, "STREAM_BACKEND", backend)
+    monkeypatch.setattr(redis_stream, "STREAM_BACKEND", backend)
+    return backend
+
+
+@pytest.fixture
+def slow_agent(redis_client, monkeypatch):
+    """Run the chat endpoints on an LLM and a tool that take DELAY seconds each.
+
+    The LLM calls the tool N_TOOL_CALLS times before answering. Returns the
+    list the tool appends its inputs to when it starts.
+    """
+    from langchain.tools import StructuredTool
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from llamp import sse
+
+    class SlowChatModel(FakeListChatModel):
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(DELAY)
+            return self._generate(messages, stop=stop, **kwargs)
+
+    started = []
+
+    async def slow_lookup(query: str) -> str:
+        started.append(query)
+        await asyncio.sleep(DELAY)
+        return "Fe2O3 is hematite"
+
+    class SlowGraph:
+        llm = SlowChatModel(responses=[ACTION] * N_TOOL_CALLS + [FINAL])
+
+        def tools(self, chat_id, callbacks):
+            return [StructuredTool.from_function(
+                coroutine=slow_lookup,
+                name="slow_lookup",
+                description="Look up a material.",
+                callbacks=callbacks,
+            )]
+
+    async def prepare_chat(query):
+        return query.chat_id
+
+    async def get_agent_graph(*keys):
+        return SlowGraph()
+
+    monkeypatch.setattr(sse, "prepare_chat", prepare_chat)
+    monkeypatch.setattr(sse, "get_agent_graph", get_agent_graph)
+    return started
+
+
+async def disconnect_after_first_tool_call(sse, started, chat_id):
+    """Read a chat turn and go away as soon as the tool started once."""
+    query = sse.Query(text="Fe2O3?", OpenAiAPIKey="sk-test", mpAPIKey="mp", chat_id=chat_id)
+    response = await sse.chat_sse(query)
+
+    async def read():
+        async for _ in response.body_iterator:
+            pass
+
+    # NOTE: the client goes away like Starlette does on http.disconnect, by
+    # cancelling the task that streams the response
+    reader = asyncio.create_task(read())
+    while not started:
+        await asyncio.sleep(0.005)
+    reader.cancel()
+    await asyncio.gather(reader, return_exceptions=True)
+
+
+def test_no_tool_call_starts_after_disconnect(sse_backend, slow_agent, arun):
+    from llamp import sse
+    from llamp.utilities import metrics
+
+    before = metrics.snapshot()
+
+    async def run():
+        await disconnect_after_first_tool_call(sse, slow_agent, "chat-cancel")
+        # NOTE: time for the rest of the turn, had it not been cancelled
+        await asyncio.sleep(2 * N_TOOL_CALLS * DELAY)
+
+    arun(run())
+    after = metrics.snapshot()
+    assert slow_agent == ["Fe2O3"]
+    assert after.get("cancelled_runs", 0) == before.get("cancelled_runs", 0) + 1
+    assert not sse.detached_runs
+
+
+@pytest.mark.parametrize("sse_backend", ["stream"], indirect=True)
+def test_stream_backend_run_finishes_for_resume(sse_backend, slow_agent, arun):
+    from llamp import sse
+    from llamp.callbacks import events
+
+    async def run():
+        await disconnect_after_first_tool_call(sse, slow_agent, "chat-detached")
+        assert len(sse.detached_runs) == 1
+        resumed = await sse.resume_chat_sse("chat-detached", last_event_id=None)
+        body = b"".join([chunk async for chunk in resumed.body_iterator]).decode()
+        await asyncio.gather(*sse.detached_runs)
+        return body
+
+    body = arun(run())
+    assert slow_agent == ["Fe2O3"] * N_TOOL_CALLS
+    assert f"event: {events.FINAL}" in body
+    assert "done" in body
+    assert not sse.detached_runs
@@ -0,0 +1,71 @@
+"""Cold-start budget of the API worker: importing llamp.sse stays light."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+# NOTE: about 3x what importing llamp.sse takes on a laptop, to catch an eager
+# import of the agent stack (mp_api and pymatgen alone are several seconds)
+IMPORT_TIME_CAP_MS = 3000
+MAX_RSS_CAP_MB = 200
+
+HEAVY_MODULES = [
+    "mp_api",
+    "pymatgen",
+    "langchain.agents",
+    "langchain_openai",
+    "openai",
+    "torch",
+    "mace",
+    "atomate2",
+]
+
+# NOTE: ru_maxrss of a forked process starts from the peak of its parent (here
+# pytest), the VmHWM of the new address space does not
+IMPORT_SSE = """
+import json, resource, sys
+
+import llamp.sse
+
+def max_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps({
+    "max_rss_kb": max_rss_kb(),
+    "loaded": [name for name in json.loads(sys.argv[1]) if name in sys.modules],
+}))
+"""
+
+
+def cold_import():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SSE, json.dumps(HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    # NOTE: lines are "import time: self [us] | cumulative | imported package"
+    import_us = next(
+        int(fields[1])
+        for fields in (line.split("|") for line in result.stderr.splitlines())
+        if len(fields) == 3 and fields[2].strip() == "llamp.sse"
+    )
+    return import_us / 1000, json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_time_and_memory_budget():
+    import_ms, report = cold_import()
+    max_rss_mb = report["max_rss_kb"] / 1024
+    print(f"\nimport llamp.sse: {import_ms:.0f} ms, max RSS {max_rss_mb:.0f} MB")
+    assert report["loaded"] == []
+    assert import_ms < IMPORT_TIME_CAP_MS
+    assert max_rss_mb < MAX_RSS_CAP_MB
@@ -0,0 +1,188 @@
+"""Observation compaction: token counts per endpoint and format, agent latency."""
+
+import json
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from llamp.utilities.compaction import (
+    OBSERVATION_TOKEN_BUDGET,
+    compact_observation,
+    count_tokens,
+)
+from llamp.utilities.result_store import get_result_store
+
+# NOTE: responses shaped like the MP API's, with pymatgen's bundled structures
+FIXTURES = Path(__file__).parent / "fixtures" / "mp"
+ENDPOINTS = sorted(path.stem for path in FIXTURES.glob("*.json"))
+
+
+def load(endpoint: str) -> list[dict]:
+    return json.loads((FIXTURES / f"{endpoint}.json").read_text())
+
+
+def tokens(observation) -> int:
+    if isinstance(observation, str):
+        return count_tokens(observation)
+    return count_tokens(json.dumps(observation))
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_large_responses_fit_the_budget_and_stay_readable(endpoint):
+    docs = load(endpoint)
+    compacted = compact_observation(docs, format="json")
+
+    if tokens(docs) <= OBSERVATION_TOKEN_BUDGET:
+        assert compacted == docs
+        return
+    # NOTE: the header and the row that crosses the budget are let through
+    assert tokens(compacted) < OBSERVATION_TOKEN_BUDGET * 1.1
+    handle = re.search(r"handle (\S+)", compacted)
+    if handle is None:
+        # NOTE: nothing left out but digits, one line per document
+        assert len(compacted.splitlines()) == len(docs) + 2
+    else:
+        assert get_result_store().page(handle.group(1), limit=len(docs)) == docs
+
+
+def test_token_counts_per_endpoint():
+    print(f"\ntokens per observation, budget {OBSERVATION_TOKEN_BUDGET}:")
+    print(f"{'endpoint':>22} {'docs':>5} {'raw':>7} {'json':>6} {'csv':>6} {'markdown':>9}")
+    for endpoint in ENDPOINTS:
+        docs = load(endpoint)
+        raw = tokens(docs)
+        counts = {
+            format: tokens(compact_observation(docs, format=format))
+            for format in ("json", "csv", "markdown")
+        }
+        print(
+            f"{endpoint:>22} {len(docs):>5} {raw:>7} {counts['json']:>6} "
+            f"{counts['csv']:>6} {counts['markdown']:>9}"
+        )
+        assert all(count <= raw for count in counts.values())
+
+
+def test_json_responses_within_the_budget_are_unchanged():
+    (doc,) = load("elasticity")[:1]
+    assert tokens([doc]) <= OBSERVATION_TOKEN_BUDGET
+
+    assert compact_observation([doc], format="json") == [doc]
+
+
+@pytest.mark.parametrize("format", ["csv", "markdown"])
+def test_small_responses_are_rendered_as_tables(format):
+    docs = load("thermo")[:3]
+    assert tokens(docs) <= OBSERVATION_TOKEN_BUDGET
+
+    table = compact_observation(docs, format=format)
+    assert isinstance(table, str)
+    lines = table.splitlines()
+    assert lines[0].startswith(f"{len(docs)} results as")
+    header = lines[1].strip("| ").replace(" | ", ",").split(",")
+    assert "material_id" in header and "energy_above_hull" in header
+    rows = [line for line in lines[2:] if set(line) != set("|-")]
+    assert len(rows) == len(docs)
+    assert all(doc["material_id"] in row for doc, row in zip(docs, rows))
+    assert tokens(table) < tokens(docs)
+
+
+def test_default_format_is_tabular():
+    from llamp.utilities import compaction
+
+    assert compaction.OBSERVATION_FORMAT in ("csv", "markdown")
+
+
+def test_structure_and_tensor_tools_keep_json():
+    pytest.importorskip("langchain")
+    from llamp.mp.tools import (
+        MaterialsElasticity,
+        MaterialsStructureText,
+        MaterialsStructureVis,
+    )
+
+    for tool in (MaterialsStructureText, MaterialsStructureVis, MaterialsElasticity):
+        assert tool.__fields__["observation_format"].default == "json"
+
+
+def test_elasticity_tool_keeps_the_elastic_tensor(mp_server):
+    from llamp.mp.tools import MaterialsElasticity
+
+    (doc,) = load("elasticity")[:1]
+    mp_server.docs["materials/elasticity"] = [doc]
+    tool = MaterialsElasticity(mp_api_key=mp_server.api_key)
+
+    (observed,) = tool._run(material_ids=doc["material_id"], fields="material_id,elastic_tensor")
+    assert observed["elastic_tensor"] == doc["elastic_tensor"]
+
+
+def test_tokens_per_row():
+    from llamp.utilities.compaction import compact_table
+
+    print("\ntokens per row of the whole table:")
+    for endpoint in ("summary", "thermo"):
+        docs = load(endpoint)
+        counts = {"dicts": tokens(docs) / len(docs)}
+        for format in ("json", "csv", "markdown"):
+            table = compact_table(docs, budget=10**6, format=format)
+            counts[format] = tokens(table) / len(docs)
+        print(f"{endpoint:>8}: " + ", ".join(f"{name} {count:.0f}" for name, count in counts.items()))
+        assert counts["csv"] < counts["dicts"] / 2
+
+
+# NOTE: seconds the fake LLM takes per prompt token
+COST_PER_TOKEN = 20e-6
+N_TOOL_CALLS = 3
+
+
+def test_agent_latency_benchmark(mp_server, monkeypatch):
+    """A thermo expert on a fake LLM that takes time in proportion to its prompt."""
+    pytest.importorskip("langchain")
+    from langchain_core.language_models.chat_models import SimpleChatModel
+
+    from llamp.mp import tools
+    from llamp.mp.agents import MPThermoExpert
+
+    thermo = load("thermo")
+    docs = [{**doc, "material_id": f"mp-{i}"} for i, doc in enumerate(thermo * 4)]
+    mp_server.docs["materials/thermo"] = docs
+    action = '"action": "search_materials_thermo__get"'
+    prompt_tokens = []
+
+    class PerTokenChatModel(SimpleChatModel):
+        @property
+        def _llm_type(self):
+            return "per-token"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            text = "\n".join(message.content for message in messages)
+            prompt_tokens.append(count_tokens(text))
+            time.sleep(prompt_tokens[-1] * COST_PER_TOKEN)
+            steps = text.count(action)
+            if steps == N_TOOL_CALLS:
+                return 'Action:\n```\n{"action": "Final Answer", "action_input": "done"}\n```'
+            query = {"fields": ",".join(thermo[0]), "limit": len(docs) - steps}
+            return f'Action:\n```\n{{{action}, "action_input": {json.dumps(query)}}}\n```'
+
+    def run(format):
+        expert = MPThermoExpert(llm=PerTokenChatModel(), mp_api_key=mp_server.api_key)
+        for tool in expert.tools:
+            tool.observation_format = format
+        prompt_tokens.clear()
+        start = time.perf_counter()
+        result = expert.as_executor(verbose=False).invoke({"input": "Which are stable?"})
+        assert result["output"] == "done"
+        return time.perf_counter() - start, sum(prompt_tokens)
+
+    results = {format: run(format) for format in ("json", "csv", "markdown")}
+    monkeypatch.setattr(tools, "compact_observation", lambda response, format: response)
+    results["uncompacted"] = run("json")
+
+    print(f"\n{N_TOOL_CALLS} thermo calls of up to {len(docs)} docs, {COST_PER_TOKEN * 1e6:.0f} us per prompt token:")
+    for name, (seconds, prompt) in results.items():
+        print(f"  {name:>11}: {prompt:>6} prompt tokens, {seconds * 1000:.0f} ms")
+    # NOTE: the fake LLM's latency follows its prompt, which is what is asserted
+    _, uncompacted_tokens = results.pop("uncompacted")
+    for _, prompt in results.values():
+        assert prompt < uncompacted_tokens / 2
@@ -0,0 +1,67 @@
+"""Dispatch of `MPAPIWrapper.run`: specs and routes compiled once per process."""
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+N_CALLS = 2000
+
+
+@pytest.fixture
+def wrapper(mp_server, monkeypatch):
+    from llamp.utilities import mp_cache
+    from llamp.utilities.mp import MPAPIWrapper
+
+    # NOTE: only the dispatch is timed, not the cache or the API
+    monkeypatch.setattr(mp_cache, "_cache", mp_cache.MPResponseCache(maxsize=0))
+    monkeypatch.setattr(MPAPIWrapper, "search_materials_thermo", lambda self, query_params: [])
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def test_specs_are_shared_across_wrappers(mp_server):
+    from llamp.utilities.mp import MPAPIWrapper, load_material_functions
+
+    first, second = MPAPIWrapper(), MPAPIWrapper()
+
+    assert first.material_functions == second.material_functions
+    # NOTE: read once in the whole session
+    assert load_material_functions.cache_info().misses == 1
+    assert first.json_spec is second.json_spec
+
+
+def per_call_us(fn):
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        fn()
+    return (time.perf_counter() - start) / N_CALLS * 1e6
+
+
+def test_run_dispatch_benchmark(wrapper):
+    from llamp.utilities.mp import DATA_DIR, MATERIAL_ROUTES
+
+    args = json.dumps({"material_ids": "mp-149", "fields": "material_id,energy_above_hull"})
+
+    def before():
+        # NOTE: what every call paid before: the function table read and
+        # parsed, and the route map of bound methods rebuilt
+        with open(DATA_DIR / "material_functions.json") as f:
+            functions = json.load(f)
+        names = [function["name"] for function in functions]
+        names.index("search_materials_thermo__get")
+        routes = {
+            name: getattr(wrapper, method) if method else None
+            for name, method in MATERIAL_ROUTES.items()
+        }
+        assert routes["search_materials_thermo__get"] is not None
+        return wrapper.run("search_materials_thermo__get", args)
+
+    assert wrapper.run("search_materials_thermo__get", args) == before() == []
+    before_us = per_call_us(before)
+    run_us = per_call_us(lambda: wrapper.run("search_materials_thermo__get", args))
+    print(f"\nrun() dispatch: {run_us:.0f} us per call, {before_us:.0f} us with the per-call reads")
+    assert run_us < before_us / 5
@@ -0,0 +1,96 @@
+"""Element-set bitmask index: same answers as set operations, at a fraction of the cost."""
+
+import random
+import time
+
+import numpy as np
+import pytest
+
+from llamp.utilities.element_index import SYMBOLS, ElementSetIndex
+
+N_BENCHMARK = 1_000_000
+# NOTE: common elements, and some above Z = 64 in the high half of the mask
+COMMON = ["H", "Li", "C", "N", "O", "F", "Na", "Mg", "Al", "Si", "P", "S", "Fe", "Co", "Ni", "Cu"]
+HEAVY = ["La", "Ce", "Nd", "W", "Pt", "Au", "Pb", "Bi", "U"]
+
+
+def compositions(n, seed=0):
+    rng = random.Random(seed)
+    pool = COMMON * 3 + HEAVY
+    return [set(rng.sample(pool, rng.randint(1, 4))) for _ in range(n)]
+
+
+@pytest.fixture(scope="module")
+def small():
+    element_sets = compositions(5000)
+    return element_sets, ElementSetIndex.from_element_sets(element_sets)
+
+
+QUERIES = [["Fe"], ["Fe", "O"], ["Pb"], ["O", "U"], ["La", "Ni", "O"]]
+
+
+@pytest.mark.parametrize("elements", QUERIES)
+def test_contains_all_and_none(small, elements):
+    element_sets, index = small
+    query = set(elements)
+
+    assert index.contains_all(elements).tolist() == [query <= s for s in element_sets]
+    assert index.contains_none(elements).tolist() == [not query & s for s in element_sets]
+
+
+@pytest.mark.parametrize("chemsys", ["Fe-O", "O-Fe", "Pb", "Fe-*", "*-O-*", "Li-*-O", "Au-Pt"])
+def test_chemsys(small, chemsys):
+    element_sets, index = small
+    known = {e for e in chemsys.split("-") if e != "*"}
+    size = chemsys.count("-") + 1
+
+    expected = [known <= s and len(s) == size for s in element_sets]
+    assert index.chemsys(chemsys).tolist() == expected
+    assert index.any_chemsys([chemsys, "Si"]).tolist() == [
+        match or s == {"Si"} for match, s in zip(expected, element_sets)
+    ]
+
+
+def test_counts_and_unknown_elements():
+    index = ElementSetIndex.from_chemsys(["Fe-O", "", "-".join(SYMBOLS)])
+
+    assert index.counts.tolist() == [2, 0, len(SYMBOLS)]
+    assert index.contains_all(["Og", "H"]).tolist() == [False, False, True]
+    with pytest.raises(ValueError, match="Xx"):
+        index.contains_all(["Xx"])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def test_benchmark_on_a_million_compositions():
+    # NOTE: a few thousand distinct sets, repeated, as element sets are in MP
+    distinct = compositions(5000, seed=1)
+    rng = random.Random(2)
+    element_sets = [distinct[rng.randrange(len(distinct))] for _ in range(N_BENCHMARK)]
+    index, build_ms = timed(lambda: ElementSetIndex.from_element_sets(element_sets))
+
+    queries = {
+        "contains all Fe,O": (
+            lambda: index.contains_all(["Fe", "O"]),
+            lambda: [{"Fe", "O"} <= s for s in element_sets],
+        ),
+        "contains none of Pb,U": (
+            lambda: index.contains_none(["Pb", "U"]),
+            lambda: [not {"Pb", "U"} & s for s in element_sets],
+        ),
+        "chemsys Li-*-O": (
+            lambda: index.chemsys("Li-*-O"),
+            lambda: [{"Li", "O"} <= s and len(s) == 3 for s in element_sets],
+        ),
+    }
+    print(f"\n{N_BENCHMARK} compositions, index built in {build_ms:.0f} ms:")
+    for name, (vectorized, scan) in queries.items():
+        mask, index_ms = timed(vectorized)
+        expected, scan_ms = timed(scan)
+        assert np.array_equal(mask, np.array(expected))
+        print(f"  {name}: bitmask {index_ms:.1f} ms, set scan {scan_ms:.0f} ms")
+        assert index_ms < scan_ms / 5
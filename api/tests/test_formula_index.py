@@ -0,0 +1,157 @@
+"""Formula to material_ids resolution: local index, API fallback, two-hop latency."""
+
+import json
+import statistics
+import time
+
+import pytest
+
+from llamp.utilities.formula_index import reduced_formula
+
+pytest.importorskip("mp_api")
+
+N_DOCS = 2000
+N_QUERIES = 20
+DELAY = 0.03
+
+
+def synthetic_summary(n):
+    return [
+        {
+            "material_id": f"mp-{i}",
+            "formula_pretty": reduced_formula(f"Fe{i % 40 + 1}O{i % 7 + 2}"),
+            "chemsys": "Fe-O",
+            "elements": ["Fe", "O"],
+            "nelements": 2,
+            "deprecated": i % 25 == 0,
+        }
+        for i in range(n)
+    ]
+
+
+DOCS = synthetic_summary(N_DOCS)
+FORMULAS = sorted({doc["formula_pretty"] for doc in DOCS})
+
+
+def expected_ids(formulas):
+    return [doc["material_id"] for doc in DOCS if doc["formula_pretty"] in formulas and not doc["deprecated"]]
+
+
+@pytest.fixture
+def wrapper(mp_server, monkeypatch):
+    from llamp.utilities import formula_index, mirror
+    from llamp.utilities.mp import MPAPIWrapper
+
+    monkeypatch.setattr(mirror, "_mirror", None)
+    monkeypatch.setattr(mirror, "LLAMP_MP_MIRROR", None)
+    monkeypatch.setattr(formula_index, "_index", formula_index.FormulaIndex(use_redis=False))
+    mp_server.docs["materials/summary"] = DOCS
+    mp_server.docs["materials/dielectric"] = [
+        {"material_id": doc["material_id"], "formula_pretty": doc["formula_pretty"], "n": 2.0} for doc in DOCS
+    ]
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+@pytest.fixture
+def redis_index(redis_client, monkeypatch):
+    from llamp.utilities import formula_index
+
+    formula_index.refresh(redis_client, DOCS)
+    index = formula_index.FormulaIndex(use_redis=True)
+    monkeypatch.setattr(formula_index, "_index", index)
+    return index
+
+
+@pytest.fixture
+def mirror_index(tmp_path, monkeypatch):
+    from llamp.utilities import formula_index, mirror
+
+    fixture = tmp_path / "summary.json"
+    fixture.write_text(json.dumps(DOCS))
+    loaded = mirror.Mirror(mirror.load_fixture(fixture, tmp_path / "mirror"))
+    monkeypatch.setattr(mirror, "_mirror", loaded)
+    index = formula_index.FormulaIndex(use_redis=False)
+    monkeypatch.setattr(formula_index, "_index", index)
+    return index
+
+
+@pytest.mark.parametrize("source", ["redis_index", "mirror_index"])
+def test_any_missing_formula_falls_back_to_the_api(wrapper, source, request):
+    index = request.getfixturevalue(source)
+
+    assert sorted(index.material_ids(formula=FORMULAS[:2])) == sorted(expected_ids(FORMULAS[:2]))
+    assert sorted(index.material_ids(chemsys="O-Fe")) == sorted(expected_ids(FORMULAS))
+    # NOTE: a formula missing from the index may be newer than it
+    assert index.material_ids(formula=[FORMULAS[0], "Cu2O"]) is None
+    assert index.material_ids(chemsys=["Fe-O", "Cu-O"]) is None
+
+
+def test_no_index_skips_parsing_formulas(wrapper, mp_server, monkeypatch):
+    from llamp.utilities import formula_index
+
+    def reduced_formula(formula):
+        raise AssertionError("formulas parsed without an index")
+
+    monkeypatch.setattr(formula_index, "reduced_formula", reduced_formula)
+    assert formula_index.get_formula_index().material_ids(formula=FORMULAS[:2]) is None
+    docs = wrapper.search_materials_dielectric({"formula": FORMULAS[0]})
+    assert sorted(doc["material_id"] for doc in docs) == sorted(expected_ids(FORMULAS[:1]))
+
+
+def test_unresolved_formula_matches_nothing(wrapper, mp_server):
+    assert wrapper.search_materials_elasticity({"formula": "Cu2O"}) == []
+    assert wrapper.search_materials_dielectric({"formula": "Cu2O"}) == []
+    assert mp_server.calls("materials/elasticity") == []
+    assert mp_server.calls("materials/dielectric") == []
+
+
+@pytest.mark.parametrize("source", [None, "redis_index", "mirror_index"])
+def test_resolved_formula_is_queried(wrapper, mp_server, source, request):
+    if source:
+        request.getfixturevalue(source)
+    docs = wrapper.search_materials_dielectric({"formula": f"{FORMULAS[0]},{FORMULAS[1]}"})
+
+    assert sorted(doc["material_id"] for doc in docs) == sorted(expected_ids(FORMULAS[:2]))
+    assert bool(mp_server.calls("materials/summary")) is (source is None)
+
+
+@pytest.mark.parametrize("source", [None, "redis_index", "mirror_index"])
+def test_formula_resolved_to_many_ids_queries_them_all(wrapper, mp_server, source, request):
+    if source:
+        request.getfixturevalue(source)
+    mp_server.docs["materials/magnetism"] = [
+        {"material_id": doc["material_id"], "formula_pretty": doc["formula_pretty"], "ordering": "FM"} for doc in DOCS
+    ]
+    expected = expected_ids(FORMULAS[:2])
+    assert len(expected) > 1
+
+    docs = wrapper.search_materials_magnetism({"formula": f"{FORMULAS[0]},{FORMULAS[1]}"})
+    assert sorted(doc["material_id"] for doc in docs) == sorted(expected)
+
+
+def test_two_hop_latency_benchmark(wrapper, mp_server, request):
+    mp_server.delay = DELAY
+
+    def latency():
+        times = []
+        for formula in FORMULAS[:N_QUERIES]:
+            start = time.perf_counter()
+            assert wrapper.search_materials_dielectric({"formula": formula})
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
+
+    medians = {"api": latency()}
+    request.getfixturevalue("redis_index")
+    medians["redis"] = latency()
+    request.getfixturevalue("mirror_index")
+    medians["mirror"] = latency()
+
+    print(
+        f"\nformula -> dielectric, {DELAY * 1000:.0f} ms per MP request, median: "
+        + ", ".join(f"{name} {ms:.1f} ms" for name, ms in medians.items())
+    )
+    # NOTE: only the API run made the first hop, the indexes answered it locally
+    assert len(mp_server.calls("materials/summary")) == N_QUERIES
+    assert len(mp_server.calls("materials/dielectric")) == 3 * N_QUERIES
@@ -0,0 +1,167 @@
+"""The join tool against a round of experts, on a fake LLM and the stub MP API."""
+
+import json
+import re
+import time
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+N_IDS = 250
+LLM_DELAY = 0.05
+MP_DELAY = 0.05
+EXPERTS = {
+    "MPThermoExpert": ("search_materials_thermo__get", "material_id,energy_above_hull,is_stable"),
+    "MPElasticityExpert": ("search_materials_elasticity__get", "material_id,bulk_modulus"),
+    "MPMagnetismExpert": ("search_materials_magnetism__get", "material_id,ordering"),
+}
+JOIN_ENDPOINTS = ["summary", "thermo", "elasticity", "magnetism"]
+
+
+def synthetic_docs(n):
+    return {
+        "materials/summary": [
+            {"material_id": f"mp-{i}", "formula_pretty": f"Fe{i}O", "energy_above_hull": 0.0, "is_stable": True,
+             "band_gap": 1.0, "density": 5.0}
+            for i in range(n)
+        ],
+        "materials/thermo": [
+            {"material_id": f"mp-{i}", "formation_energy_per_atom": -1.5, "energy_above_hull": i / 1000,
+             "is_stable": i == 0}
+            for i in range(n)
+        ],
+        "materials/elasticity": [
+            {"material_id": f"mp-{i}", "bulk_modulus": {"vrh": 100.0 + i}, "shear_modulus": {"vrh": 50.0},
+             "young_modulus": 1.3e11, "homogeneous_poisson": 0.3, "universal_anisotropy": 0.1}
+            for i in range(n)
+        ],
+        "materials/magnetism": [
+            {"material_id": f"mp-{i}", "ordering": "FM" if i % 2 else "NM", "is_magnetic": bool(i % 2),
+             "total_magnetization": float(i % 2), "num_magnetic_sites": i % 2}
+            for i in range(n)
+        ],
+    }
+
+
+@pytest.fixture
+def wrapper(mp_server):
+    from llamp.utilities.mp import MPAPIWrapper
+
+    mp_server.docs.update(synthetic_docs(N_IDS))
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def test_batches_are_limited_to_their_size(wrapper, mp_server):
+    from llamp.utilities.batching import MP_IDS_BATCH_SIZE
+
+    mp_server.max_ids = MP_IDS_BATCH_SIZE
+    material_ids = [f"mp-{i}" for i in range(N_IDS)]
+    rows = wrapper.join_materials({"material_ids": ",".join(material_ids)})
+
+    assert [row["material_id"] for row in rows] == material_ids
+    assert [row["elasticity.bulk_modulus"]["vrh"] for row in rows] == [100.0 + i for i in range(N_IDS)]
+    for endpoint in JOIN_ENDPOINTS:
+        calls = mp_server.calls(f"materials/{endpoint}")
+        assert len(calls) > 1
+        for params in calls:
+            assert params["_limit"] == str(len(params["material_ids"].split(",")))
+
+
+def action(name, action_input):
+    blob = json.dumps({"action": name, "action_input": action_input})
+    return f"Action:\n```\n{blob}\n```"
+
+
+@pytest.fixture
+def llm_calls():
+    """Fake chat models for the supervisor and the experts, and the list of their calls."""
+    from langchain_core.language_models.chat_models import SimpleChatModel
+
+    calls = []
+
+    class ScriptedChatModel(SimpleChatModel):
+        role: str
+
+        @property
+        def _llm_type(self):
+            return "scripted"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            calls.append(self.role)
+            time.sleep(LLM_DELAY)
+            text = "\n".join(message.content for message in messages)
+            material_ids = ",".join(dict.fromkeys(re.findall(r"mp-\d+", text.split("Question")[-1])))
+            done = set(re.findall(r'"action": "(\w+)"', text))
+            if self.role == "expert":
+                # NOTE: the expert's tool is the only MP tool in its prompt
+                tool, fields = next(
+                    (tool, fields) for tool, fields in EXPERTS.values() if tool in text
+                )
+                if tool in done:
+                    return action("Final Answer", "see the observation")
+                return action(tool, {"material_ids": material_ids, "fields": fields})
+            if "join_materials_properties" in text:
+                if "join_materials_properties" in done:
+                    return action("Final Answer", "joined")
+                return action("join_materials_properties", {"material_ids": material_ids})
+            for expert in EXPERTS:
+                if expert not in done:
+                    return action(expert, {"input": f"Properties of {material_ids}"})
+            return action("Final Answer", "compared")
+
+    return calls, ScriptedChatModel
+
+
+def test_join_benchmark(wrapper, mp_server, llm_calls):
+    from langchain.agents import AgentType, initialize_agent
+
+    from llamp.mp import agents
+    from llamp.mp.tools import MaterialsJoin
+    from llamp.utilities.mp import DEFAULT_JOIN_ENDPOINTS
+
+    calls, ScriptedChatModel = llm_calls
+    mp_server.delay = MP_DELAY
+    question = "Compare the stability, bulk modulus and magnetic ordering of mp-1, mp-2 and mp-3"
+
+    def supervise(tools):
+        executor = initialize_agent(
+            agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+            tools=tools,
+            llm=ScriptedChatModel(role="supervisor"),
+            max_iterations=5,
+            handle_parsing_errors=True,
+        )
+        calls.clear()
+        mp_server.max_in_flight = 0
+        start = time.perf_counter()
+        executor.invoke({"input": question})
+        return list(calls), time.perf_counter() - start, mp_server.max_in_flight
+
+    expert_llm = ScriptedChatModel(role="expert")
+    experts = [
+        getattr(agents, name)(llm=expert_llm, mp_api_key=mp_server.api_key).as_tool(
+            agent_kwargs={"verbose": False}
+        )
+        for name in EXPERTS
+    ]
+    runs = {
+        "experts": supervise(experts),
+        "join": supervise([MaterialsJoin(handle_tool_error=True, mp_api_key=mp_server.api_key)]),
+    }
+
+    print(f"\n3 materials, {LLM_DELAY * 1000:.0f} ms per LLM call, {MP_DELAY * 1000:.0f} ms per MP request:")
+    for name, (made, seconds, _) in runs.items():
+        print(f"  {name:>7}: {len(made)} LLM calls ({made.count('expert')} by experts), {seconds * 1000:.0f} ms")
+    expert_calls, _, expert_in_flight = runs["experts"]
+    join_calls, _, join_in_flight = runs["join"]
+    assert len(expert_calls) == 4 + 2 * len(EXPERTS)
+    assert join_calls == ["supervisor"] * 2
+    # NOTE: the experts query one endpoint after the other, the join all at once
+    assert expert_in_flight == 1
+    assert join_in_flight == len(DEFAULT_JOIN_ENDPOINTS)
+    for endpoint in ("thermo", "elasticity", "magnetism"):
+        # NOTE: once per expert, once for the join
+        assert len(mp_server.calls(f"materials/{endpoint}")) == 2
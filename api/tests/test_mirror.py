@@ -0,0 +1,159 @@
+"""Summary queries answered by the local mirror, against the remote stub path."""
+
+import json
+import random
+import statistics
+import time
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+N_DOCS = 20_000
+N_QUERIES = 50
+ELEMENTS = ["Fe", "O", "Li", "Co", "Ni", "Mn", "Si", "Al"]
+
+
+def synthetic_summary(n, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        elements = sorted(rng.sample(ELEMENTS, rng.randint(1, 3)))
+        docs.append({
+            "material_id": f"mp-{i}",
+            "formula_pretty": "".join(f"{el}{rng.randint(1, 4)}" for el in elements),
+            "chemsys": "-".join(elements),
+            "nelements": len(elements),
+            "nsites": rng.randint(1, 200) if i % 10 else None,
+            "band_gap": round(rng.uniform(0, 5), 3),
+            "energy_above_hull": round(rng.uniform(0, 0.5), 4),
+            "is_stable": i % 7 == 0,
+            "deprecated": i % 50 == 0,
+            "bulk_modulus": {"vrh": round(rng.uniform(10, 300), 1)} if i % 3 else None,
+            "symmetry": {"number": rng.randint(1, 230)},
+        })
+    return docs
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return synthetic_summary(N_DOCS)
+
+
+@pytest.fixture
+def mirror(docs, tmp_path, monkeypatch):
+    from llamp.utilities import mirror
+
+    fixture = tmp_path / "summary.json"
+    fixture.write_text(json.dumps(docs))
+    directory = mirror.load_fixture(fixture, tmp_path / "mirror")
+    loaded = mirror.Mirror(directory)
+    monkeypatch.setattr(mirror, "_mirror", loaded)
+    return loaded
+
+
+@pytest.fixture
+def wrapper(mp_server, docs, monkeypatch):
+    from llamp.utilities import mp_cache
+    from llamp.utilities.mp import MPAPIWrapper
+
+    # NOTE: every query goes to the mirror or to the API, none to the cache
+    monkeypatch.setattr(mp_cache, "_cache", mp_cache.MPResponseCache(maxsize=0))
+    mp_server.docs["materials/summary"] = docs
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def search(wrapper, **params):
+    return wrapper.search_materials_summary(dict(params))
+
+
+def test_filters_are_answered_locally(wrapper, mirror, mp_server, docs):
+    result = search(
+        wrapper,
+        fields="material_id,band_gap,nsites",
+        elements="Fe,O",
+        band_gap_min=1.0,
+        k_vrh_max=150,
+        sort_fields="-band_gap",
+        limit=20,
+    )
+
+    expected = [
+        doc for doc in docs
+        if {"Fe", "O"} <= set(doc["chemsys"].split("-"))
+        and doc["band_gap"] >= 1.0
+        and doc["bulk_modulus"] is not None and doc["bulk_modulus"]["vrh"] <= 150
+        and not doc["deprecated"]
+    ]
+    expected = sorted(expected, key=lambda doc: -doc["band_gap"])[:20]
+    assert [doc["material_id"] for doc in result] == [doc["material_id"] for doc in expected]
+    # NOTE: the mirror keeps ints with missing values as ints
+    assert [doc["nsites"] for doc in result] == [doc["nsites"] for doc in expected]
+    assert mp_server.calls("materials/summary") == []
+
+
+def test_unmirrored_fields_fall_back_to_the_api(wrapper, mirror, mp_server):
+    search(wrapper, fields="material_id,structure", material_ids="mp-1,mp-2")
+    search(wrapper, fields="material_id", formula="Fe2O3")
+
+    assert len(mp_server.calls("materials/summary")) == 2
+
+
+@pytest.mark.parametrize(
+    "column, params",
+    [
+        ("spacegroup_number", {"spacegroup_number": 225}),
+        ("material_id", {"material_ids": "mp-1,mp-2"}),
+    ],
+)
+def test_missing_columns_fall_back_to_the_api(wrapper, docs, mp_server, tmp_path, monkeypatch, column, params):
+    from llamp.utilities import mirror
+
+    # NOTE: a mirror built before the column was added
+    directory = mirror.build_mirror(docs[:100], tmp_path / "mirror")
+    manifest = json.loads((directory / "manifest.json").read_text())
+    manifest["columns"].remove(column)
+    (directory / "manifest.json").write_text(json.dumps(manifest))
+    monkeypatch.setattr(mirror, "_mirror", mirror.Mirror(directory))
+
+    (name, value), = params.items()
+    assert mirror.get_mirror()._param_mask(name, value) is None
+    result = search(wrapper, fields="band_gap", **params)
+    assert len(mp_server.calls("materials/summary")) == 1
+    assert result
+
+
+def test_latency_benchmark(wrapper, mirror, mp_server, docs, monkeypatch):
+    from llamp.utilities import mirror as mirror_module
+
+    rng = random.Random(1)
+    queries = [
+        {
+            "fields": "material_id,formula_pretty,band_gap",
+            "material_ids": ",".join(f"mp-{rng.randrange(N_DOCS)}" for _ in range(5)),
+            "sort_fields": "band_gap",
+        }
+        for _ in range(N_QUERIES)
+    ]
+
+    def latencies():
+        times, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(search(wrapper, **query))
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times), results
+
+    local_ms, local = latencies()
+    monkeypatch.setattr(mirror_module, "_mirror", None)
+    monkeypatch.setattr(mirror_module, "LLAMP_MP_MIRROR", None)
+    remote_ms, remote = latencies()
+
+    print(f"\nsummary query on {N_DOCS} docs, median: mirror {local_ms:.2f} ms, remote stub {remote_ms:.2f} ms")
+    # NOTE: the stub answers deprecated materials too, the mirror excludes them
+    for local_docs, remote_docs in zip(local, remote):
+        assert local_docs == [doc for doc in remote_docs if not docs[int(doc["material_id"][3:])]["deprecated"]]
+    # NOTE: only the remote run reached the stub
+    assert len(mp_server.calls("materials/summary")) == N_QUERIES
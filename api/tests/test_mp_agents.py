@@ -0,0 +1,155 @@
+"""MP experts: tools and prompts built once and shared, async tool calls."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+OTHER_API_KEY = "fedcba9876543210fedcba9876543210"
+
+
+@pytest.fixture
+def llm():
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(openai_api_key="sk-test")
+
+
+def test_tools_and_prompt_are_memoized(llm, mp_server):
+    from llamp.mp.agents import MPThermoExpert
+
+    expert = MPThermoExpert(llm=llm, mp_api_key=mp_server.api_key)
+    assert expert.tools is expert.tools
+    assert expert.prompt is expert.prompt
+    # NOTE: pydantic shallow-copies the tools into every executor, the copies
+    # share the wrapper and its MPRester session
+    for executor in (expert.as_executor(), expert.as_executor()):
+        for tool, shared in zip(executor.tools, expert.tools):
+            assert tool.api_wrapper is shared.api_wrapper
+
+
+@pytest.mark.parametrize("api_keys", [1, 2])
+def test_one_mprester_session_per_api_key(llm, mp_server, monkeypatch, api_keys):
+    from llamp import sse
+    from llamp.utilities import metrics
+    from llamp.utilities.cache import TTLCache
+    from llamp.utilities.mp import get_mprester
+
+    monkeypatch.setattr(sse, "agent_graph_cache", TTLCache(maxsize=2, ttl=3600))
+    get_mprester.cache_clear()
+    keys = [mp_server.api_key, OTHER_API_KEY][:api_keys]
+
+    # NOTE: everything one top-level request builds: the graph of every
+    # expert, the per-chat visualizer and the executors of all of them
+    with metrics.request_scope() as counts:
+        for key in keys:
+            graph = sse.AgentGraph("sk-test", key)
+            graph.tools("chat", callbacks=[])
+            for expert in graph.experts:
+                expert.as_executor()
+    print(f"\nMPRester sessions for {api_keys} key(s): {counts['mprester_sessions_opened']}")
+    assert counts["mprester_sessions_opened"] == api_keys
+
+
+def test_shared_mprester_keeps_its_settings(mp_server):
+    from mp_api.client import MPRester
+
+    from llamp.utilities.mp import get_mprester
+
+    get_mprester.cache_clear()
+    shared = get_mprester(mp_server.api_key)
+    # NOTE: e.g. the validation of another key, with the default settings
+    with MPRester(OTHER_API_KEY):
+        pass
+    for rester in (shared.materials.summary, shared.materials.thermo):
+        assert rester.use_document_model is False
+        assert rester.session is shared.session
+
+N_CONCURRENT = 16
+DELAY = 0.1
+E_ABOVE_HULL = 0.0123
+
+
+@pytest.fixture
+def thermo_llm():
+    """A chat model that looks up the thermo data of the material it is asked about."""
+    import re
+
+    from langchain_core.language_models.chat_models import SimpleChatModel
+
+    class ThermoChatModel(SimpleChatModel):
+        @property
+        def _llm_type(self):
+            return "thermo-chat"
+
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            text = "\n".join(message.content for message in messages)
+            # NOTE: the observation of the stub's documents
+            if str(E_ABOVE_HULL) in text:
+                answer = {"action": "Final Answer", "action_input": "found it"}
+            else:
+                material_id = re.search(r"mp-\d+", text).group()
+                answer = {
+                    "action": "search_materials_thermo__get",
+                    "action_input": {"material_ids": material_id, "fields": "material_id,energy_above_hull"},
+                }
+            return f"Action:\n```\n{json.dumps(answer)}\n```"
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            return self._generate(messages, stop=stop, **kwargs)
+
+    return ThermoChatModel()
+
+
+def test_expert_tool_calls_are_concurrent_on_one_worker(thermo_llm, mp_server):
+    """Supervisor calls of an expert tool, with a single worker thread for the loop."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from langchain.tools import StructuredTool
+
+    from llamp.mp.agents import ChainInputSchema, MPThermoExpert
+
+    mp_server.docs["materials/thermo"] = [
+        {"material_id": f"mp-{i}", "energy_above_hull": E_ABOVE_HULL} for i in range(N_CONCURRENT + 1)
+    ]
+    mp_server.delay = DELAY
+    tool = MPThermoExpert(llm=thermo_llm, mp_api_key=mp_server.api_key).as_tool(
+        agent_kwargs={"verbose": False}
+    )
+    # NOTE: the tool as it was, without a coroutine
+    sync_tool = StructuredTool.from_function(
+        func=tool.func, name=tool.name, description=tool.description, args_schema=ChainInputSchema
+    )
+
+    def load(tool, offset):
+        mp_server.max_in_flight = 0
+
+        async def main():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                tool.ainvoke({"input": f"Is mp-{offset + i} stable?"})
+                for i in range(N_CONCURRENT // 2)
+            ))
+            return results, time.perf_counter() - start
+
+        return (*asyncio.run(main()), mp_server.max_in_flight)
+
+    # NOTE: the database version and the tokenizer are loaded once, up front
+    asyncio.run(tool.ainvoke({"input": f"Is mp-{N_CONCURRENT} stable?"}))
+    results, async_s, async_in_flight = load(tool, 0)
+    sync_results, sync_s, sync_in_flight = load(sync_tool, N_CONCURRENT // 2)
+
+    print(
+        f"\n{N_CONCURRENT // 2} concurrent expert calls on one worker thread, {DELAY * 1000:.0f} ms "
+        f"per MP request: coroutine {async_s * 1000:.0f} ms, sync in a thread {sync_s * 1000:.0f} ms"
+    )
+    assert all(result["output"] == "found it" for result in results + sync_results)
+    assert len(mp_server.calls("materials/thermo")) == N_CONCURRENT + 1
+    # NOTE: the sync tool holds the only worker for each MP request in turn,
+    # the coroutines wait on the MP requests together
+    assert sync_in_flight == 1
+    assert async_in_flight > 1
@@ -0,0 +1,122 @@
+"""Response cache of MPAPIWrapper.run against the stub MP API."""
+
+import json
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+SUMMARY = "search_materials_summary__get"
+DOCS = [
+    {"material_id": "mp-19770", "formula_pretty": "Fe2O3", "energy_above_hull": 0.0},
+    {"material_id": "mp-24972", "formula_pretty": "Fe2O3", "energy_above_hull": 0.1},
+    {"material_id": "mp-1271", "formula_pretty": "Fe3O4", "energy_above_hull": 0.0},
+    {"material_id": "mp-13", "formula_pretty": "Fe", "energy_above_hull": 0.0},
+]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    from llamp.utilities import mp_cache
+
+    cache = mp_cache.MPResponseCache(maxsize=2, ttl=60, use_redis=False)
+    monkeypatch.setattr(mp_cache, "_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def wrapper(mp_server, cache):
+    from llamp.utilities.mp import MPAPIWrapper
+
+    mp_server.docs["materials/summary"] = DOCS
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def search(wrapper, **params):
+    params.setdefault("_fields", "material_id,formula_pretty")
+    return wrapper.run(SUMMARY, json.dumps(params))
+
+
+def counted(run):
+    from llamp.utilities import metrics
+
+    with metrics.request_scope() as counts:
+        response = run()
+    return response, counts
+
+
+def test_equivalent_queries_hit(wrapper, mp_server):
+    first, first_counts = counted(lambda: search(
+        wrapper, formula="Fe2O3", _fields="material_id,formula_pretty"))
+    # NOTE: same query with another key order and field order
+    again, again_counts = counted(lambda: search(
+        wrapper, _fields="formula_pretty, material_id", formula="Fe2O3"))
+
+    assert again == first
+    assert len(mp_server.calls("materials/summary")) == 1
+    assert first_counts["mp_cache_misses"] == 1
+    assert again_counts["mp_cache_hits"] == 1
+
+
+def test_different_queries_miss(wrapper, mp_server):
+    search(wrapper, formula="Fe2O3")
+    _, counts = counted(lambda: search(wrapper, formula="Fe3O4"))
+
+    assert len(mp_server.calls("materials/summary")) == 2
+    assert counts["mp_cache_misses"] == 1
+    assert counts["mp_cache_hits"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(wrapper, mp_server, cache):
+    search(wrapper, formula="Fe2O3")
+    search(wrapper, formula="Fe3O4")
+    search(wrapper, formula="Fe2O3")
+    # NOTE: the cache holds 2 entries, Fe3O4 is the least recently used
+    _, counts = counted(lambda: search(wrapper, formula="Fe"))
+    search(wrapper, formula="Fe2O3")
+    search(wrapper, formula="Fe3O4")
+
+    assert counts["mp_cache_evictions"] == 1
+    assert [params["formula"] for params in mp_server.calls("materials/summary")] == [
+        "Fe2O3", "Fe3O4", "Fe", "Fe3O4",
+    ]
+    assert cache.stats["evictions"] == 2
+
+
+def test_new_database_version_invalidates(wrapper, mp_server, cache):
+    search(wrapper, formula="Fe2O3")
+    search(wrapper, formula="Fe2O3")
+    mp_server.db_version = "2024.02.01"
+    # NOTE: the version is trusted for MP_DB_VERSION_TTL, as if it expired
+    cache._versions.clear()
+    search(wrapper, formula="Fe2O3")
+    search(wrapper, formula="Fe2O3")
+
+    assert len(mp_server.calls("materials/summary")) == 2
+
+
+def test_errors_are_not_cached(wrapper, mp_server):
+    mp_server.status = 400
+    failed = search(wrapper, formula="Fe2O3")
+    mp_server.status = None
+    response = search(wrapper, formula="Fe2O3")
+
+    assert failed.startswith(f"Error on {SUMMARY}")
+    assert [doc["material_id"] for doc in response] == ["mp-19770", "mp-24972"]
+    assert len(mp_server.calls("materials/summary")) == 2
+
+
+def test_redis_tier_is_shared_between_workers(wrapper, mp_server, redis_client, monkeypatch):
+    from llamp.utilities import mp_cache
+
+    monkeypatch.setattr(mp_cache, "_cache", mp_cache.MPResponseCache(use_redis=True))
+    first = search(wrapper, formula="Fe2O3")
+    # NOTE: another worker, with an empty in-process tier
+    monkeypatch.setattr(mp_cache, "_cache", mp_cache.MPResponseCache(use_redis=True))
+    again, counts = counted(lambda: search(wrapper, formula="Fe2O3"))
+
+    assert again == first
+    assert counts["mp_cache_redis_hits"] == 1
+    assert len(mp_server.calls("materials/summary")) == 1
@@ -0,0 +1,121 @@
+"""Sorted MP searches on a broad query: server-side sort, paged top-k, fetch all."""
+
+import random
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("mp_api")
+
+N_DOCS = 50_000
+LIMIT = 10
+FIELDS = ["material_id", "formula_pretty", "band_gap"]
+
+
+def synthetic_docs(n):
+    rng = random.Random(0)
+    return [
+        {
+            "material_id": f"mp-{i}",
+            "formula_pretty": f"Fe{i % 7 + 1}O{i % 5 + 1}",
+            "band_gap": round(rng.uniform(0, 5), 3),
+            "energy_above_hull": round(rng.uniform(0, 1), 4),
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return synthetic_docs(N_DOCS)
+
+
+@pytest.fixture
+def wrapper(mp_server, docs):
+    from llamp.utilities.mp import MPAPIWrapper
+
+    mp_server.docs["materials/summary"] = docs
+    mp_server.docs["materials/electronic_structure"] = docs
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def expected(docs, sort_field):
+    best = sorted(docs, key=lambda doc: (doc[sort_field], doc["material_id"]))[:LIMIT]
+    return [doc["material_id"] for doc in best]
+
+
+def measure(search):
+    """Return the result of `search()`, its latency in ms and its peak memory in MB."""
+    start = time.perf_counter()
+    search()
+    latency = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    try:
+        result = search()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, latency, peak / 2**20
+
+
+def test_summary_sorts_and_limits_server_side(wrapper, mp_server, docs):
+    result = wrapper.search_materials_summary(
+        {"fields": "material_id,band_gap", "sort_fields": "band_gap,material_id", "limit": LIMIT}
+    )
+
+    assert [doc["material_id"] for doc in result] == expected(docs, "band_gap")
+    (params,) = mp_server.calls("materials/summary")
+    assert params["_limit"] == str(LIMIT)
+    assert params["_sort_fields"] == "band_gap,material_id"
+
+
+def test_comma_separated_criteria_are_not_split(wrapper, mp_server, docs):
+    # NOTE: MPRester._search would send one request per formula, each with a
+    # share of the limit, and concatenate their sorted results
+    result = wrapper.search_materials_summary(
+        {"fields": "material_id,band_gap", "formula": "Fe1O1,Fe2O2", "sort_fields": "band_gap,material_id", "limit": LIMIT}
+    )
+
+    matching = [doc for doc in docs if doc["formula_pretty"] in ("Fe1O1", "Fe2O2")]
+    assert [doc["material_id"] for doc in result] == expected(matching, "band_gap")
+    (params,) = mp_server.calls("materials/summary")
+    assert params["formula"] == "Fe1O1,Fe2O2"
+    assert params["_limit"] == str(LIMIT)
+
+
+def test_unsorted_endpoint_is_paged_into_the_top_k(wrapper, mp_server, docs):
+    result = wrapper.search_materials_electronic_structure({"limit": LIMIT})
+
+    assert [doc["material_id"] for doc in result] == expected(docs, "band_gap")
+    assert all("_sort_fields" not in params for params in mp_server.calls("materials/electronic_structure"))
+
+
+def test_broad_query_benchmark(wrapper, mp_server, docs):
+    def fetch_all():
+        # NOTE: what the searches did before: every chunk, then sorted client-side
+        found = wrapper.mpr.materials.electronic_structure._search(
+            num_chunks=None, chunk_size=1000, all_fields=False, fields=FIELDS
+        )
+        return sorted(found, key=lambda doc: (doc["band_gap"], doc["material_id"]))[:LIMIT]
+
+    runs = {
+        "fetch all and sort": fetch_all,
+        "paged top-k": lambda: wrapper.search_materials_electronic_structure({"limit": LIMIT}),
+        "server-side sort": lambda: wrapper.search_materials_summary(
+            {"fields": "material_id,band_gap", "sort_fields": "band_gap,material_id", "limit": LIMIT}
+        ),
+    }
+    results = {name: measure(search) for name, search in runs.items()}
+    print(f"\n{N_DOCS} docs, top {LIMIT} on band_gap:")
+    for name, (_, latency, peak) in results.items():
+        print(f"  {name}: {latency:.0f} ms, peak {peak:.1f} MB")
+
+    for result, _, _ in results.values():
+        assert [doc["material_id"] for doc in result] == expected(docs, "band_gap")
+    _, _, baseline_peak = results["fetch all and sort"]
+    assert results["paged top-k"][2] < baseline_peak / 4
+    assert results["server-side sort"][2] < baseline_peak / 4
+    assert results["server-side sort"][1] < results["fetch all and sort"][1]
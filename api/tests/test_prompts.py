@@ -0,0 +1,111 @@
+"""Bundled prompts: importing the agents needs no network, prompts load once."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("langchain")
+
+AGENT_MODULES = ["llamp.mp.agents", "llamp.atomate2.agents", "llamp.arxiv.agents"]
+
+# NOTE: any hub pull or connection made while importing fails the import
+OFFLINE_IMPORT = """
+import importlib, json, socket, sys, time
+
+def offline(*args, **kwargs):
+    raise OSError("network access during import")
+
+socket.socket.connect = offline
+socket.create_connection = offline
+import langchain.hub
+langchain.hub.pull = offline
+
+times = {}
+for name in sys.argv[1:]:
+    start = time.perf_counter()
+    try:
+        importlib.import_module(name)
+    except ModuleNotFoundError as e:
+        if not e.name.startswith("llamp"):
+            continue
+        raise
+    times[name] = time.perf_counter() - start
+print(json.dumps(times))
+"""
+
+
+def import_times(*modules):
+    result = subprocess.run(
+        [sys.executable, "-c", OFFLINE_IMPORT, *modules],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_agents_import_offline_benchmark():
+    times = import_times(*AGENT_MODULES)
+    assert "llamp.mp.agents" in times
+    # NOTE: the later modules share most of their imports with the first one
+    print("\nimport time offline: " + ", ".join(
+        f"{name} {seconds * 1000:.0f} ms" for name, seconds in times.items()
+    ))
+
+
+def test_prompts_module_is_cheap_to_import():
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import llamp.prompts"],
+        capture_output=True,
+        text=True,
+        timeout=300,
+        check=True,
+    ).stderr
+    # NOTE: lines are "import time: self [us] | cumulative | imported package"
+    self_us, cumulative_us = next(
+        (int(fields[0].split(":")[1]), int(fields[1]))
+        for fields in (line.split("|") for line in stderr.splitlines())
+        if len(fields) == 3 and fields[2].strip() == "llamp.prompts"
+    )
+    print(
+        f"\nllamp.prompts import: {self_us / 1000:.1f} ms own, "
+        f"{cumulative_us / 1000:.0f} ms with its dependencies"
+    )
+    # NOTE: no prompt is built at import, only the templates are defined
+    assert self_us < 50_000
+
+
+def test_prompts_are_built_once_and_copied():
+    from llamp import prompts
+
+    prompts._load_prompt.cache_clear()
+    first = prompts.get_prompt(prompts.REACT_MULTI_INPUT_JSON)
+    first.messages[0].prompt.template = "persona\n" + first.messages[0].prompt.template
+    second = prompts.get_prompt(prompts.REACT_MULTI_INPUT_JSON)
+
+    assert prompts._load_prompt.cache_info().misses == 1
+    assert second is not first
+    assert not second.messages[0].prompt.template.startswith("persona")
+    assert set(second.input_variables) >= {"input", "tools", "tool_names"}
+
+
+def test_refresh_pulls_from_the_hub(monkeypatch):
+    from langchain import hub
+
+    from llamp import prompts
+
+    pulled = []
+    monkeypatch.setenv("LLAMP_PROMPT_REFRESH", "1")
+    monkeypatch.setattr(
+        hub, "pull", lambda name: pulled.append(name) or prompts._BUNDLED[name]()
+    )
+    prompts._load_prompt.cache_clear()
+    try:
+        prompts.get_prompt(prompts.MAP_PROMPT)
+        prompts.get_prompt(prompts.MAP_PROMPT)
+    finally:
+        prompts._load_prompt.cache_clear()
+    assert pulled == [prompts.MAP_PROMPT]
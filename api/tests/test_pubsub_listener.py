@@ -0,0 +1,129 @@
+"""Event-driven pub/sub listener of /api/chat against the polling loop it replaced."""
+
+import asyncio
+import collections
+import contextlib
+import statistics
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+N_STREAMS = 20
+N_TOKENS = 20
+# NOTE: reads of the subscriptions per listener, whether or not a message came
+reads = collections.Counter()
+
+
+async def poll_pubsub(pubsub):
+    """The former listener: poll a sync subscription every 10 ms."""
+    while True:
+        message = pubsub.get_message()
+        reads["listen_polling"] += 1
+        if message and message["type"] == "message":
+            yield message["data"].decode()
+        await asyncio.sleep(0.01)
+
+
+async def listen_event_driven(channel):
+    from llamp import sse
+
+    messages = await sse.subscribe_to_chat(channel)
+    async for _, message in messages:
+        yield message
+
+
+async def listen_polling(channel):
+    import redis
+
+    from llamp.utilities.redis_pool import REDIS_HOST, REDIS_PORT
+
+    # NOTE: a connection of its own, as the former listener opened one client
+    # per stream
+    pubsub = redis.Redis(host=REDIS_HOST, port=REDIS_PORT).pubsub()
+    pubsub.subscribe(channel)
+    try:
+        async for message in poll_pubsub(pubsub):
+            yield message
+    finally:
+        pubsub.close()
+
+
+async def measure(listen, redis_client, idle_seconds=0.5):
+    """Return CPU seconds spent and reads made by idle listeners, and per-token latencies."""
+    latencies = []
+
+    async def consume(channel):
+        count = 0
+        async with contextlib.aclosing(listen(channel)) as messages:
+            async for message in messages:
+                latencies.append(time.perf_counter() - float(message))
+                count += 1
+                if count == N_TOKENS:
+                    return
+
+    channels = [f"bench-{listen.__name__}-{i}" for i in range(N_STREAMS)]
+    tasks = [asyncio.create_task(consume(channel)) for channel in channels]
+    await asyncio.sleep(0.2)
+
+    cpu, idle_reads = time.process_time(), reads[listen.__name__]
+    await asyncio.sleep(idle_seconds)
+    idle_cpu = time.process_time() - cpu
+    idle_reads = reads[listen.__name__] - idle_reads
+
+    for _ in range(N_TOKENS):
+        for channel in channels:
+            redis_client.publish(channel, repr(time.perf_counter()))
+        await asyncio.sleep(0.005)
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=10)
+    return idle_cpu, idle_reads, latencies
+
+
+def test_listener_delivers_messages_in_order(redis_client, arun):
+    async def run():
+        from llamp import sse
+
+        messages = await sse.subscribe_to_chat("chat-order")
+        for i in range(5):
+            redis_client.publish("chat-order", str(i))
+        received = []
+        async for message_id, message in messages:
+            received.append((message_id, message))
+            if len(received) == 5:
+                break
+        await messages.aclose()
+        return received
+
+    assert arun(run()) == [(str(i + 1), str(i)) for i in range(5)]
+
+
+def test_listener_benchmark(redis_client, arun, monkeypatch):
+    from redis.asyncio.client import PubSub
+
+    parse_response = PubSub.parse_response
+
+    async def counted_parse_response(self, *args, **kwargs):
+        response = await parse_response(self, *args, **kwargs)
+        reads["listen_event_driven"] += 1
+        return response
+
+    monkeypatch.setattr(PubSub, "parse_response", counted_parse_response)
+
+    async def run():
+        event_driven = await measure(listen_event_driven, redis_client)
+        polling = await measure(listen_polling, redis_client)
+        return polling, event_driven
+
+    (poll_cpu, poll_reads, poll_latencies), (event_cpu, event_reads, event_latencies) = arun(run())
+    poll_latency = statistics.median(poll_latencies) * 1000
+    event_latency = statistics.median(event_latencies) * 1000
+    print(
+        f"\n{N_STREAMS} idle streams over 0.5 s: polling {poll_cpu * 1000:.1f} ms CPU, "
+        f"{poll_reads} reads, event-driven {event_cpu * 1000:.1f} ms CPU, {event_reads} reads"
+        f"\nmedian token latency: polling {poll_latency:.2f} ms, "
+        f"event-driven {event_latency:.2f} ms"
+    )
+    # NOTE: idle polling listeners keep reading, event-driven ones wait for a message
+    assert event_reads == 0
+    assert poll_reads >= N_STREAMS
@@ -0,0 +1,52 @@
+"""Redis connections opened per chat turn with the shared pools."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain")
+
+N_REQUESTS = 20
+N_WAVES = 4
+N_TOKENS = 20
+
+
+def test_connections_stay_flat_under_load(redis_client, arun, mp_server, monkeypatch):
+    from llamp.callbacks.streaming_redis_handler import StreamingRedisCallbackHandler
+    from llamp.mp.tools import MaterialsStructureVis
+    from llamp.utilities import metrics
+
+    monkeypatch.setattr(
+        MaterialsStructureVis,
+        "_fetch",
+        lambda self, **_: [{"material_id": "mp-149", "structure": {"sites": []}}],
+    )
+
+    async def chat_turn(chat_id):
+        # NOTE: what one /api/chat turn opens: a handler per agent level and the
+        # structure tool of the retriever expert
+        with metrics.request_scope() as counts:
+            handlers = [
+                StreamingRedisCallbackHandler(redis_channel=chat_id, level=level)
+                for level in (0, 1)
+            ]
+            for i in range(N_TOKENS):
+                await asyncio.gather(*(h.on_llm_new_token(f"t{i}") for h in handlers))
+            tool = MaterialsStructureVis(chat_id=chat_id, mp_api_key=mp_server.api_key)
+            await asyncio.to_thread(tool._run, material_ids="mp-149")
+        return counts["redis_connections_opened"]
+
+    async def run():
+        waves = []
+        for wave in range(N_WAVES):
+            opened = await asyncio.gather(
+                *(chat_turn(f"pool-{wave}-{i}") for i in range(N_REQUESTS))
+            )
+            waves.append(sum(opened))
+        return waves
+
+    waves = arun(run())
+    print(f"\nconnections opened per wave of {N_REQUESTS} chat turns: {waves}")
+    # NOTE: the first wave fills the pools, the later ones reuse the connections
+    assert waves[0] <= 3 * N_REQUESTS
+    assert sum(waves[1:]) < N_REQUESTS
@@ -0,0 +1,119 @@
+"""Result store: results above the memory threshold are spilled to disk."""
+
+import json
+import time
+
+import pytest
+
+from llamp.utilities import metrics
+from llamp.utilities.result_store import ResultStore
+
+MEMORY_LIMIT = 10_000
+
+
+def result(n):
+    return [{"material_id": f"mp-{i}", "band_gap": i / 10, "symmetry": {"number": i % 230 + 1}} for i in range(n)]
+
+
+SMALL = result(10)
+LARGE = result(500)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(ttl=60, memory_limit=MEMORY_LIMIT, spill_dir=tmp_path / "spill", use_redis=False)
+
+
+def test_threshold():
+    assert len(json.dumps(SMALL)) <= MEMORY_LIMIT < len(json.dumps(LARGE))
+
+
+def test_small_results_stay_in_memory(store):
+    handle = store.put(SMALL)
+
+    assert store.local.get(handle) == SMALL
+    assert not store.spill_dir.exists()
+
+
+def test_large_results_are_spilled(store):
+    before = metrics.snapshot().get("results_spilled", 0)
+    handle = store.put(LARGE)
+
+    assert store.local.get(handle) is None
+    assert json.loads((store.spill_dir / f"{handle}.json").read_text()) == LARGE
+    assert metrics.snapshot()["results_spilled"] == before + 1
+    assert store.get(handle) == LARGE
+    assert store.page(handle, offset=100, limit=2, fields=["material_id", "symmetry.number"]) == [
+        {"material_id": "mp-100", "symmetry.number": 101},
+        {"material_id": "mp-101", "symmetry.number": 102},
+    ]
+    assert store.aggregate(handle, ["band_gap"])["band_gap"] == {
+        "count": 500, "min": 0.0, "max": 49.9, "mean": pytest.approx(24.95), "sum": pytest.approx(12475.0),
+    }
+
+
+def test_spilled_results_expire_and_are_purged(tmp_path):
+    store = ResultStore(ttl=0.2, memory_limit=MEMORY_LIMIT, spill_dir=tmp_path, use_redis=False)
+    expired = store.put(LARGE)
+    time.sleep(0.3)
+
+    assert store.get(expired) is None
+    assert store.page(expired) is None
+    # NOTE: expired files are removed on the next spill
+    fresh = store.put(LARGE)
+    assert [path.stem for path in tmp_path.glob("*.json")] == [fresh]
+
+
+def test_large_results_skip_redis(tmp_path, redis_client):
+    store = ResultStore(ttl=60, memory_limit=MEMORY_LIMIT, spill_dir=tmp_path, use_redis=True)
+    small, large = store.put(SMALL), store.put(LARGE)
+
+    assert json.loads(redis_client.get(f"result:{small}")) == SMALL
+    assert redis_client.get(f"result:{large}") is None
+    # NOTE: another worker, sharing Redis and the spill directory
+    other = ResultStore(ttl=60, memory_limit=MEMORY_LIMIT, spill_dir=tmp_path, use_redis=True)
+    assert other.get(small) == SMALL
+    assert other.get(large) == LARGE
+
+
+def test_reader_tool_pages_a_spilled_result(store, monkeypatch):
+    pytest.importorskip("langchain")
+    from llamp.mp.tools import MaterialsResultReader
+    from llamp.utilities import result_store
+
+    monkeypatch.setattr(result_store, "_store", store)
+    handle = store.put(LARGE)
+    reader = MaterialsResultReader()
+
+    assert reader._run(handle, offset=498, limit=5, fields="material_id") == [
+        {"material_id": "mp-498"}, {"material_id": "mp-499"},
+    ]
+    assert reader._run(handle, fields="band_gap", aggregate=True)["band_gap"]["count"] == 500
+    assert reader._run("unknown").startswith("Error")
+
+
+@pytest.mark.parametrize(
+    "handle", ["../outside", "../../outside", "sub/../../outside", "/tmp/outside", "0123456789ab/", "0123456789AB", ""]
+)
+def test_handles_outside_the_store_are_refused(tmp_path, handle):
+    store = ResultStore(ttl=60, memory_limit=MEMORY_LIMIT, spill_dir=tmp_path / "a" / "spill", use_redis=False)
+    (tmp_path / "a" / "outside.json").parent.mkdir(parents=True)
+    for path in (tmp_path / "outside.json", tmp_path / "a" / "outside.json"):
+        path.write_text(json.dumps(SMALL))
+
+    assert store.get(handle) is None
+    assert store.get(handle, default="missing") == "missing"
+    assert store.page(handle) is None
+    assert store.aggregate(handle, ["band_gap"]) is None
+
+
+def test_reader_tool_refuses_a_traversal_handle(store, monkeypatch, tmp_path):
+    pytest.importorskip("langchain")
+    from llamp.mp.tools import MaterialsResultReader
+    from llamp.utilities import result_store
+
+    monkeypatch.setattr(result_store, "_store", store)
+    (tmp_path / "secret.json").write_text(json.dumps(SMALL))
+
+    assert store.spill_dir.parent == tmp_path
+    assert MaterialsResultReader()._run("../secret").startswith("Error")
@@ -0,0 +1,99 @@
+"""Resuming chat turns on the Redis Streams backend."""
+
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+N_TOKENS = 20
+
+
+@pytest.fixture
+def sse(fake_chat, monkeypatch):
+    from llamp import sse
+    from llamp.callbacks import redis_stream
+
+    monkeypatch.setattr(sse, "STREAM_BACKEND", "stream")
+    monkeypatch.setattr(redis_stream, "STREAM_BACKEND", "stream")
+    return sse
+
+
+def query(sse, text, chat_id="chat-resume"):
+    return sse.Query(text=text, OpenAiAPIKey="sk-test", mpAPIKey="mp", chat_id=chat_id)
+
+
+def turn(prefix):
+    return " ".join(f"{prefix}{i}" for i in range(N_TOKENS))
+
+
+async def read_all(response):
+    return b"".join([chunk async for chunk in response.body_iterator]).decode()
+
+
+def parse_sse(body):
+    entries = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        entries.append((fields["id"], fields["event"], json.loads(fields["data"])["data"]))
+    return entries
+
+
+def parse_ndjson(body):
+    entries = [json.loads(line) for line in body.splitlines()]
+    return [(entry["id"], entry["data"]["event"], entry["data"]["data"]) for entry in entries]
+
+
+def test_disconnect_and_resume_without_duplicates_or_gaps(sse, arun):
+    async def run():
+        await read_all(await sse.chat_sse(query(sse, turn("a"))))
+
+        response = await sse.chat_sse(query(sse, turn("b")))
+        start_id = response.headers["X-Stream-Start"]
+        received = []
+        async for chunk in response.body_iterator:
+            received.extend(parse_sse(chunk.decode()))
+            if len(received) == 7:
+                break
+        # NOTE: the client goes away mid-turn
+        await response.body_iterator.aclose()
+
+        resumed = await sse.resume_chat_sse("chat-resume", last_event_id=received[-1][0])
+        return start_id, received + parse_sse(await read_all(resumed))
+
+    start_id, entries = arun(run())
+    assert start_id != "0-0"
+    assert [data for _, event, data in entries if event == "token"] == turn("b").split()
+    assert entries[-1][1] == "final"
+    ids = [entry_id for entry_id, _, _ in entries]
+    assert len(set(ids)) == len(ids)
+
+
+def test_resume_without_id_replays_latest_turn(sse, arun):
+    async def run():
+        await read_all(await sse.chat_sse(query(sse, turn("a"))))
+        await read_all(await sse.chat_sse(query(sse, turn("b"))))
+        replay = parse_ndjson(await read_all(await sse.resume_chat("chat-resume")))
+        resumed = parse_sse(
+            await read_all(await sse.resume_chat_sse("chat-resume", last_event_id=None))
+        )
+        return replay, resumed
+
+    replay, resumed = arun(run())
+    for entries in (replay, resumed):
+        assert [data for _, event, data in entries if event == "token"] == turn("b").split()
+
+
+def test_text_stream_exposes_turn_start(sse, arun):
+    async def run():
+        await read_all(await sse.chat(query(sse, turn("a"))))
+        response = await sse.chat(query(sse, turn("b")))
+        text = await read_all(response)
+        replay = await sse.resume_chat(
+            "chat-resume", last_id=response.headers["X-Stream-Start"]
+        )
+        return text, parse_ndjson(await read_all(replay))
+
+    text, replay = arun(run())
+    assert text == "[chat_id]chat-resume\n" + "".join(turn("b").split())
+    assert "".join(data for _, event, data in replay if event == "token") == text.split("\n", 1)[1]
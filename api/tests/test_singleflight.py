@@ -0,0 +1,158 @@
+"""Coalescing of concurrent identical MP queries, from threads and the event loop."""
+
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llamp.utilities.singleflight import SingleFlight
+
+N_CALLERS = 8
+SUMMARY = "search_materials_summary__get"
+QUERY = json.dumps({"formula": "Fe2O3", "_fields": "material_id,formula_pretty"})
+
+
+class Interrupted(BaseException):
+    """Stands for a cancellation of the thread running the leader."""
+
+
+@pytest.fixture
+def wrapper(mp_server, monkeypatch):
+    from llamp.utilities import mp_cache
+    from llamp.utilities.mp import MPAPIWrapper
+
+    # NOTE: without the response cache, only the flight can spare the calls
+    monkeypatch.setattr(mp_cache, "_cache", mp_cache.MPResponseCache(maxsize=0))
+    mp_server.docs["materials/summary"] = [
+        {"material_id": "mp-19770", "formula_pretty": "Fe2O3"},
+    ]
+    mp_server.delay = 0.2
+    wrapper = MPAPIWrapper()
+    wrapper.set_api_key(mp_server.api_key)
+    return wrapper
+
+
+def test_concurrent_threads_make_one_upstream_call(wrapper, mp_server):
+    barrier = threading.Barrier(N_CALLERS)
+
+    def run(_):
+        barrier.wait()
+        return wrapper.run(SUMMARY, QUERY)
+
+    with ThreadPoolExecutor(N_CALLERS) as pool:
+        responses = list(pool.map(run, range(N_CALLERS)))
+
+    assert len(mp_server.calls("materials/summary")) == 1
+    assert all(response == responses[0] for response in responses)
+    assert responses[0] == [{"material_id": "mp-19770", "formula_pretty": "Fe2O3"}]
+
+
+def test_concurrent_tasks_make_one_upstream_call(wrapper, mp_server, arun):
+    async def run():
+        return await asyncio.gather(*(wrapper.arun(SUMMARY, QUERY) for _ in range(N_CALLERS)))
+
+    responses = arun(run())
+
+    assert len(mp_server.calls("materials/summary")) == 1
+    assert all(response == responses[0] for response in responses)
+    # NOTE: followers get copies they are free to modify
+    assert len({id(response) for response in responses}) == N_CALLERS
+
+
+def test_leader_cancellation_hands_over_to_a_follower():
+    flights = SingleFlight("test_singleflight")
+    started = []
+
+    async def call():
+        started.append(asyncio.current_task())
+        await asyncio.sleep(0.1)
+        return {"answer": 42}
+
+    async def run():
+        leader = asyncio.create_task(flights.ado("key", call))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flights.ado("key", call)) for _ in range(N_CALLERS)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results
+
+    leader, results = asyncio.run(run())
+    assert leader.cancelled()
+    assert results == [{"answer": 42}] * N_CALLERS
+    # NOTE: the cancelled leader's call and the one of the follower taking over
+    assert len(started) == 2
+    assert len(flights) == 0
+
+
+def test_follower_cancellation_leaves_the_others():
+    flights = SingleFlight("test_singleflight")
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        leader = asyncio.create_task(flights.ado("key", call))
+        await asyncio.sleep(0.01)
+        quitter, follower = (asyncio.create_task(flights.ado("key", call)) for _ in range(2))
+        await asyncio.sleep(0.01)
+        quitter.cancel()
+        return quitter, await asyncio.gather(leader, follower)
+
+    quitter, results = asyncio.run(run())
+    assert quitter.cancelled()
+    assert results == ["result", "result"]
+
+
+def test_interrupted_thread_leader_hands_over_to_a_follower():
+    flights = SingleFlight("test_singleflight")
+    leading = threading.Event()
+    calls = []
+
+    def interrupted():
+        calls.append("leader")
+        leading.set()
+        # NOTE: long enough for the followers to join the flight
+        threading.Event().wait(0.1)
+        raise Interrupted()
+
+    def call():
+        calls.append("follower")
+        threading.Event().wait(0.1)
+        return "result"
+
+    def lead():
+        with pytest.raises(Interrupted):
+            flights.do("key", interrupted)
+
+    with ThreadPoolExecutor(N_CALLERS + 1) as pool:
+        leader = pool.submit(lead)
+        leading.wait()
+        followers = [pool.submit(flights.do, "key", call) for _ in range(N_CALLERS)]
+        leader.result()
+        results = [follower.result() for follower in followers]
+
+    assert results == ["result"] * N_CALLERS
+    assert calls == ["leader", "follower"]
+
+
+def test_errors_are_shared():
+    flights = SingleFlight("test_singleflight")
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failure")
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.ado("key", call) for _ in range(N_CALLERS)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
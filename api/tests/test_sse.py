@@ -0,0 +1,115 @@
+"""The text/event-stream endpoint: typed events, heartbeats and time to first byte."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+N_TOKENS = 20
+
+
+async def proxy(app, path, body):
+    """Send a request through a stand-in of a buffering reverse proxy.
+
+    Like nginx with ``proxy_buffering on``, the response is held until it is
+    complete unless it has the ``X-Accel-Buffering: no`` header. Returns the
+    seconds until the client receives the first byte, the headers and the body.
+    """
+    start = time.perf_counter()
+    payload = json.dumps(body).encode()
+    received = False
+    done = asyncio.Event()
+    response = {"ttfb": None, "headers": {}, "chunks": []}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # NOTE: the client stays connected until the response is complete
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["headers"] = {
+                name.decode().lower(): value.decode() for name, value in message["headers"]
+            }
+            return
+        buffered = response["headers"].get("x-accel-buffering") != "no"
+        response["chunks"].append(message.get("body", b""))
+        complete = not message.get("more_body", False)
+        flushed = complete if buffered else message.get("body")
+        if flushed and response["ttfb"] is None:
+            response["ttfb"] = time.perf_counter() - start
+        if complete:
+            done.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    await app(scope, receive, send)
+    return response["ttfb"], response["headers"], b"".join(response["chunks"]).decode()
+
+
+def chat_query(chat_id):
+    return {
+        "text": " ".join(f"t{i}" for i in range(N_TOKENS)),
+        "OpenAiAPIKey": "sk-test",
+        "mpAPIKey": "mp",
+        "chat_id": chat_id,
+    }
+
+
+def test_sse_events_are_typed_with_ids(fake_chat, arun):
+    from llamp import sse
+
+    _, headers, body = arun(proxy(sse.app, "/api/chat/sse", chat_query("chat-typed")))
+    assert headers["content-type"].startswith("text/event-stream")
+    assert headers["x-accel-buffering"] == "no"
+    assert headers["x-chat-id"] == "chat-typed"
+
+    messages = [dict(line.split(": ", 1) for line in m.splitlines()) for m in body.strip().split("\n\n")]
+    assert [m["event"] for m in messages] == ["token"] * N_TOKENS + ["final"]
+    assert all("id" in m for m in messages)
+    assert [json.loads(m["data"])["data"] for m in messages[:-1]] == [f"t{i}" for i in range(N_TOKENS)]
+
+
+def test_idle_stream_sends_heartbeats(fake_chat, arun, monkeypatch):
+    from llamp import sse
+
+    monkeypatch.setattr(sse, "SSE_HEARTBEAT_INTERVAL", 0.05)
+    fake_chat.first_delay = 0.3
+
+    _, _, body = arun(proxy(sse.app, "/api/chat/sse", chat_query("chat-idle")))
+    assert body.startswith(": heartbeat\n\n")
+
+
+def test_time_to_first_byte_benchmark(fake_chat, arun):
+    from llamp import sse
+
+    fake_chat.delay = 0.02
+    text_ttfb, _, _ = arun(proxy(sse.app, "/api/chat", chat_query("chat-text")))
+    sse_ttfb, _, _ = arun(proxy(sse.app, "/api/chat/sse", chat_query("chat-sse")))
+    print(
+        f"\ntime to first byte through a buffering proxy, {N_TOKENS} tokens "
+        f"{fake_chat.delay * 1000:.0f} ms apart: text/plain {text_ttfb * 1000:.0f} ms, "
+        f"text/event-stream {sse_ttfb * 1000:.0f} ms"
+    )
+    # NOTE: the text stream is held by the proxy until the agent finishes
+    assert text_ttfb > N_TOKENS * fake_chat.delay
+    assert sse_ttfb < text_ttfb / 4
@@ -0,0 +1,55 @@
+"""Token publishing of StreamingRedisCallbackHandler, one by one or coalesced."""
+
+import time
+
+import pytest
+
+pytest.importorskip("langchain")
+
+N_TOKENS = 2000
+
+
+def publish_tokens(arun, chat_id, coalesce):
+    """Publish N_TOKENS and the final answer, return the tokens per second."""
+    from langchain_core.agents import AgentFinish
+
+    from llamp.callbacks.streaming_redis_handler import StreamingRedisCallbackHandler
+
+    async def run():
+        handler = StreamingRedisCallbackHandler(
+            redis_channel=chat_id, coalesce=coalesce, backend="stream"
+        )
+        start = time.perf_counter()
+        for i in range(N_TOKENS):
+            await handler.on_llm_new_token(f"t{i} ")
+        await handler.on_agent_finish(AgentFinish({"output": "done"}, ""))
+        return N_TOKENS / (time.perf_counter() - start)
+
+    return arun(run())
+
+
+def stream_tokens(redis_client, chat_id):
+    from llamp.callbacks import events, redis_stream
+
+    entries = redis_client.xrange(redis_stream.stream_key(chat_id))
+    return [events.decode(fields[b"data"].decode()) for _, fields in entries]
+
+
+@pytest.mark.parametrize("coalesce", [False, True])
+def test_every_token_is_published_in_order(redis_client, arun, coalesce):
+    publish_tokens(arun, "chat-order", coalesce)
+
+    published = stream_tokens(redis_client, "chat-order")
+    assert [event["data"] for event in published[:-1]] == [f"t{i} " for i in range(N_TOKENS)]
+    # NOTE: the final answer is flushed with the agent finish
+    assert published[-1]["event"] == "final"
+
+
+def test_throughput_benchmark(redis_client, arun):
+    direct = publish_tokens(arun, "chat-direct", coalesce=False)
+    coalesced = publish_tokens(arun, "chat-coalesced", coalesce=True)
+    print(
+        f"\n{N_TOKENS} tokens: {direct:.0f} tokens/s one by one, "
+        f"{coalesced:.0f} tokens/s coalesced"
+    )
+    assert coalesced > direct